@@ -69,7 +69,7 @@ def _shop_request(method: str, path: str, **kwargs) -> dict:
         return {"error": str(e)}
 
 @tool
-def search_faqs(query: str) -> str:
+async def search_faqs(query: str) -> str:
     """
     Search the FAQ knowledge base for answers to common questions.
     Use when the customer asks about:
@@ -77,7 +77,7 @@ def search_faqs(query: str) -> str:
     - General store questions not related to a specific order
     Input: the customer's question as-is.
     """
-    results = search_collection("faqs", query, top_k=2, score_threshold=0.5)
+    results = await search_collection("faqs", query, top_k=2, score_threshold=0.5)
     if not results:
         return "No FAQ entry found for that question."
 
@@ -88,7 +88,7 @@ def search_faqs(query: str) -> str:
 
 
 @tool
-def search_policies(query: str) -> str:
+async def search_policies(query: str) -> str:
     """
     Search store policies: returns, shipping, warranty.
     Use when the customer asks about:
@@ -98,7 +98,7 @@ def search_policies(query: str) -> str:
     - Warranty coverage
     Input: what policy information the customer needs.
     """
-    results = search_collection("policies", query, top_k=2, score_threshold=0.45)
+    results = await search_collection("policies", query, top_k=2, score_threshold=0.45)
     if not results:
         return "No relevant policy information found."
     return "Here's our relevant policy:\n\n" + "\n\n---\n\n".join(r["text"] for r in results)
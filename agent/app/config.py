@@ -6,6 +6,9 @@ from functools import lru_cache
 class Settings(BaseSettings):
     env: str = Field(default="development", alias="ENV")
     DATABASE_URL: str = ""
+    DB_POOL_MIN_SIZE: int = 1
+    DB_POOL_MAX_SIZE: int = 10
+    DB_STATEMENT_CACHE_SIZE: int = 100  # 0 behind a transaction-mode pgbouncer
     SECRET_KEY: str = "specialsecret"
     
     LLM_PROVIDER: str = Field(default="groq", alias="LLM_PROVIDER")
@@ -15,6 +18,7 @@ class Settings(BaseSettings):
 
     QDRANT_URL: str = Field(alias="QDRANT_URL")
     QDRANT_API_KEY: str = Field(alias="QDRANT_API_KEY")
+    QDRANT_PREFER_GRPC: bool = False  # request-path searches over gRPC; needs port 6334 reachable
 
     OLLAMA_URL: str = Field(default="http://localhost:11434")
     REDIS_URL: str = Field(default="redis://localhost:6379")
@@ -1,10 +1,93 @@
 import json
-from app.db import get_connection
+from app.db import db
 from app.logging import get_logger
 from typing import Optional
+from redis.asyncio import Redis
 
 logger = get_logger(__name__)
 
+# Written through by the backend's /chat/handoff route (and dropped when a
+# chat is deleted), so /chat only reads Postgres on a cold key.
+HUMAN_CONNECTED_TTL = 60 * 60
+
+START_TURN_QUERY = """
+    INSERT INTO conversations (conversation_uuid, user_id, last_active)
+    VALUES ($1, $2, NOW())
+    ON CONFLICT (conversation_uuid) DO UPDATE SET last_active = NOW()
+    RETURNING human_connected
+"""
+
+# One statement per turn: upsert the conversation, then insert every message
+# of the turn against it. clock_timestamp() keeps the messages' timestamps in
+# turn order.
+PERSIST_TURN_QUERY = """
+    WITH conversation AS (
+        INSERT INTO conversations (conversation_uuid, user_id, started_at, last_active, status)
+        VALUES ($1, $2, NOW(), NOW(), 'ACTIVE')
+        ON CONFLICT (conversation_uuid)
+        DO UPDATE SET status = 'ACTIVE', last_active = NOW()
+        RETURNING id
+    )
+    INSERT INTO messages (conversation_id, sender, content, metadata, timestamp)
+    SELECT conversation.id, m.sender::"MessageSender", m.content, m.metadata::jsonb, clock_timestamp()
+    FROM conversation,
+         UNNEST($3::text[], $4::text[], $5::text[]) WITH ORDINALITY AS m(sender, content, metadata, ord)
+    ORDER BY m.ord
+"""
+
+
+def human_connected_key(session_id: str) -> str:
+    return f"chat_human_connected:{session_id}"
+
+
+async def start_turn(redis: Redis, session_id: str, customer_id: Optional[int] = None) -> bool:
+    """
+    Returns whether a human agent has taken over the conversation.
+    Served from Redis; on a miss the conversation is upserted and the flag
+    read back in the same statement, then cached.
+    """
+    key = human_connected_key(session_id)
+    cached = await redis.get(key)
+    if cached is not None:
+        return cached == "1"
+
+    try:
+        async with db.acquire() as conn:
+            human_connected = await conn.fetchval(START_TURN_QUERY, session_id, customer_id)
+    except Exception as e:
+        logger.error(f"[DB] Failed to start turn uuid={session_id}: {e}")
+        raise
+
+    # NX: a handoff written by the backend while we were reading wins
+    await redis.set(key, "1" if human_connected else "0", ex=HUMAN_CONNECTED_TTL, nx=True)
+    return bool(human_connected)
+
+
+async def persist_turn(
+    session_id: str,
+    messages: list[tuple[str, str, Optional[dict]]],
+    customer_id: Optional[int] = None,
+) -> None:
+    """
+    Saves a turn's (role, content, metadata) messages in one round trip,
+    creating the conversation if it doesn't exist yet.
+    """
+    if not messages:
+        return
+    try:
+        async with db.acquire() as conn:
+            await conn.execute(
+                PERSIST_TURN_QUERY,
+                session_id,
+                customer_id,
+                [role for role, _, _ in messages],
+                [content for _, content, _ in messages],
+                [json.dumps(metadata) if metadata else None for _, _, metadata in messages],
+            )
+    except Exception as e:
+        logger.error(f"❌ DB Error in persist_turn: {e}")
+
+
 async def ensure_conversation_exists(
     conversation_uuid: str,
     customer_id: Optional[int] = None,
@@ -13,33 +96,28 @@ async def ensure_conversation_exists(
     Ensures a conversation row exists.
     Returns conversation.id
     """
-    conn = None
     try:
-        conn = await get_connection()
-        row = await conn.fetchrow(
-            """
-            INSERT INTO conversations (conversation_uuid, user_id, last_active)
-            VALUES ($1, $2, NOW())
-            ON CONFLICT (conversation_uuid) DO UPDATE SET last_active = NOW()
-            RETURNING id
-            """,
-            conversation_uuid,
-            customer_id,
-        )
+        async with db.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                INSERT INTO conversations (conversation_uuid, user_id, last_active)
+                VALUES ($1, $2, NOW())
+                ON CONFLICT (conversation_uuid) DO UPDATE SET last_active = NOW()
+                RETURNING id
+                """,
+                conversation_uuid,
+                customer_id,
+            )
         return row["id"]
     except Exception as e:
         logger.error(f"[DB] Failed to ensure conversation exists uuid={conversation_uuid}: {e}")
         raise
-    finally:
-        if conn:
-            await conn.close()
 
 async def is_human_connected(session_id: str) -> bool:
     """
     Returns True if human_connected is True
     """
-    conn = await get_connection()
-    try:
+    async with db.acquire() as conn:
         row = await conn.fetchrow(
             """
             SELECT human_connected
@@ -49,36 +127,29 @@ async def is_human_connected(session_id: str) -> bool:
             session_id,
         )
 
-        if not row:
-            return False
+    if not row:
+        return False
 
-        return row["human_connected"]
-
-    finally:
-        await conn.close()
+    return row["human_connected"]
 
 async def mark_escalated(conversation_uuid: str):
-    conn = None
     try:
-        conn = await get_connection()
-        await conn.execute(
-            """
-            INSERT INTO conversations (conversation_uuid, is_escalated, last_active)
-            VALUES ($1, true, NOW())
-            ON CONFLICT (conversation_uuid)
-            DO UPDATE SET
-                is_escalated = true,
-                last_active = NOW()
-            """,
-            conversation_uuid,
-        )
+        async with db.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO conversations (conversation_uuid, is_escalated, last_active)
+                VALUES ($1, true, NOW())
+                ON CONFLICT (conversation_uuid)
+                DO UPDATE SET
+                    is_escalated = true,
+                    last_active = NOW()
+                """,
+                conversation_uuid,
+            )
         logger.debug(f"[DB] Conversation {conversation_uuid} escalated")
     except Exception as e:
         logger.error(f"[DB] Failed to escalate conversation uuid={conversation_uuid}: {e}")
         raise
-    finally:
-        if conn:
-            await conn.close()
 
 async def save_message_db(
     session_id: str,
@@ -89,42 +160,40 @@ async def save_message_db(
     """
     Saves a message. If the conversation doesn't exist yet, it creates it automatically.
     """
-    conn = await get_connection()
     try:
-        conversation = await conn.fetchrow(
-            """
-            INSERT INTO conversations (conversation_uuid, started_at, last_active, status)
-            VALUES ($1, NOW(), NOW(), 'ACTIVE')
-            ON CONFLICT (conversation_uuid)
-            DO UPDATE SET status = 'ACTIVE' -- Just to ensure we get the row back
-            RETURNING id
-            """,
-            session_id
-        )
-
-        conversation_id = conversation["id"]
+        async with db.acquire() as conn:
+            conversation = await conn.fetchrow(
+                """
+                INSERT INTO conversations (conversation_uuid, started_at, last_active, status)
+                VALUES ($1, NOW(), NOW(), 'ACTIVE')
+                ON CONFLICT (conversation_uuid)
+                DO UPDATE SET status = 'ACTIVE' -- Just to ensure we get the row back
+                RETURNING id
+                """,
+                session_id
+            )
 
-        await conn.execute(
-            """
-            INSERT INTO messages (
+            conversation_id = conversation["id"]
+
+            await conn.execute(
+                """
+                INSERT INTO messages (
+                    conversation_id,
+                    sender,
+                    content,
+                    metadata,
+                    timestamp
+                )
+                VALUES ($1, $2, $3, $4, NOW())
+                """,
                 conversation_id,
-                sender,
+                role,
                 content,
-                metadata,
-                timestamp
+                json.dumps(metadata) if metadata else None
             )
-            VALUES ($1, $2, $3, $4, NOW())
-            """,
-            conversation_id,
-            role,
-            content,
-            json.dumps(metadata) if metadata else None
-        )
 
     except Exception as e:
         logger.error(f"❌ DB Error in save_message_db: {e}")
-    finally:
-        await conn.close()
 
 
 async def update_conversation_db(
@@ -139,43 +208,41 @@ async def update_conversation_db(
     - Automatically updates last_active
     - Creates conversation if it doesn't exist (optional behavior)
     """
-    conn = await get_connection()
     try:
-        conversation = await conn.fetchrow(
-            """
-            INSERT INTO conversations (conversation_uuid, started_at, last_active, status)
-            VALUES ($1, NOW(), NOW(), 'ACTIVE')
-            ON CONFLICT (conversation_uuid)
-            DO UPDATE SET last_active = NOW()
-            RETURNING id
-            """,
-            session_id
-        )
+        async with db.acquire() as conn:
+            conversation = await conn.fetchrow(
+                """
+                INSERT INTO conversations (conversation_uuid, started_at, last_active, status)
+                VALUES ($1, NOW(), NOW(), 'ACTIVE')
+                ON CONFLICT (conversation_uuid)
+                DO UPDATE SET last_active = NOW()
+                RETURNING id
+                """,
+                session_id
+            )
 
-        conversation_id = conversation["id"]
+            conversation_id = conversation["id"]
 
-        updates = []
-        values = []
-        idx = 1
+            updates = []
+            values = []
+            idx = 1
 
-        if is_escalated is not None:
-            updates.append(f"is_escalated = ${idx}")
-            values.append(is_escalated)
-            idx += 1
+            if is_escalated is not None:
+                updates.append(f"is_escalated = ${idx}")
+                values.append(is_escalated)
+                idx += 1
 
-        updates.append(f"last_active = NOW()")
+            updates.append(f"last_active = NOW()")
 
-        if updates:
-            query: str = f"""
-                UPDATE conversations
-                SET {', '.join(updates)}
-                WHERE id = ${idx}
-            """
-            values.append(conversation_id)
+            if updates:
+                query: str = f"""
+                    UPDATE conversations
+                    SET {', '.join(updates)}
+                    WHERE id = ${idx}
+                """
+                values.append(conversation_id)
 
-            await conn.execute(query, *values)
+                await conn.execute(query, *values)
 
     except Exception as e:
         logger.error(f"❌ DB Error in update_conversation_db: {e}")
-    finally:
-        await conn.close()
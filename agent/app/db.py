@@ -1,12 +1,109 @@
-from app.logging import get_logger
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 import asyncpg
 from app.config import settings
+from app.logging import get_logger
 
 logger = get_logger(__name__)
 
-async def get_connection() -> asyncpg.Connection:
-    url: str | None = settings.DATABASE_URL
-    if not url:
-        raise RuntimeError("DATABASE_URL is not set in .env")
 
-    return await asyncpg.connect(url)
+class Database:
+    """
+    One asyncpg pool per process, opened in the app lifespan (or lazily by
+    scripts and the celery tasks, which close it themselves). Connections
+    are reused, so each one keeps asyncpg's prepared-statement cache and
+    repeated queries skip the parse/plan round trip.
+    """
+
+    def __init__(self, min_size: int = 1, max_size: int = 10, acquire_timeout: float = 10.0) -> None:
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.pool: asyncpg.Pool | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._connect_lock: asyncio.Lock | None = None
+        self._in_use = 0
+        self._waiting = 0
+        self._stats = {
+            "acquired": 0,
+            "saturated": 0,  # acquires that found no idle connection at max size
+            "timeouts": 0,
+            "max_wait_ms": 0.0,
+            "total_wait_ms": 0.0,
+            "max_in_use": 0,
+        }
+
+    async def connect(self) -> asyncpg.Pool:
+        loop = asyncio.get_running_loop()
+        if self.pool is not None and self._loop is loop:
+            return self.pool
+        if self._connect_lock is None or self._loop is not loop:
+            # a pool from a finished event loop (asyncio.run per celery task) can't be reused
+            self.pool, self._loop, self._connect_lock = None, loop, asyncio.Lock()
+        async with self._connect_lock:
+            if self.pool is None:
+                url: str | None = settings.DATABASE_URL
+                if not url:
+                    raise RuntimeError("DATABASE_URL is not set in .env")
+                self.pool = await asyncpg.create_pool(
+                    dsn=url,
+                    min_size=self.min_size,
+                    max_size=self.max_size,
+                    statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+                    max_inactive_connection_lifetime=300,
+                )
+                logger.debug(f"[DB] Pool opened (min={self.min_size}, max={self.max_size})")
+        return self.pool
+
+    async def disconnect(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+            logger.debug("[DB] Pool closed")
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[asyncpg.Connection]:
+        pool = await self.connect()
+        if pool.get_idle_size() == 0 and pool.get_size() >= self.max_size:
+            self._stats["saturated"] += 1
+        start = time.perf_counter()
+        self._waiting += 1
+        try:
+            conn = await pool.acquire(timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            logger.error(f"[DB] Timed out after {self.acquire_timeout}s waiting for a pooled connection")
+            raise
+        finally:
+            self._waiting -= 1
+
+        wait_ms = (time.perf_counter() - start) * 1000
+        self._stats["acquired"] += 1
+        self._stats["total_wait_ms"] += wait_ms
+        self._stats["max_wait_ms"] = round(max(self._stats["max_wait_ms"], wait_ms), 2)
+        self._in_use += 1
+        self._stats["max_in_use"] = max(self._stats["max_in_use"], self._in_use)
+        try:
+            yield conn
+        finally:
+            self._in_use -= 1
+            await pool.release(conn)
+
+    def snapshot(self) -> dict:
+        acquired = self._stats["acquired"]
+        return {
+            **self._stats,
+            "open": self.pool is not None,
+            "size": self.pool.get_size() if self.pool else 0,
+            "idle": self.pool.get_idle_size() if self.pool else 0,
+            "in_use": self._in_use,
+            "waiting": self._waiting,
+            "max_size": self.max_size,
+            "utilization": round(self._in_use / self.max_size, 2),
+            "avg_wait_ms": round(self._stats["total_wait_ms"] / acquired, 3) if acquired else 0.0,
+        }
+
+
+db = Database(min_size=settings.DB_POOL_MIN_SIZE, max_size=settings.DB_POOL_MAX_SIZE)
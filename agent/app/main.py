@@ -11,7 +11,7 @@ from app.schemas.models import ChatRequest, ChatResponse, IngestRequest, HealthR
 from app.agent.agent_graph import run_agent
 from app.config import get_model_name, get_llm, settings
 from app.utils import _notify_slack_escalation
-from app.customer_support.db import is_human_connected, save_message_db, mark_escalated, ensure_conversation_exists
+from app.customer_support.db import mark_escalated, persist_turn, start_turn
 from app.agent.memory import save_messages_to_redis, load_messages_from_redis, clear_session
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 
@@ -19,6 +19,8 @@ from app.observability.tracing import start_turn_trace, end_turn_trace
 from app.observability.eval_runner import run_eval_pipeline
 from app.observability.langfuse_client import flush_langfuse
 from app.deps import RedisDep
+from app.db import db
+from app.rag.qdrant_client import close_async_qdrant_client, rag_cache
 
 logger = get_logger(__name__)
 
@@ -30,6 +32,11 @@ async def lifespan(app: FastAPI):
     """
     logger.debug("🚀 Pre-loading embedding model...")
     app.state.redis = redis.from_url(settings.REDIS_URL, decode_responses=True, max_connections=10)
+    try:
+        await db.connect()
+    except Exception as e:
+        logger.error(f"⚠️  Could not open database pool: {e}")
+    rag_cache.start(app.state.redis)
     try:
         from app.rag.qdrant_client import get_embedding_model
         get_embedding_model()  # loads and caches the model
@@ -39,6 +46,9 @@ async def lifespan(app: FastAPI):
 
     yield
     flush_langfuse()
+    rag_cache.stop()
+    await close_async_qdrant_client()
+    await db.disconnect()
     await app.state.redis.close()
 
     logger.debug("Shutting down...")
@@ -60,10 +70,12 @@ app.add_middleware(
 )
 
 async def persist_turn_to_db(session_id: str, user_msg: str, ai_msg: str, user_metadata: dict, ai_metadata: dict) -> None:
-    """Saves both messages using the UPSERT-safe function."""
+    """Saves both messages of the turn in a single statement."""
     try:
-        await save_message_db(session_id=session_id, role="USER", content=user_msg, metadata=user_metadata)
-        await save_message_db(session_id=session_id, role="BOT", content=ai_msg, metadata=ai_metadata)
+        await persist_turn(
+            session_id=session_id,
+            messages=[("USER", user_msg, user_metadata), ("BOT", ai_msg, ai_metadata)],
+        )
         logger.debug(f"💾 Persisted turn for session {session_id} to DB")
     except Exception as e:
         logger.error(f"❌ Background DB Persistence Error: {e}")
@@ -90,7 +102,7 @@ async def chat(request: Request, redis: RedisDep, payload: ChatRequest, backgrou
     if payload.customer_id is None:
         await redis.set(f"chat_session:{connection_key}", payload.session_id)
 
-    await ensure_conversation_exists(conversation_uuid=payload.session_id, customer_id=payload.customer_id)
+    human_connected = await start_turn(redis=redis, session_id=payload.session_id, customer_id=payload.customer_id)
 
     if payload.type == "form_submission":
         if payload.form_type == "escalation_details":
@@ -173,8 +185,8 @@ async def chat(request: Request, redis: RedisDep, payload: ChatRequest, backgrou
                 complaint_sent=True,
             )
 
-    if await is_human_connected(payload.session_id):
-        await save_message_db(session_id=payload.session_id, content=payload.message or "", role="USER")
+    if human_connected:
+        await persist_turn(session_id=payload.session_id, messages=[("USER", payload.message or "", None)])
         return ChatResponse(
             reply="You're connected with a support agent. They'll respond shortly.",
             session_id=payload.session_id,
@@ -300,10 +312,30 @@ async def health_check(redis: RedisDep) -> HealthResponse:
         checks["redis"] = "error"
         logger.error(f"error: {str(e)[:50]}")
 
+    try:
+        async with db.acquire() as conn:
+            await conn.fetchval("SELECT 1")
+        checks["postgres"] = "ok"
+    except Exception as e:
+        checks["postgres"] = "error"
+        logger.error(f"error: {str(e)[:50]}")
+
     healthy = all(v == "ok" for v in checks.values())
     return HealthResponse(status="ok" if healthy else "degraded", checks=checks)
 
 
+@app.get("/db/pool-stats", tags=["System"])
+async def db_pool_stats():
+    """Size, utilization, saturation and acquire wait times of this process's Postgres pool."""
+    return db.snapshot()
+
+
+@app.get("/rag/cache-stats", tags=["System"])
+async def rag_cache_stats():
+    """Hit/miss counts of this process's query-embedding and search-result caches."""
+    return rag_cache.snapshot()
+
+
 @app.delete("/session/{session_id}", tags=["Admin"])
 async def delete_session(session_id: str):
     """Clear a session's conversation memory."""
@@ -324,6 +356,7 @@ async def clear_collection():
     from app.rag.qdrant_client import delete_collection
     for collection in ["products", "faqs", "policies"]:
         delete_collection(collection)
+        await rag_cache.invalidate(collection)
     return {
         "status": "ok"
     }
@@ -334,7 +367,7 @@ async def test_micro():
     from app.rag.qdrant_client import search_collection
     # result = _shop_request("GET", "/api/order/ORD-C0B7CD56")
     # result = search_collection("faqs", "How do I place an order", top_k=3, score_threshold=0.45)
-    result = search_collection("products", "pin downs", top_k=3, score_threshold=0.45)
+    result = await search_collection("products", "pin downs", top_k=3, score_threshold=0.45)
     return {
         "result": result,
         "status": "ok"
@@ -52,6 +52,7 @@ async def _run_marketing_agent():
         log_notification_sent,
     )
     from app.observability.langfuse_client import create_trace, flush_langfuse
+    from app.db import db
 
     notification_id = str(uuid.uuid4())
     logger.info(f"[Marketing] Starting notification run {notification_id}")
@@ -186,3 +187,5 @@ async def _run_marketing_agent():
     finally:
         # Always flush — Celery tasks don't share the FastAPI lifespan
         flush_langfuse()
+        # the pool belongs to this task's event loop, which asyncio.run closes next
+        await db.disconnect()
@@ -0,0 +1,195 @@
+import base64
+import hashlib
+import json
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Optional
+import redis.asyncio as aioredis
+from redis.asyncio import Redis
+from app.config import settings
+from app.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """all-MiniLM-L6-v2 is uncased, so lowercasing and collapsing whitespace
+    maps more phrasings onto one key without changing the vector."""
+    return " ".join(query.lower().split())
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha1(value.encode()).hexdigest()
+
+
+def _pack_vector(vector: list[float]) -> str:
+    return base64.b64encode(array("f", vector).tobytes()).decode()
+
+
+def _unpack_vector(raw: str) -> list[float]:
+    return array("f", base64.b64decode(raw)).tolist()
+
+
+class LRUCache:
+    """Process-local, size-bounded LRU with a TTL. Never a source of truth;
+    a miss falls through to Redis."""
+
+    def __init__(self, max_size: int = 2048, ttl: float = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._store: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._store.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._store.pop(key, None)
+            return None
+        self._store.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._store[key] = (time.monotonic() + self.ttl, value)
+        self._store.move_to_end(key)
+        if len(self._store) > self.max_size:
+            self._store.popitem(last=False)
+
+    def clear(self) -> None:
+        self._store.clear()
+
+
+class RagCache:
+    """
+    Query embeddings and search results for the RAG layer.
+
+    Embeddings live in an in-process LRU in front of Redis, keyed by model
+    and normalized query, so every replica shares what any one has computed.
+    Results are cached in Redis per collection, query, limit, threshold and
+    filters, stamped with the collection's generation; ingest bumps the
+    generation, which invalidates every cached result for that collection
+    in one INCR. Redis failures are logged and treated as misses.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        l1_size: int = 2048,
+        l1_ttl: float = 3600.0,
+        embedding_ttl: int = 7 * 24 * 3600,
+        result_ttl: int = 3600,
+    ) -> None:
+        self.model_name = model_name
+        self.embedding_ttl = embedding_ttl
+        self.result_ttl = result_ttl
+        self.l1 = LRUCache(max_size=l1_size, ttl=l1_ttl)
+        self.redis: Redis | None = None
+        self._stats = {"embedding_l1": 0, "embedding_redis": 0, "embedding_miss": 0, "result_hit": 0, "result_miss": 0}
+
+    def start(self, redis: Redis) -> None:
+        self.redis = redis
+
+    def stop(self) -> None:
+        self.redis = None
+
+    def _embedding_key(self, normalized: str) -> str:
+        return f"rag:emb:{self.model_name}:{_digest(normalized)}"
+
+    @staticmethod
+    def _generation_key(collection: str) -> str:
+        return f"rag:gen:{collection}"
+
+    @staticmethod
+    def _result_key(collection: str, normalized: str, top_k: int, score_threshold: float, filters: Optional[dict]) -> str:
+        params = json.dumps([normalized, top_k, score_threshold, filters or {}], sort_keys=True, default=str)
+        return f"rag:search:{collection}:{_digest(params)}"
+
+    async def get_embedding(self, normalized: str) -> Optional[list[float]]:
+        key = self._embedding_key(normalized)
+        vector = self.l1.get(key)
+        if vector is not None:
+            self._stats["embedding_l1"] += 1
+            return vector
+        if self.redis is not None:
+            try:
+                raw = await self.redis.get(key)
+            except Exception as e:
+                logger.error(f"[RAG Cache] Embedding read failed: {e}")
+                raw = None
+            if raw:
+                vector = _unpack_vector(raw)
+                self.l1.set(key, vector)
+                self._stats["embedding_redis"] += 1
+                return vector
+        self._stats["embedding_miss"] += 1
+        return None
+
+    async def set_embedding(self, normalized: str, vector: list[float]) -> None:
+        key = self._embedding_key(normalized)
+        self.l1.set(key, vector)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(key, _pack_vector(vector), ex=self.embedding_ttl)
+        except Exception as e:
+            logger.error(f"[RAG Cache] Embedding write failed: {e}")
+
+    async def get_results(
+        self, collection: str, normalized: str, top_k: int, score_threshold: float, filters: Optional[dict]
+    ) -> tuple[Optional[list[dict]], int]:
+        """Returns (cached results or None, current generation) in one round trip."""
+        if self.redis is None:
+            return None, 0
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.get(self._generation_key(collection))
+                pipe.get(self._result_key(collection, normalized, top_k, score_threshold, filters))
+                generation, raw = await pipe.execute()
+        except Exception as e:
+            logger.error(f"[RAG Cache] Result read failed: {e}")
+            return None, 0
+
+        generation = int(generation or 0)
+        if raw:
+            entry = json.loads(raw)
+            if entry["gen"] == generation:
+                self._stats["result_hit"] += 1
+                return entry["results"], generation
+        self._stats["result_miss"] += 1
+        return None, generation
+
+    async def set_results(
+        self,
+        collection: str,
+        normalized: str,
+        top_k: int,
+        score_threshold: float,
+        filters: Optional[dict],
+        generation: int,
+        results: list[dict],
+    ) -> None:
+        if self.redis is None:
+            return
+        key = self._result_key(collection, normalized, top_k, score_threshold, filters)
+        try:
+            await self.redis.set(key, json.dumps({"gen": generation, "results": results}, default=str), ex=self.result_ttl)
+        except Exception as e:
+            logger.error(f"[RAG Cache] Result write failed: {e}")
+
+    async def invalidate(self, collection: str) -> None:
+        """Drops every cached search result for a collection. Works outside the
+        app (the ingest CLI) by opening a short-lived client."""
+        redis = self.redis or aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+        try:
+            await redis.incr(self._generation_key(collection))
+            logger.debug(f"[RAG Cache] Invalidated results for '{collection}'")
+        except Exception as e:
+            logger.error(f"[RAG Cache] Failed to invalidate '{collection}': {e}")
+        finally:
+            if redis is not self.redis:
+                await redis.close()
+
+    def snapshot(self) -> dict:
+        return {**self._stats, "l1_size": len(self.l1._store), "l1_max_size": self.l1.max_size}
@@ -2,7 +2,7 @@ import asyncio
 import argparse
 from app.logging import get_logger
 import asyncpg
-from app.rag.qdrant_client import upsert_documents
+from app.rag.qdrant_client import rag_cache, upsert_documents
 from app.config import settings
 
 logger = get_logger(__name__)
@@ -205,6 +205,7 @@ async def ingest(collection: str) -> None:
                 logger.warning(f"No documents found for '{name}' — skipping.")
                 continue
             count: int = upsert_documents(name, docs)
+            await rag_cache.invalidate(name)
             logger.debug(f"✅ {name}: {count} documents upsert into Qdrant")
     finally:
         await conn.close()
@@ -1,5 +1,7 @@
+import asyncio
 from app.logging import get_logger
-from qdrant_client import QdrantClient
+from app.rag.cache import RagCache, normalize_query
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.models import (
     Distance, VectorParams, PointStruct, Filter,
     FieldCondition, MatchValue
@@ -52,6 +54,8 @@ def get_embedding_model() -> TextEmbedding:
         local_files_only=True,
     )
 
+rag_cache = RagCache(model_name=MODEL_NAME)
+
 @lru_cache()
 def get_qdrant_client() -> QdrantClient:
     from app.config import settings
@@ -64,6 +68,29 @@ def get_qdrant_client() -> QdrantClient:
     )
 
 
+@lru_cache()
+def get_async_qdrant_client() -> AsyncQdrantClient:
+    """Used on the request path; ingest and admin calls stay on the sync client."""
+    from app.config import settings
+    logger.debug(f"Connecting to Qdrant (async, grpc={settings.QDRANT_PREFER_GRPC}): {settings.QDRANT_URL}")
+    return AsyncQdrantClient(
+        url=settings.QDRANT_URL,
+        api_key=settings.QDRANT_API_KEY,
+        timeout=5,
+        prefer_grpc=settings.QDRANT_PREFER_GRPC,
+    )
+
+
+async def close_async_qdrant_client() -> None:
+    if get_async_qdrant_client.cache_info().currsize:
+        await get_async_qdrant_client().close()
+        get_async_qdrant_client.cache_clear()
+
+
+def embed_query(query: str) -> list[float]:
+    return list(get_embedding_model().embed([query]))[0].tolist()
+
+
 def ensure_collection(collection_name: str) -> None:
     """Create collection if it doesn't exist."""
     client = get_qdrant_client()
@@ -113,7 +140,7 @@ def upsert_documents(collection_key: str, documents: list[dict]) -> int:
     return len(points)
 
 
-def search_collection(
+async def search_collection(
     collection_key: str,
     query: str,
     top_k: int = 5,
@@ -124,13 +151,20 @@ def search_collection(
     Semantic search over a collection.
     Returns list of payload dicts from matching documents.
     score_threshold: ignore results below this cosine similarity (0-1).
+    Results and query embeddings are cached, see RagCache.
     """
     collection_name: str = COLLECTIONS[collection_key]
-    model = get_embedding_model()
-    client = get_qdrant_client()
+    normalized = normalize_query(query)
+
+    cached, generation = await rag_cache.get_results(collection_key, normalized, top_k, score_threshold, filters)
+    if cached is not None:
+        return cached
 
-    # query_vector = model.encode(query).tolist()
-    query_vector = list(model.embed([query]))[0].tolist()
+    query_vector = await rag_cache.get_embedding(normalized)
+    if query_vector is None:
+        # ONNX inference is CPU-bound; keep it off the event loop
+        query_vector = await asyncio.to_thread(embed_query, normalized)
+        await rag_cache.set_embedding(normalized, query_vector)
 
     # Build optional filter (e.g. filter by category)
     qdrant_filter = None
@@ -141,7 +175,7 @@ def search_collection(
         ]
         qdrant_filter = Filter(must=conditions)
 
-    results = client.search(
+    results = await get_async_qdrant_client().search(
         collection_name=collection_name,
         query_vector=query_vector,
         limit=top_k,
@@ -150,10 +184,12 @@ def search_collection(
         with_payload=True,
     )
 
-    return [
+    hits = [
         {**hit.payload, "_score": round(hit.score, 3)}
         for hit in results
     ]
+    await rag_cache.set_results(collection_key, normalized, top_k, score_threshold, filters, generation, hits)
+    return hits
 
 def clear_collection(collection_key: str) -> None:
     """
@@ -0,0 +1,121 @@
+"""
+Per-turn Postgres overhead of /chat.
+
+A turn used to do ensure_conversation_exists, is_human_connected and two
+save_message_db calls. "before" replays those statements the old way, on
+a fresh asyncpg.connect per call; "pooled" runs the same six statements on
+the shared pool; "store" is the current path: start_turn (Redis, one
+upsert on a cold key) plus one persist_turn statement.
+Runs `--turns` turns with `--concurrency` chats in flight against
+DATABASE_URL and REDIS_URL, writing to throwaway conversations that are
+deleted at the end.
+
+    uv run python -m scripts.bench_db_turn --turns 200 --concurrency 10
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import asyncpg
+import redis.asyncio as redis
+from app.config import settings
+from app.customer_support.db import (
+    ensure_conversation_exists,
+    human_connected_key,
+    is_human_connected,
+    persist_turn,
+    save_message_db,
+    start_turn,
+)
+from app.db import db
+
+UPSERT = """
+    INSERT INTO conversations (conversation_uuid, started_at, last_active, status)
+    VALUES ($1, NOW(), NOW(), 'ACTIVE')
+    ON CONFLICT (conversation_uuid) DO UPDATE SET status = 'ACTIVE'
+    RETURNING id
+"""
+INSERT_MESSAGE = "INSERT INTO messages (conversation_id, sender, content, metadata, timestamp) VALUES ($1, $2, $3, NULL, NOW())"
+
+
+async def old_call(fn) -> None:
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        await fn(conn)
+    finally:
+        await conn.close()
+
+
+async def old_turn(session_id: str) -> None:
+    await old_call(lambda c: c.fetchrow(
+        "INSERT INTO conversations (conversation_uuid, user_id, last_active) VALUES ($1, NULL, NOW()) "
+        "ON CONFLICT (conversation_uuid) DO UPDATE SET last_active = NOW() RETURNING id", session_id))
+    await old_call(lambda c: c.fetchrow("SELECT human_connected FROM conversations WHERE conversation_uuid = $1", session_id))
+    for role, content in (("USER", "where is my order?"), ("BOT", "It ships tomorrow.")):
+        async def save(c, role=role, content=content):
+            row = await c.fetchrow(UPSERT, session_id)
+            await c.execute(INSERT_MESSAGE, row["id"], role, content)
+        await old_call(save)
+
+
+async def pooled_turn(session_id: str) -> None:
+    await ensure_conversation_exists(session_id)
+    await is_human_connected(session_id)
+    await save_message_db(session_id, "USER", "where is my order?")
+    await save_message_db(session_id, "BOT", "It ships tomorrow.")
+
+
+def store_turn(client: redis.Redis):
+    async def turn(session_id: str) -> None:
+        await start_turn(client, session_id)
+        await persist_turn(session_id, [("USER", "where is my order?", None), ("BOT", "It ships tomorrow.", None)])
+    return turn
+
+
+async def run(name: str, turn, sessions: list[str], turns: int, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await turn(sessions[i % len(sessions)])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(turns)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"{name:7s} p50 {statistics.median(latencies):7.1f}ms  p95 {latencies[int(len(latencies) * 0.95) - 1]:7.1f}ms  "
+          f"{turns / elapsed:6.0f} turns/s")
+
+
+async def main(turns: int, concurrency: int) -> None:
+    sessions = [f"bench-{uuid.uuid4()}" for _ in range(concurrency)]
+    client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    try:
+        await run("before", old_turn, sessions, turns, concurrency)
+        await db.connect()
+        await run("pooled", pooled_turn, sessions, turns, concurrency)
+        await run("store", store_turn(client), sessions, turns, concurrency)
+        print(f"pool: {db.snapshot()}")
+    finally:
+        await client.delete(*[human_connected_key(s) for s in sessions])
+        await client.close()
+        async with db.acquire() as conn:
+            await conn.execute(
+                "DELETE FROM messages WHERE conversation_id IN (SELECT id FROM conversations WHERE conversation_uuid = ANY($1::text[]))",
+                sessions,
+            )
+            await conn.execute("DELETE FROM conversations WHERE conversation_uuid = ANY($1::text[])", sessions)
+        await db.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.turns, args.concurrency))
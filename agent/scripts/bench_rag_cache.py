@@ -0,0 +1,99 @@
+"""
+Latency of repeated FAQ searches, before and after the RAG caches.
+
+"before" is the old search_collection: FastEmbed on every call and the
+sync HTTP client. "cold" runs the new path with empty caches (a fresh
+collection generation and empty L1), so each distinct question pays for
+one embedding and one Qdrant query. "warm" replays the same questions
+with varied casing and spacing, served from the result cache. Needs
+QDRANT_URL, REDIS_URL, the local model and an ingested faqs collection.
+
+    uv run python -m scripts.bench_rag_cache --rounds 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import redis.asyncio as redis
+from app.config import settings
+from app.rag.qdrant_client import (
+    COLLECTIONS,
+    close_async_qdrant_client,
+    embed_query,
+    get_qdrant_client,
+    rag_cache,
+    search_collection,
+)
+
+QUESTIONS = [
+    "How do I place an order?",
+    "What payment methods do you accept?",
+    "How long does delivery take?",
+    "Can I change my delivery address?",
+    "How do I reset my password?",
+    "Do you ship outside Lagos?",
+    "How do I track my order?",
+    "Can I cancel my order?",
+]
+
+
+def old_search(query: str) -> list:
+    return get_qdrant_client().search(
+        collection_name=COLLECTIONS["faqs"],
+        query_vector=embed_query(query),
+        limit=2,
+        score_threshold=0.5,
+        with_payload=True,
+    )
+
+
+def report(name: str, latencies: list[float]) -> None:
+    latencies.sort()
+    print(f"{name:7s} n={len(latencies):4d}  p50 {statistics.median(latencies):7.2f}ms  "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1]:7.2f}ms  mean {statistics.fmean(latencies):7.2f}ms")
+
+
+async def main(rounds: int) -> None:
+    client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    rag_cache.start(client)
+    try:
+        old_search(QUESTIONS[0])  # load the model outside the timings
+
+        latencies = []
+        for _ in range(rounds):
+            for q in QUESTIONS:
+                start = time.perf_counter()
+                await asyncio.to_thread(old_search, q)
+                latencies.append((time.perf_counter() - start) * 1000)
+        report("before", latencies)
+
+        await rag_cache.invalidate("faqs")
+        rag_cache.l1.clear()
+        latencies = []
+        for q in QUESTIONS:
+            start = time.perf_counter()
+            await search_collection("faqs", q, top_k=2, score_threshold=0.5)
+            latencies.append((time.perf_counter() - start) * 1000)
+        report("cold", latencies)
+
+        latencies = []
+        for i in range(rounds):
+            for q in QUESTIONS:
+                q = q.upper() if i % 2 else f"  {q.lower()} "
+                start = time.perf_counter()
+                await search_collection("faqs", q, top_k=2, score_threshold=0.5)
+                latencies.append((time.perf_counter() - start) * 1000)
+        report("warm", latencies)
+        print(f"cache: {rag_cache.snapshot()}")
+    finally:
+        rag_cache.stop()
+        await close_async_qdrant_client()
+        await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds))
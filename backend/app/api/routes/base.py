@@ -4,7 +4,11 @@ from prisma.enums import Role
 from datetime import timedelta, datetime
 from app.core.permissions import require_admin
 from app.core.dependencies.cache import CacheDep
-from app.services.cache import cacheable
+from app.services.cache import cacheable, cache_stats
+from app.services.invalidation import product_invalidation_bus
+from app.services.index_queue import search_index_queue
+from app.services.cdn_purge import cdn_purge_queue
+from app.core.deps import Notification
 from app.prisma_client import DbDep
 
 router = APIRouter()
@@ -117,3 +121,33 @@ async def clear_redis_cache(cache: CacheDep):
         return {"success": result}
     except Exception as e:
         return {"success": False, "error": str(e)}
+
+
+@router.get("/cache/stats", dependencies=[Depends(require_admin)])
+async def cache_stats_summary():
+    """Hit/miss/stale/coalesced counters for the worker serving this request"""
+    return cache_stats.snapshot()
+
+
+@router.get("/cache/invalidation-stats", dependencies=[Depends(require_admin)])
+async def product_invalidation_stats():
+    """Batch size and flush latency of this worker's product invalidation bus"""
+    return product_invalidation_bus.snapshot()
+
+
+@router.get("/search/index-status", dependencies=[Depends(require_admin)])
+async def search_index_status():
+    """Pending/in-flight Meilisearch writes and indexing lag for this worker, plus dead letters"""
+    return await search_index_queue.status()
+
+
+@router.get("/cdn/purge-status", dependencies=[Depends(require_admin)])
+async def cdn_purge_status():
+    """Queue depth, retries and purge latency of this worker's CDN purge queue"""
+    return cdn_purge_queue.snapshot()
+
+
+@router.get("/notifications/outbox-status", dependencies=[Depends(require_admin)])
+async def notification_outbox_status(notification_srv: Notification):
+    """Stream backlog, retries and dead letters of the notification outbox, plus this worker's send counters"""
+    return await notification_srv.outbox.snapshot()
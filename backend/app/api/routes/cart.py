@@ -84,6 +84,11 @@ async def delete_cart_item(
         raise HTTPException(status_code=404, detail="Cart item relation mismatch")
 
     await db.cartitem.delete(where={"id": item_id})
+    if cart_item.variant_id is not None:
+        remaining = sum(
+            i.quantity for i in (cart.items or []) if i.variant_id == cart_item.variant_id and i.id != item_id
+        )
+        await srv.reservations.hold(cart.id, {cart_item.variant_id: remaining}, {})
     background_tasks.add_task(srv.calculate_totals, cart_id=cart.id)
     return {"message": "Item removed from cart successfully"}
 
@@ -109,6 +114,11 @@ async def update_cart_item(
     if quantity > cart_item.variant.inventory:
         raise HTTPException(status_code=400, detail=f"Not enough inventory. Only {cart_item.variant.inventory} items available.")
 
+    other_lines = sum(
+        i.quantity for i in (cart.items or []) if i.variant_id == cart_item.variant_id and i.id != item_id
+    )
+    await srv.hold_variant(cart, cart_item.variant_id, other_lines + quantity, cart_item.variant.inventory)
+
     updated_item = await db.cartitem.update(where={"id": item_id}, data={"quantity": quantity})
     background_tasks.add_task(srv.calculate_totals, cart_id=cart.id)
     return updated_item
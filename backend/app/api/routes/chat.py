@@ -17,6 +17,8 @@ logger = get_logger(__name__)
 
 router = APIRouter()
 
+HUMAN_CONNECTED_TTL = 60 * 60
+
 @router.post("/support", dependencies=[Depends(require_admin)])
 async def admin_chat(payload: ChatRequest, db: DbDep, cache: CacheDep, srv: ConversationDep) -> Message:
     """
@@ -93,6 +95,8 @@ async def handoff(payload: ChatHandoffRequest, db: DbDep, cache: CacheDep, user:
     )
 
     await cache.invalidate(f"chat:{payload.conversation_uuid}", tags=["chats"])
+    # the agent serves human_connected from this key; write it through so its next /chat skips the bot
+    await cache.redis.set(f"chat_human_connected:{payload.conversation_uuid}", "1", ex=HUMAN_CONNECTED_TTL)
 
     await manager.send_to_user(
         user_id=customer,
@@ -157,6 +161,7 @@ async def delete_chat(id: int, db: DbDep, cache: CacheDep) -> Message:
         await tx.message.delete_many(where={"conversation_id": id})
         await tx.conversation.delete(where={"id": id})
         await cache.invalidate(f"chat:{id}", tags=["chats"])
+        await cache.redis.delete(f"chat_human_connected:{existing_chat.conversation_uuid}")
         return {"message": "conversation deleted successfully"}
 
 
@@ -1,14 +1,15 @@
 import uuid
-import json
 from typing import List, Optional
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, BackgroundTasks, Response, Request
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, BackgroundTasks, Request
 from app.core.config import settings
 from app.core.logging import get_logger
 from app.core.dependencies.product import ProductDep, SearchDep
+from fastapi.responses import StreamingResponse
 from app.services.cache import cacheable, DEFAULT_EXPIRATION
+from app.services.merchant_feed import AVAILABILITY_MAP
 from app.core.deps import CurrentUser, UserDep
 from app.models.generic import Message, ImageUpload
-from app.models.product import ProductLite, VariantWithStatus, SearchProducts, FeedProducts, IndexProducts, ReviewStatus
+from app.models.product import ProductLite, VariantWithStatus, SearchProducts, FeedProducts, FacetSnapshot, IndexProducts, ReviewStatus
 from app.core.permissions import require_admin
 from app.lib.cache import set_public_cache
 from app.core.dependencies.services import StorageDep
@@ -21,9 +22,14 @@ logger = get_logger(__name__)
 router = APIRouter()
 
 @router.get("/google-merchant-feed.xml")
-async def get_google_merchant_feed(request: Request, srv: ProductDep, target: str = "google") -> Response:
-    xml_content = await srv.generate_merchant_feed_xml(request=request, target=target)
-    return Response(content=xml_content, media_type="application/xml")
+async def get_google_merchant_feed(srv: ProductDep, target: str = "google", full: bool = False) -> StreamingResponse:
+    """Streams the merchant feed. Served from per-product fragments that are
+    re-rendered only when a product changes; `full=true` streams it straight
+    from the database instead."""
+    if target not in AVAILABILITY_MAP:
+        raise HTTPException(status_code=400, detail=f"Unknown feed target '{target}'")
+    stream = srv.stream_merchant_feed(target) if full else srv.stream_incremental_merchant_feed(target)
+    return StreamingResponse(stream, media_type="application/xml")
 
 
 @router.get("/{product_id}/review-status")
@@ -53,7 +59,7 @@ async def get_recommendations(
 
 
 @router.get("/feed")
-@cacheable(key_prefix="products:list", tags=["products"], cdn_ttl=600, cdn_swr=60)
+@cacheable(key_prefix="products:list", tags=["products"], cdn_ttl=600, cdn_swr=60, stale_ttl=3600)
 async def feed(
     request: Request, srv: ProductDep, search: str = "", sort: str = "id:desc",
     cat_ids: str = Query(default=""), collections: str = Query(default=""),
@@ -61,16 +67,31 @@ async def feed(
     sizes: str = Query(default=""), ages: str = Query(default=""),
     width: str = Query(default=""), length: str = Query(default=""),
     limit: int = Query(default=40, le=100), active: bool = Query(default=True),
-    cursor: Optional[str] = Query(default=None),
+    cursor: Optional[str] = Query(default=None), seed: Optional[str] = Query(default=None, max_length=32),
 ) -> FeedProducts:
     return await srv.get_discovery_feed(
         search=search, sort=sort, cat_ids=cat_ids, collections=collections,
-        max_price=max_price, min_price=min_price, sizes=sizes, ages=ages, width=width, length=length, limit=limit, active=active, cursor=cursor
+        max_price=max_price, min_price=min_price, sizes=sizes, ages=ages, width=width, length=length, limit=limit, active=active, cursor=cursor,
+        seed=seed,
     )
 
 
+@router.get("/facets")
+async def facets(
+    srv: ProductDep, background_tasks: BackgroundTasks,
+    cat_ids: str = Query(default=""), collections: str = Query(default=""),
+) -> FacetSnapshot:
+    """Filter sidebar counts for one category, one collection or the whole
+    catalogue, from the Redis snapshot kept current on every product change."""
+    snapshot = await srv.get_facet_snapshot(cat_ids=cat_ids, collections=collections)
+    if snapshot["source"] == "search":
+        # no snapshot built yet; counts came from Meilisearch this time
+        background_tasks.add_task(srv.rebuild_facets)
+    return snapshot
+
+
 @router.get("/index-products")
-@cacheable(key_prefix="products", key_builder="collections", tags=["products"], cdn_ttl=600, cdn_swr=60)
+@cacheable(key_prefix="products", key_builder="collections", tags=["products"], cdn_ttl=600, cdn_swr=60, stale_ttl=3600)
 async def get_index_products(request: Request, srv: ProductDep) -> IndexProducts:
     return await srv.query_collection_index()
 
@@ -100,9 +121,9 @@ async def search(
 async def read(request: Request, slug: str, srv: ProductDep) -> ProductLite:
     set_public_cache(request, edge_ttl=86400, swr=600)
     cache_key: str = f"product:{slug}"
-    cached = await srv.cache_srv.redis.get(cache_key)
+    cached = await srv.cache_srv.get(cache_key)
     if cached:
-        return json.loads(cached)
+        return cached
 
     product = await srv.get_by_slug(slug=slug)
     if not product:
@@ -146,7 +167,7 @@ async def update_variant(
 @router.post("/configure-filterable-attributes")
 async def configure_filterable_attributes(search_srv: SearchDep) -> Message:
     try:
-        search_srv.update_settings()
+        await search_srv.update_settings()
         return Message(message="Filterable attributes updated successfully.")
     except Exception as e:
         logger.error(f"Error updating attributes: {e}")
@@ -166,7 +187,7 @@ async def config_clear_index(search_srv: SearchDep):
 @router.post("/search/delete-index", dependencies=[Depends(require_admin)])
 async def config_delete_index(index_name: str, search_srv: SearchDep):
     try:
-        search_srv.delete_index(index_name)
+        await search_srv.delete_index(index_name)
         return {"message": "Index dropped"}
     except Exception as e:
         logger.error(e)
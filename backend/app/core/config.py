@@ -54,6 +54,10 @@ class Settings(BaseSettings):
     VAPID_PRIVATE_KEY: str = ""
 
     REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_CODEC: Literal["json", "binary"] = "binary"
+    CACHE_COMPRESS_THRESHOLD: int = 4096
+    INVENTORY_HOLD_TTL: int = 15 * 60  # seconds a cart keeps its units without activity
+    INVENTORY_CHECKOUT_HOLD_TTL: int = 45 * 60  # seconds an order waiting on payment keeps them
     BROKER_URL: str = "redis://localhost:6379/0"
     SENTRY_DSN: HttpUrl | None = None
 
@@ -84,6 +88,8 @@ class Settings(BaseSettings):
     MEILI_MASTER_KEY: str = "masterKey"
     MEILI_HOST: str = "http://meilisearch:7700"
     MEILI_PRODUCTS_INDEX: str = ""
+    MEILI_TIMEOUT: float = 5.0
+    MEILI_MAX_CONNECTIONS: int = 100
 
     SLACK_ALERTS: str = "https://hooks.slack.com/services/YOUR/WEBHOOK/URL"
     SLACK_ORDERS: str = "https://hooks.slack.com/services/YOUR/WEBHOOK/URL"
@@ -111,11 +117,15 @@ class Settings(BaseSettings):
     CLOUDFLARE_R2_PUBLIC_URL: str = ""
 
     BREVO_API_KEY: str = "key"
+    BREVO_API_URL: str = "https://api.brevo.com/v3"
     VERCEL_API_TOKEN: str = ""
     VERCEL_PROJECT_ID: str = ""
 
     CF_API_TOKEN: str = ""
     CF_ZONE_ID: str = ""
+    # overridable so tests can point purges at a local stub
+    CF_API_URL: str = "https://api.cloudflare.com/client/v4"
+    VERCEL_API_URL: str = "https://api.vercel.com"
 
     INTERNAL_WORKER_SECRET: str = ""
     EXTENSION_SECRET_KEY: str = "secret"
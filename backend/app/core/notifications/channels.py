@@ -3,15 +3,48 @@ from abc import ABC, abstractmethod
 from app.core.logging import logger
 from app.core.notifications.utils.push import send_notifications_to_subscribers
 from app.core.config import settings
-from app.core.utils import send_email_brevo
+from app.core.utils import send_email_brevo, send_email_brevo_batch
 from app.core.utils import send_email_smtp
 
+_http: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Keep-alive client shared by every channel in the process."""
+    global _http
+    if _http is None or _http.is_closed:
+        _http = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0, connect=3.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60.0),
+        )
+    return _http
+
+
+async def close_http_client() -> None:
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
 
 class NotificationChannel(ABC):
     @abstractmethod
     async def send(self, recipient: str, message: str, **kwargs) -> bool:
         pass
 
+    async def send_batch(self, messages: list[dict]) -> list[bool]:
+        """Send several {"recipient", "message", **kwargs} at once. Channels
+        with a bulk API override this; by default they go one by one."""
+        results = []
+        for item in messages:
+            kwargs = dict(item)
+            try:
+                results.append(await self.send(kwargs.pop("recipient", ""), kwargs.pop("message", ""), **kwargs))
+            except Exception as e:
+                logger.error(f"notification.batch_send_failed: {str(e)}")
+                results.append(False)
+        return results
+
 
 class EmailChannel(NotificationChannel):
     def __init__(self, smtp_host: str, smtp_port: int, username: str, password: str):
@@ -34,13 +67,33 @@ class EmailChannel(NotificationChannel):
                     email_to=recipient,
                     subject=kwargs.get("subject", "Notification"),
                     html_content=message,
-                    cc_list=kwargs.get("cc_list", [])
+                    cc_list=kwargs.get("cc_list", []),
+                    client=get_http_client(),
             )
             return True
         except Exception as e:
             logger.error(f"Email sending failed: {str(e)}")
             raise Exception(f"Email sending failed: {str(e)}")
 
+    async def send_batch(self, messages: list[dict]) -> list[bool]:
+        """One Brevo request for messages that share their cc list (the
+        outbox groups them by template)."""
+        if settings.ENVIRONMENT == "local" or len(messages) == 1:
+            return await super().send_batch(messages)
+        try:
+            await send_email_brevo_batch(
+                messages=[
+                    {"email_to": m["recipient"], "subject": m.get("subject", "Notification"), "html_content": m["message"]}
+                    for m in messages
+                ],
+                cc_list=messages[0].get("cc_list") or [],
+                client=get_http_client(),
+            )
+            return [True] * len(messages)
+        except Exception as e:
+            logger.error(f"Email batch sending failed: {str(e)}")
+            return [False] * len(messages)
+
 
 class SlackChannel(NotificationChannel):
     def __init__(self, webhook_url: str):
@@ -52,13 +105,11 @@ class SlackChannel(NotificationChannel):
             if not slack_payload:
                 slack_payload = {"text": message}
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.webhook_url, 
-                    json=slack_payload, 
-                    headers={"Content-Type": "application/json"},
-                    timeout=10
-                )
+            response = await get_http_client().post(
+                self.webhook_url,
+                json=slack_payload,
+                headers={"Content-Type": "application/json"},
+            )
             return response.status_code == 200
         except Exception as e:
             logger.error(f"slack.send_failed: {str(e)}")
@@ -85,8 +136,7 @@ class WhatsAppChannel(NotificationChannel):
                 "type": "text",
                 "text": {"preview_url": True, "body": message},
             }
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=payload, headers=headers, timeout=10)
+            response = await get_http_client().post(url, json=payload, headers=headers)
             return 200 <= response.status_code < 300
         except Exception as e:
             logger.error(f"whatsapp.send_failed: {str(e)}")
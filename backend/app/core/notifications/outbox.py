@@ -0,0 +1,327 @@
+"""
+Redis-stream notification outbox.
+
+NotificationService.dispatch renders an event and appends one entry per
+channel to a stream; consumers in a consumer group read the stream in
+batches and send through the registered channels, which share one pooled
+HTTP client. Emails rendered from the same template are sent as Brevo
+batch requests instead of one request per recipient.
+
+Every entry carries an idempotency key. Enqueueing a key that was already
+queued within IDEMPOTENCY_TTL is a no-op, and a key marked as sent is
+acked without sending again, so a consumer dying between send and ack
+does not re-send once its entries are reclaimed. Failed sends move to a
+retry zset with exponential backoff and are dead-lettered after
+`max_attempts`.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import time
+import zlib
+from collections import defaultdict
+from typing import Any, Optional
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+STREAM_KEY = "notifications:outbox"
+GROUP = "notifiers"
+RETRY_KEY = "notifications:retry"              # zset: entry json -> due at
+DEAD_LETTER_KEY = "notifications:dead_letter"
+DEAD_LETTER_MAX = 1000
+QUEUED_KEY = "notifications:queued:{key}"
+SENT_KEY = "notifications:sent:{key}"
+IDEMPOTENCY_TTL = 3600
+BATCH_CHANNELS = {"email"}                     # channels with a bulk API
+MAX_BATCH_RECIPIENTS = 100                     # per bulk request; every recipient carries its own html
+COMPRESS_OVER = 2048                           # bytes
+
+# KEYS[1] is the stream, KEYS[2..] the entries' queued markers; ARGV[1] is
+# the marker TTL, ARGV[2..] the packed entries. The marker and the XADD
+# happen together, so a failed enqueue never leaves a marker behind that
+# would drop the caller's retry as a duplicate.
+_ENQUEUE_SCRIPT = """
+local added = 0
+for i = 2, #KEYS do
+    if redis.call('SET', KEYS[i], 1, 'NX', 'EX', ARGV[1]) then
+        redis.call('XADD', KEYS[1], '*', 'data', ARGV[i])
+        added = added + 1
+    end
+end
+return added
+"""
+
+
+def idempotency_key(channel: str, template: str, recipient: str, message: str, kwargs: dict) -> str:
+    """Same channel, template, recipient and content -> same key."""
+    digest = hashlib.sha1()
+    for part in (channel, template, recipient, message, json.dumps(kwargs, sort_keys=True, default=str)):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _pack(entry: dict) -> dict[str, str]:
+    message = entry.get("message") or ""
+    fields = {k: v for k, v in entry.items() if k != "message"}
+    if len(message) > COMPRESS_OVER:
+        fields["z"] = base64.b64encode(zlib.compress(message.encode(), 6)).decode()
+    else:
+        fields["message"] = message
+    return {"data": json.dumps(fields, default=str)}
+
+
+def _unpack(fields: dict[str, str]) -> dict:
+    entry = json.loads(fields["data"])
+    if "z" in entry:
+        entry["message"] = zlib.decompress(base64.b64decode(entry.pop("z"))).decode()
+    return entry
+
+
+class NotificationOutbox:
+    """Durable queue between NotificationService and its channels.
+
+    One instance per process, started in the app lifespan. `channels` is the
+    service's channel registry, looked up at send time. Enqueues go through
+    the shared `redis` client; the blocking stream reads and maintenance use
+    `reader` when given, so they never starve producers of connections.
+    """
+
+    def __init__(
+        self,
+        channels: dict[str, Any],
+        consumers: int = 2,
+        batch_size: int = 200,
+        block_ms: int = 1000,
+        concurrency: int = 50,
+        max_attempts: int = 6,
+        retry_backoff: float = 5.0,
+        poll_interval: float = 1.0,
+        claim_after_ms: int = 60_000,
+        consumer_prefix: Optional[str] = None,
+    ) -> None:
+        self.channels = channels
+        self.consumers = consumers
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.poll_interval = poll_interval
+        self.claim_after_ms = claim_after_ms
+        self.consumer_prefix = consumer_prefix or f"notifier-{random.getrandbits(32):08x}"
+        self._redis: Optional[Redis] = None
+        self._reader: Optional[Redis] = None
+        self._tasks: list[asyncio.Task] = []
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._stats = {
+            "enqueued": 0,
+            "duplicates": 0,
+            "sent": 0,
+            "already_sent": 0,
+            "batch_requests": 0,
+            "retries": 0,
+            "dead_lettered": 0,
+            "reclaimed": 0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self, redis: Redis, reader: Optional[Redis] = None) -> None:
+        self._redis = redis
+        self._reader = reader or redis
+        try:
+            await redis.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._tasks = [
+            asyncio.create_task(self._consume(f"{self.consumer_prefix}-{i}"))
+            for i in range(self.consumers)
+        ]
+        self._tasks.append(asyncio.create_task(self._maintain(f"{self.consumer_prefix}-0")))
+
+    async def stop(self) -> None:
+        """Stop reading. Unacked entries stay pending and are reclaimed by
+        the next consumer to start."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # -- producers -----------------------------------------------------
+
+    async def enqueue(self, entries: list[dict]) -> int:
+        """Append {"channel", "template", "message", "kwargs", "key"} entries
+        to the stream, skipping keys already queued. Returns how many were
+        added."""
+        if not entries:
+            return 0
+        now = time.time()
+        script = self._redis.register_script(_ENQUEUE_SCRIPT)
+        added = int(await script(
+            keys=[STREAM_KEY, *(QUEUED_KEY.format(key=entry["key"]) for entry in entries)],
+            args=[IDEMPOTENCY_TTL, *(_pack({**entry, "attempt": 1, "queued_at": now})["data"] for entry in entries)],
+        ))
+        self._stats["enqueued"] += added
+        self._stats["duplicates"] += len(entries) - added
+        return added
+
+    # -- consumers -----------------------------------------------------
+
+    async def _consume(self, consumer: str) -> None:
+        while True:
+            try:
+                res = await self._reader.xreadgroup(
+                    GROUP, consumer, {STREAM_KEY: ">"}, count=self.batch_size, block=self.block_ms
+                )
+                for _, messages in res or []:
+                    await self._process(messages)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[Notify] Outbox consumer {consumer} failed: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _maintain(self, consumer: str) -> None:
+        """Move due retries back onto the stream and take over entries left
+        pending by consumers that died."""
+        while True:
+            try:
+                await self.promote_retries()
+                _, claimed, *_ = await self._reader.xautoclaim(
+                    STREAM_KEY, GROUP, consumer, min_idle_time=self.claim_after_ms, count=self.batch_size
+                )
+                if claimed:
+                    self._stats["reclaimed"] += len(claimed)
+                    await self._process([m for m in claimed if m[1]])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[Notify] Outbox maintenance failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def promote_retries(self) -> int:
+        redis = self._reader
+        due = await redis.zrangebyscore(RETRY_KEY, "-inf", time.time(), start=0, num=self.batch_size)
+        if not due:
+            return 0
+        async with redis.pipeline(transaction=False) as pipe:
+            for raw in due:
+                pipe.zrem(RETRY_KEY, raw)
+            owned = await pipe.execute()
+        async with redis.pipeline(transaction=False) as pipe:
+            for raw, mine in zip(due, owned, strict=True):
+                if mine:  # another process may have promoted it first
+                    pipe.xadd(STREAM_KEY, {"data": raw})
+            return len(await pipe.execute())
+
+    async def _process(self, messages: list[tuple[str, dict]]) -> None:
+        redis = self._reader
+        entries: list[tuple[str, dict]] = []
+        for msg_id, fields in messages:
+            try:
+                entries.append((msg_id, _unpack(fields)))
+            except Exception as e:
+                logger.error(f"[Notify] Dropping unreadable outbox entry {msg_id}: {e}")
+                await redis.xack(STREAM_KEY, GROUP, msg_id)
+                await redis.xdel(STREAM_KEY, msg_id)
+
+        async with redis.pipeline(transaction=False) as pipe:
+            for _, entry in entries:
+                pipe.exists(SENT_KEY.format(key=entry["key"]))
+            sent_before = await pipe.execute()
+        todo = [(msg_id, entry) for (msg_id, entry), done in zip(entries, sent_before, strict=True) if not done]
+        self._stats["already_sent"] += len(entries) - len(todo)
+
+        results = await self._send(todo)
+
+        async with redis.pipeline(transaction=False) as pipe:
+            for (_, entry), ok in zip(todo, results, strict=True):
+                if ok:
+                    self._stats["sent"] += 1
+                    pipe.set(SENT_KEY.format(key=entry["key"]), 1, ex=IDEMPOTENCY_TTL)
+                else:
+                    self._retry(pipe, entry)
+            ids = [msg_id for msg_id, _ in entries]
+            if ids:
+                pipe.xack(STREAM_KEY, GROUP, *ids)
+                pipe.xdel(STREAM_KEY, *ids)
+            await pipe.execute()
+
+    async def _send(self, todo: list[tuple[str, dict]]) -> list[bool]:
+        """Send entries, bulk where the channel allows it. Results are in
+        the order of `todo`."""
+        results: list[bool] = [False] * len(todo)
+        groups: dict[tuple, list[int]] = defaultdict(list)
+        singles: list[int] = []
+        for i, (_, entry) in enumerate(todo):
+            if entry["channel"] in BATCH_CHANNELS:
+                kwargs = entry.get("kwargs") or {}
+                groups[(entry["channel"], entry.get("template"), tuple(kwargs.get("cc_list") or []))].append(i)
+            else:
+                singles.append(i)
+
+        async def send_one(i: int) -> None:
+            entry = todo[i][1]
+            channel = self.channels.get(entry["channel"])
+            if channel is None:
+                logger.warning(f"[Notify] Channel {entry['channel']} not registered")
+                return
+            kwargs = dict(entry.get("kwargs") or {})
+            async with self._semaphore:
+                try:
+                    results[i] = bool(await channel.send(message=entry.get("message") or "", **kwargs))
+                except Exception as e:
+                    logger.error(f"[Notify] {entry['channel']} send failed: {e}")
+
+        async def send_group(channel_name: str, idx: list[int]) -> None:
+            channel = self.channels.get(channel_name)
+            if channel is None:
+                logger.warning(f"[Notify] Channel {channel_name} not registered")
+                return
+            batch = [{**(todo[i][1].get("kwargs") or {}), "message": todo[i][1].get("message") or ""} for i in idx]
+            async with self._semaphore:
+                self._stats["batch_requests"] += 1
+                try:
+                    for i, ok in zip(idx, await channel.send_batch(batch)):
+                        results[i] = bool(ok)
+                except Exception as e:
+                    logger.error(f"[Notify] {channel_name} batch send failed: {e}")
+
+        sends = [send_one(i) for i in singles]
+        for (channel_name, *_), idx in groups.items():
+            for start in range(0, len(idx), MAX_BATCH_RECIPIENTS):
+                sends.append(send_group(channel_name, idx[start:start + MAX_BATCH_RECIPIENTS]))
+        await asyncio.gather(*sends)
+        return results
+
+    def _retry(self, pipe: Any, entry: dict) -> None:
+        attempt = int(entry.get("attempt", 1))
+        if attempt >= self.max_attempts:
+            self._stats["dead_lettered"] += 1
+            logger.warning(f"[Notify] Giving up on {entry['channel']} notification {entry['key']} after {attempt} attempts")
+            pipe.lpush(DEAD_LETTER_KEY, _pack({**entry, "failed_at": time.time()})["data"])
+            pipe.ltrim(DEAD_LETTER_KEY, 0, DEAD_LETTER_MAX - 1)
+            return
+        self._stats["retries"] += 1
+        delay = self.retry_backoff * 2 ** (attempt - 1) * (1 + random.random() / 2)
+        pipe.zadd(RETRY_KEY, {_pack({**entry, "attempt": attempt + 1})["data"]: time.time() + delay})
+
+    # -- introspection -------------------------------------------------
+
+    async def snapshot(self) -> dict:
+        redis = self._redis
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.xlen(STREAM_KEY)
+            pipe.zcard(RETRY_KEY)
+            pipe.llen(DEAD_LETTER_KEY)
+            backlog, retrying, dead = await pipe.execute()
+        return {**self._stats, "running": self.running, "backlog": backlog, "retrying": retrying, "dead_letter": dead}
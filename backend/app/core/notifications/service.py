@@ -10,6 +10,7 @@ from app.core.notifications.events import (
     SendAbandonedCartEvent,
     SendPushNotificationEvent,
 )
+from app.core.notifications.outbox import NotificationOutbox, idempotency_key
 from app.core.notifications.templates import TemplateEngine
 
 
@@ -20,6 +21,7 @@ class NotificationService:
     def __init__(self, template_engine: TemplateEngine):
         self.channels: dict[str, NotificationChannel] = {}
         self.templates = template_engine
+        self.outbox = NotificationOutbox(channels=self.channels)
         self._registry: dict[type, dict] = {
             OrderConfirmedEvent: {
                 "template": "order_confirmed",
@@ -43,10 +45,14 @@ class NotificationService:
         self.channels[name] = channel
 
 
-    async def dispatch(self, event: BaseNotificationEvent) -> dict[str, bool] | None:
+    async def dispatch(self, event: BaseNotificationEvent, idempotency_key: str | None = None) -> dict[str, bool] | None:
         """
         Dispatch a notification event.
         Returns a result map e.g. {"email": True, "slack": False}.
+
+        While the outbox is running the rendered message is queued and the
+        map says which channels it was queued for; otherwise it is sent
+        inline. `idempotency_key` overrides the content-derived key.
         """
         event_type = type(event)
         handler_config = self._registry.get(event_type)
@@ -69,6 +75,9 @@ class NotificationService:
             logger.error(f"Exception......{e}")
             return {}
 
+        if self.outbox.running:
+            return await self._enqueue(handler_config, message, send_kwargs, idempotency_key)
+
         tasks = []
         for channel in handler_config["channels"]:
             tasks.append(self._dispatch_single(channel, message, send_kwargs))
@@ -77,6 +86,29 @@ class NotificationService:
         return dict[str, bool](results_list)
 
 
+    async def _enqueue(self, handler_config: dict, message: str, send_kwargs: dict, key: str | None) -> dict[str, bool]:
+        entries = []
+        results = {}
+        for channel in handler_config["channels"]:
+            results[channel] = channel in self.channels
+            if not results[channel]:
+                continue
+            entries.append({
+                "channel": channel,
+                "template": handler_config["template"],
+                "message": message,
+                "kwargs": send_kwargs,
+                "key": f"{key}:{channel}" if key else idempotency_key(
+                    channel, handler_config["template"], send_kwargs.get("recipient", ""), message, send_kwargs
+                ),
+            })
+        try:
+            await self.outbox.enqueue(entries)
+        except Exception as e:
+            logger.error(f"notification.enqueue_failed for {handler_config['template']}: {str(e)}")
+            return {channel: False for channel in results}
+        return results
+
     async def _dispatch_single(self, channel_name, message, send_kwargs) -> tuple[str, bool]:
         channel = self.channels.get(channel_name)
 
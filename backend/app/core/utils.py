@@ -1,3 +1,4 @@
+import asyncio
 import httpx
 import random
 import string
@@ -8,7 +9,7 @@ from typing import Any
 
 import emails  # type: ignore
 from fastapi import Request
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
 from app.core.config import settings
 from app.core.logging import logger
 from app.models.coupon import Coupon
@@ -78,17 +79,73 @@ def slugify(text) -> str:
     return slug
 
 
+class EmailTemplates:
+    """
+    Process-wide registry of the compiled templates in email-templates/build.
+
+    One Environment is built on first use; compiled templates stay in its
+    cache and their bytecode is cached on disk, so new processes skip the
+    compile too. Templates are only re-read from disk locally.
+    """
+
+    def __init__(self, path: Path, auto_reload: bool = False, batch_size: int = 200) -> None:
+        self.path = path
+        self.auto_reload = auto_reload
+        self.batch_size = batch_size
+        self._env: Environment | None = None
+
+    @property
+    def env(self) -> Environment:
+        if self._env is None:
+            env = Environment(
+                loader=FileSystemLoader(self.path),
+                auto_reload=self.auto_reload,
+                cache_size=-1,
+                bytecode_cache=FileSystemBytecodeCache(pattern="botcommerce-email-%s.cache"),
+            )
+            env.filters["naira"] = format_naira
+            env.filters["image"] = format_image
+            env.filters["date"] = format_date
+            env.filters["normalize_image"] = normalize_image
+            env.filters["discount"] = format_discount
+            self._env = env
+        return self._env
+
+    def warm(self) -> int:
+        """Compile every template up front. Returns how many were loaded."""
+        names = self.env.list_templates(filter_func=lambda name: name.endswith(".html"))
+        for name in names:
+            self.env.get_template(name)
+        return len(names)
+
+    def get(self, template_name: str) -> Template:
+        return self.env.get_template(template_name)
+
+    def render(self, template_name: str, context: dict[str, Any]) -> str:
+        return self.get(template_name).render(context)
+
+    async def render_async(self, template_name: str, context: dict[str, Any]) -> str:
+        """Render off the event loop."""
+        return await asyncio.to_thread(self.render, template_name, context)
+
+    async def render_many(self, template_name: str, contexts: list[dict[str, Any]]) -> list[str]:
+        """Render one template for many contexts, `batch_size` per thread hop."""
+        template = self.get(template_name)
+        rendered: list[str] = []
+        for start in range(0, len(contexts), self.batch_size):
+            chunk = contexts[start:start + self.batch_size]
+            rendered += await asyncio.to_thread(lambda: [template.render(context) for context in chunk])
+        return rendered
+
+
+email_templates = EmailTemplates(
+    Path(__file__).parent.parent / "email-templates" / "build",
+    auto_reload=settings.ENVIRONMENT == "local",
+)
+
+
 def render_email_template(*, template_name: str, context: dict[str, Any]) -> str:
-    template_path = Path(__file__).parent.parent / "email-templates" / "build"
-    env = Environment(loader=FileSystemLoader(template_path))
-    env.filters["naira"] = format_naira
-    env.filters["image"] = format_image
-    env.filters["date"] = format_date
-    env.filters["normalize_image"] = normalize_image
-    env.filters["discount"] = format_discount
-    # Load and render the template
-    template = env.get_template(template_name)
-    return template.render(context)
+    return email_templates.render(template_name, context)
 
 
 async def send_email_smtp(
@@ -143,6 +200,7 @@ async def send_email_brevo(
     subject: str = "",
     html_content: str = "",
     cc_list: list[str] = [],
+    client: httpx.AsyncClient | None = None,
 ) -> None:
     """
     Send email via Brevo (formerly Sendinblue) API
@@ -195,13 +253,16 @@ async def send_email_brevo(
     logger.debug(f"Sending email via Brevo to: {email_to}")
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.brevo.com/v3/smtp/email",
-                json=payload,
-                headers=headers,
-                timeout=30
-            )
+        if client is not None:
+            response = await client.post(f"{settings.BREVO_API_URL}/smtp/email", json=payload, headers=headers, timeout=30)
+        else:
+            async with httpx.AsyncClient() as client:
+                response = await client.post(
+                    f"{settings.BREVO_API_URL}/smtp/email",
+                    json=payload,
+                    headers=headers,
+                    timeout=30
+                )
 
         if response.status_code == 201:
             response_data = response.json()
@@ -224,6 +285,81 @@ async def send_email_brevo(
         raise Exception(f"Brevo email sending failed: {str(e)}")
 
 
+async def send_email_brevo_batch(
+    *,
+    messages: list[dict],
+    cc_list: list[str] = [],
+    client: httpx.AsyncClient | None = None,
+) -> None:
+    """
+    Send many emails through one Brevo batch request.
+
+    `messages` are {"email_to", "subject", "html_content"}. The first message
+    is the request body and every recipient is a messageVersion, which only
+    overrides subject/htmlContent where they differ from it. Brevo accepts
+    the whole batch or none of it.
+    """
+
+    if not settings.EMAILS_ENABLED:
+        logger.warning("Emails disabled via EMAILS_ENABLED setting")
+        return
+
+    messages = [m for m in messages if not m["email_to"].lower().endswith("@guest.com")]
+    if not messages:
+        return
+
+    if not settings.BREVO_API_KEY:
+        logger.error("BREVO_API_KEY not configured")
+        raise Exception("BREVO_API_KEY not configured")
+
+    base = messages[0]
+    versions = []
+    for message in messages:
+        version: dict[str, Any] = {"to": [{"email": message["email_to"]}]}
+        if message["subject"] != base["subject"]:
+            version["subject"] = message["subject"]
+        if message["html_content"] != base["html_content"]:
+            version["htmlContent"] = message["html_content"]
+        versions.append(version)
+
+    payload = {
+        "sender": {
+            "name": settings.EMAILS_FROM_NAME,
+            "email": settings.EMAILS_FROM_EMAIL
+        },
+        "subject": base["subject"],
+        "htmlContent": base["html_content"] or base["subject"],
+        "messageVersions": versions,
+    }
+    if cc_list:
+        payload["cc"] = [{"email": email} for email in cc_list]
+
+    headers = {
+        "Accept": "application/json",
+        "Content-Type": "application/json",
+        "api-key": settings.BREVO_API_KEY
+    }
+
+    logger.debug(f"Sending {len(versions)} emails via Brevo batch")
+
+    try:
+        if client is not None:
+            response = await client.post(f"{settings.BREVO_API_URL}/smtp/email", json=payload, headers=headers, timeout=60)
+        else:
+            async with httpx.AsyncClient() as client:
+                response = await client.post(f"{settings.BREVO_API_URL}/smtp/email", json=payload, headers=headers, timeout=60)
+    except httpx.TimeoutException:
+        logger.error("Brevo API batch request timed out")
+        raise Exception("Brevo API request timed out")
+    except httpx.RequestError as e:
+        logger.error(f"Brevo API batch request failed: {str(e)}")
+        raise Exception(f"Brevo API request failed: {str(e)}")
+
+    if response.status_code != 201:
+        logger.critical(f"Brevo API error: {response.status_code} - {response.text}")
+        raise Exception(f"Brevo API error: {response.status_code} - {response.text}")
+
+
 def generate_sku(prefix: str = "PRD") -> str:
     """
     Generate a unique product SKU.
@@ -0,0 +1,87 @@
+import json
+from datetime import datetime
+from typing import Any, Protocol
+
+import orjson
+import zstandard
+
+# Every binary payload starts with one format byte. Legacy entries are plain
+# JSON text, which can never start with one of these, so decode() can read
+# both old and new entries from the same keyspace.
+FORMAT_ORJSON = 0x01
+FORMAT_ORJSON_ZSTD = 0x02
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+_decompressor = zstandard.ZstdDecompressor()
+
+
+def _json_default(o: Any) -> Any:
+    if isinstance(o, datetime):
+        return o.isoformat()
+    if isinstance(o, bytes):
+        try:
+            return o.decode('utf-8')
+        except UnicodeDecodeError:
+            return o.hex()
+    if hasattr(o, '__dict__'):
+        return o.__dict__
+    return str(o)
+
+
+class EnhancedJSONEncoder(json.JSONEncoder):
+    def default(self, o):
+        return _json_default(o)
+
+
+class CacheCodec(Protocol):
+    def encode(self, value: Any) -> bytes | str: ...
+
+    def decode(self, raw: bytes | str) -> Any: ...
+
+
+def decode_payload(raw: bytes | str) -> Any:
+    """Decodes any payload written by a CacheCodec, including legacy JSON text."""
+    if isinstance(raw, bytes) and raw:
+        fmt = raw[0]
+        if fmt == FORMAT_ORJSON:
+            return orjson.loads(raw[1:])
+        if fmt == FORMAT_ORJSON_ZSTD:
+            return orjson.loads(_decompressor.decompress(raw[1:]))
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        # json.dumps emits NaN/Infinity, which orjson rejects
+        return json.loads(raw)
+
+
+class JsonCodec:
+    """The original format: UTF-8 JSON text via EnhancedJSONEncoder."""
+
+    def encode(self, value: Any) -> str:
+        return json.dumps(value, cls=EnhancedJSONEncoder)
+
+    def decode(self, raw: bytes | str) -> Any:
+        return decode_payload(raw)
+
+
+class BinaryCodec:
+    """orjson, zstd-compressed once the serialized payload reaches
+    `compress_threshold` bytes. Small payloads skip compression — the
+    frame overhead and CPU aren't worth it below a few KB."""
+
+    def __init__(self, compress_threshold: int = 4096, level: int = 3) -> None:
+        self.compress_threshold = compress_threshold
+        self._compressor = zstandard.ZstdCompressor(level=level)
+
+    def encode(self, value: Any) -> bytes:
+        try:
+            body = orjson.dumps(value, default=_json_default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            # e.g. integers beyond 64 bits — fall back to the stdlib encoder
+            body = json.dumps(value, cls=EnhancedJSONEncoder).encode()
+        if len(body) >= self.compress_threshold:
+            return bytes([FORMAT_ORJSON_ZSTD]) + self._compressor.compress(body)
+        return bytes([FORMAT_ORJSON]) + body
+
+    def decode(self, raw: bytes | str) -> Any:
+        return decode_payload(raw)
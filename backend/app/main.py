@@ -1,4 +1,5 @@
 from typing import Any, Dict
+import gzip
 import time
 import asyncio
 import sentry_sdk
@@ -12,7 +13,6 @@ from pydantic import BaseModel
 from arq.connections import ArqRedis
 import redis.asyncio as redis
 from contextlib import asynccontextmanager
-from xml.etree.ElementTree import Element, SubElement, tostring
 
 from app.api.main import api_router
 from app.core.config import settings
@@ -23,11 +23,21 @@ from app.services.websocket import manager
 from app.core.logging import get_logger
 from app.core.deps import Notification
 from app.core.dependencies.product import SearchDep
+from app.core.notifications.channels import close_http_client
+from app.core.utils import email_templates
 from app.core.notifications.setup import init_notification_service
 from app.core.dependencies.services import SettingsDep
-from app.services.cache import L1Cache, run_l1_invalidation_listener
+from app.services.cache import CacheService, L1Cache, run_l1_invalidation_listener
+from app.services.cdn import CdnService
+from app.services.cdn_purge import cdn_purge_queue
+from app.services.invalidation import product_invalidation_bus
+from app.services.product import ProductService
+from app.services.search import SearchService
+from app.services.meili import meili
+from app.services.index_queue import search_index_queue
+from app.services.sitemap import SitemapService
 from app.lib.cache import add_cache_headers
-from app.core.dependencies.cache import ArqDep, CdnDep
+from app.core.dependencies.cache import ArqDep, CacheDep, CdnDep
 from app.utils.emails import generate_contact_form_email, generate_newsletter_email, generate_bulk_purchase_email
 
 logger = get_logger(__name__)
@@ -40,8 +50,22 @@ async def lifespan(app: FastAPI):
     app.state.redis = redis.from_url(settings.REDIS_URL, decode_responses=True, max_connections=10)
     app.state.l1_cache = L1Cache(max_size=5000, ttl=60.0)
 
-    init_notification_service(redis=app.state.redis, db=prisma)
-    await manager.start()
+    notification_srv = init_notification_service(redis=app.state.redis, db=prisma)
+    # blocking stream reads and maintenance get their own connections; enqueues use the shared pool
+    app.state.notify_redis = redis.from_url(settings.REDIS_URL, decode_responses=True, max_connections=notification_srv.outbox.consumers + 2)
+    await notification_srv.outbox.start(app.state.redis, reader=app.state.notify_redis)
+    await manager.start(app.state.redis)
+    search_index_queue.start(meili, app.state.redis)
+    cdn_purge_queue.start()
+    await asyncio.to_thread(email_templates.warm)
+    # Checked once per process, in the background so a slow Meilisearch can't hold up boot
+    index_check_task = asyncio.create_task(SearchService().validate_index())
+    product_invalidation_bus.start(lambda: ProductService(
+        db=prisma,
+        search_srv=SearchService(),
+        cache_srv=CacheService(app.state.redis, l1=app.state.l1_cache),
+        cdn_srv=CdnService(),
+    ))
 
     listener_task = asyncio.create_task(
         run_l1_invalidation_listener(app.state.redis, app.state.l1_cache)
@@ -55,11 +79,18 @@ async def lifespan(app: FastAPI):
 
     yield
 
-    if manager.cleanup_task:
-        manager.cleanup_task.cancel()
+    await manager.stop()
+    await product_invalidation_bus.stop()
+    await search_index_queue.stop()
+    await cdn_purge_queue.stop()
+    await notification_srv.outbox.stop()
+    await close_http_client()
+    await meili.aclose()
     await prisma.disconnect()
 
     listener_task.cancel()
+    index_check_task.cancel()
+    await app.state.notify_redis.close()
     await app.state.redis.close()
 
 if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
@@ -263,45 +294,18 @@ async def log_error(payload: ErrorPayload, request: Request, background_tasks: B
 
 
 @app.get("/api/sitemap.xml", response_class=Response)
-async def generate_sitemap(request: Request, db: DbDep):
-    redis = request.app.state.redis
-    base_url: str = settings.FRONTEND_HOST.rstrip("/")
-
-    cached_sitemap = await redis.get("sitemap")
-    if cached_sitemap:
-        return Response(content=cached_sitemap, media_type="application/xml")
-
-    products = await db.query_raw(
-        'SELECT slug FROM "products" WHERE active = true'
-    )
-    categories = await db.query_raw(
-        'SELECT slug FROM "categories"'
-    )
-    collections = await db.query_raw(
-        'SELECT slug FROM "collections"'
-    )
-
-    urlset = Element("urlset", xmlns="http://www.sitemaps.org/schemas/sitemap/0.9")
-
-    home = SubElement(urlset, "url")
-    SubElement(home, "loc").text = f"{base_url}/"
-
-    for collection in collections:
-        url = SubElement(urlset, "url")
-        SubElement(url, "loc").text = f"{base_url}/collections/{collection['slug']}"
-
-    for category in categories:
-        url = SubElement(urlset, "url")
-        SubElement(url, "loc").text = f"{base_url}/collections?cat_ids={category['slug']}"
-
-    for product in products:
-        url = SubElement(urlset, "url")
-        SubElement(url, "loc").text = f"{base_url}/products/{product['slug']}"
-
-    xml_content = tostring(urlset, encoding="utf-8", method="xml")
-    xml_declaration = b'<?xml version="1.0" encoding="UTF-8"?>\n'
-    full_sitemap = xml_declaration + xml_content
-
-    await redis.setex("sitemap", 3600, full_sitemap)
-
-    return Response(content=full_sitemap, media_type="application/xml")
+async def generate_sitemap(request: Request, db: DbDep, cache_srv: CacheDep):
+    """Sitemap index; each shard is served gzip-compressed from Redis."""
+    sitemap_srv = SitemapService(db, cache_srv)
+    content = await sitemap_srv.get_index(lambda name: request.url_for("get_sitemap_shard", name=name))
+    return Response(content=content, media_type="application/xml")
+
+
+@app.get("/api/sitemap/{name}.xml", response_class=Response)
+async def get_sitemap_shard(name: str, request: Request, db: DbDep, cache_srv: CacheDep):
+    body = await SitemapService(db, cache_srv).get_shard(name)
+    if body is None:
+        return Response(status_code=404)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return Response(content=body, media_type="application/xml", headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"})
+    return Response(content=gzip.decompress(body), media_type="application/xml", headers={"Vary": "Accept-Encoding"})
@@ -1,4 +1,4 @@
-from typing import List, Optional, Literal
+from typing import Dict, List, Optional, Literal
 from pydantic import BaseModel, Field
 from prisma.enums import ProductStatus
 from app.models.collection import Collection
@@ -118,11 +118,26 @@ class ProductSearch(BaseModel):
     active: Optional[bool] = True
     is_new: Optional[bool] = False
 
+class PriceBucket(BaseModel):
+    min: int
+    max: Optional[int] = None
+    count: int
+
 class FeedProducts(BaseModel):
     products: List[ProductSearch]
     total_count: int
     limit: int
     next_cursor: str | None
+    # first page only
+    facets: Optional[Dict[str, Dict[str, int]]] = None
+    price_histogram: Optional[List[PriceBucket]] = None
+
+class FacetSnapshot(BaseModel):
+    scope: str
+    source: Literal["snapshot", "search"]
+    total: int
+    facets: Dict[str, Dict[str, int]]
+    price_histogram: List[PriceBucket]
 
 class SearchProducts(BaseModel):
     products: List[ProductSearch]
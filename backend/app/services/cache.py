@@ -1,14 +1,19 @@
 import json
 import inspect
+import os
 import time
+import uuid
 import asyncio
-from collections import OrderedDict
-from typing import Any, Callable, Union, Optional
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Union, Optional
 from fastapi import Request
 from redis.asyncio import Redis  # Explicit type hints for the team
-from datetime import datetime, timedelta
+from redis.client import NEVER_DECODE
+from datetime import timedelta
 from functools import wraps
+from app.core.config import settings
 from app.core.logging import get_logger
+from app.lib.codec import BinaryCodec, CacheCodec, JsonCodec
 from app.services.websocket import manager
 from app.lib.cache import set_public_cache
 
@@ -16,19 +21,70 @@ logger = get_logger(__name__)
 
 DEFAULT_EXPIRATION = int(timedelta(days=7).total_seconds())
 L1_INVALIDATE_CHANNEL = "cache:invalidate"
-
-class EnhancedJSONEncoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, datetime):
-            return o.isoformat()
-        if isinstance(o, bytes):
-            try:
-                return o.decode('utf-8')
-            except UnicodeDecodeError:
-                return o.hex()
-        if hasattr(o, '__dict__'):
-            return o.__dict__
-        return str(o)
+FRESH_MARKER_SUFFIX = ":fresh"
+LOCK_PREFIX = "lock:"
+LOCK_POLL_INTERVAL = 0.05
+
+# Compare-and-delete so a leader whose lock already expired can't release
+# the lock a newer leader is holding.
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# KEYS = explicit cache keys followed by tag:* sorted sets.
+# ARGV = now, number of explicit keys, L1 invalidation channel.
+# Drops expired tag members, deletes every live member plus the explicit
+# keys, publishes the evicted set for sibling L1s and returns it.
+_INVALIDATE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local explicit = tonumber(ARGV[2])
+local seen = {}
+local evicted = {}
+
+for i = 1, explicit do
+    if not seen[KEYS[i]] then
+        seen[KEYS[i]] = true
+        evicted[#evicted + 1] = KEYS[i]
+    end
+end
+
+for i = explicit + 1, #KEYS do
+    redis.call('ZREMRANGEBYSCORE', KEYS[i], 0, now)
+    local members = redis.call('ZRANGE', KEYS[i], 0, -1)
+    if #members > 0 then
+        for _, member in ipairs(members) do
+            if not seen[member] then
+                seen[member] = true
+                evicted[#evicted + 1] = member
+            end
+        end
+        redis.call('DEL', KEYS[i])
+    end
+end
+
+-- unpack() is bounded by the Lua C stack, so delete in chunks
+for i = 1, #evicted, 500 do
+    redis.call('DEL', unpack(evicted, i, math.min(i + 499, #evicted)))
+end
+
+if #evicted > 0 then
+    redis.call('PUBLISH', ARGV[3], cjson.encode(evicted))
+end
+return evicted
+"""
+
+
+def default_codec() -> CacheCodec:
+    if settings.CACHE_CODEC == "json":
+        return JsonCodec()
+    return BinaryCodec(compress_threshold=settings.CACHE_COMPRESS_THRESHOLD)
+
+
+# Codecs are stateless apart from the reusable zstd compressor
+_default_codec = default_codec()
 
 
 class L1Cache:
@@ -68,6 +124,68 @@ class L1Cache:
         self._store.clear()
 
 
+class CacheStats:
+    """Per-process counters for the cacheable decorator.
+
+    hit       — fresh value served from L1/Redis
+    miss      — nothing cached, this request became the in-process leader
+    stale     — past soft TTL, stale value served while a refresh runs
+    coalesced — waited on another request's in-flight load instead of
+                running the wrapped coroutine itself (same process, or a
+                sibling worker holding the Redis lock)
+    refresh   — background stale-while-revalidate refreshes started
+    """
+
+    def __init__(self) -> None:
+        self._counts: Counter = Counter()
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        self._counts[name] += amount
+
+    def snapshot(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            **{name: self._counts.get(name, 0) for name in ("hit", "miss", "stale", "coalesced", "refresh")},
+        }
+
+    def reset(self) -> None:
+        self._counts.clear()
+
+
+cache_stats = CacheStats()
+
+# key -> future of the load currently running in this process
+_inflight: dict[str, asyncio.Future] = {}
+# strong refs so background refreshes aren't garbage-collected mid-flight
+_background_refreshes: set[asyncio.Task] = set()
+
+
+async def single_flight(key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+    """Run `load` at most once per key per process. Concurrent callers for
+    the same key await the leader's result (or exception) instead of
+    re-running it."""
+    pending = _inflight.get(key)
+    if pending is not None:
+        cache_stats.incr("coalesced")
+        return await asyncio.shield(pending)
+
+    future: asyncio.Future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await load()
+    except BaseException as e:
+        future.set_exception(e)
+        # Mark retrieved so a leader failing with no followers doesn't log
+        # "exception was never retrieved".
+        future.exception()
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        _inflight.pop(key, None)
+
+
 async def run_l1_invalidation_listener(redis: Redis, l1: L1Cache) -> None:
     """Background task — one per worker process. Subscribes to the
     invalidation channel and evicts matching keys from this process's L1.
@@ -94,9 +212,12 @@ async def run_l1_invalidation_listener(redis: Redis, l1: L1Cache) -> None:
 
 
 class CacheService:
-    def __init__(self, redis: Redis, l1: Optional[L1Cache] = None) -> None:
+    def __init__(self, redis: Redis, l1: Optional[L1Cache] = None, codec: Optional[CacheCodec] = None) -> None:
         self.redis = redis
         self.l1 = l1  # None disables L1 for this call site (e.g. sessions)
+        # Payloads may be binary, so reads bypass the client's
+        # decode_responses with NEVER_DECODE and go through the codec.
+        self.codec = codec or _default_codec
 
     async def clear_cache(self) -> None:
         """Clear the entire Redis database and every process's L1 cache."""
@@ -118,10 +239,10 @@ class CacheService:
                 logger.debug(f"[Cache] L1 HIT: {key}")
                 return hit
         try:
-            cached = await self.redis.get(key)
+            cached = await self.redis.execute_command("GET", key, **{NEVER_DECODE: True})
             if cached is None:
                 return None
-            value = json.loads(cached)
+            value = self.codec.decode(cached)
             if self.l1 is not None:
                 self.l1.set(key, value)
             return value
@@ -129,6 +250,46 @@ class CacheService:
             logger.error(f"[Cache] Read failure for key '{key}': {e}", exc_info=True)
             return None
 
+    async def get_swr(self, key: str) -> tuple[Optional[Any], bool]:
+        """Like get(), but also reports whether the value is past its soft TTL.
+        Returns (value, is_stale). L1 hits are always treated as fresh —
+        L1's TTL is far shorter than any soft TTL."""
+        if self.l1 is not None:
+            hit = self.l1.get(key)
+            if hit is not None:
+                return hit, False
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.execute_command("GET", key, **{NEVER_DECODE: True})
+                pipe.exists(f"{key}{FRESH_MARKER_SUFFIX}")
+                cached, fresh = await pipe.execute()
+            if cached is None:
+                return None, False
+            value = self.codec.decode(cached)
+            if fresh and self.l1 is not None:
+                self.l1.set(key, value)
+            return value, not fresh
+        except Exception as e:
+            logger.error(f"[Cache] Read failure for key '{key}': {e}", exc_info=True)
+            return None, False
+
+    async def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        """Cross-worker mutex. Returns a token on success, None if another
+        worker holds it (or Redis is unreachable)."""
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self.redis.set(f"{LOCK_PREFIX}{key}", token, nx=True, px=int(ttl * 1000))
+            return token if acquired else None
+        except Exception as e:
+            logger.error(f"[Cache] Lock acquire failed for key '{key}': {e}", exc_info=True)
+            return None
+
+    async def release_lock(self, key: str, token: str) -> None:
+        try:
+            await self.redis.eval(_RELEASE_LOCK_SCRIPT, 1, f"{LOCK_PREFIX}{key}", token)
+        except Exception as e:
+            logger.error(f"[Cache] Lock release failed for key '{key}': {e}", exc_info=True)
+
     async def set_session(self, session_id: str, data: dict, ttl=60 * 60 * 24 * 30):
         await self.redis.setex(f"session:{session_id}", ttl, json.dumps(data))
 
@@ -139,24 +300,33 @@ class CacheService:
     async def delete_session(self, session_id: str):
         await self.redis.delete(f"session:{session_id}")
 
-    async def set_with_tags(self, key: str, value: Any, expire: int, tags: list[str] = None) -> None:
+    async def set_with_tags(
+        self, key: str, value: Any, expire: int, tags: list[str] = None, stale_ttl: Optional[int] = None
+    ) -> None:
         """
         Writes data to Redis and indexes it under tags using a Sorted Set (ZSET).
         Uses timestamps as scores to allow effortless garbage collection of expired keys.
+
+        With stale_ttl, `expire` becomes the soft TTL: the value itself lives
+        for expire + stale_ttl (hard TTL) and a `<key>:fresh` marker lives for
+        `expire`. get_swr() reports the value as stale once the marker is gone.
         """
         tags = tags or []
         now = int(time.time())
-        expire_at = now + expire
+        hard_expire = expire + (stale_ttl or 0)
+        expire_at = now + hard_expire
 
         try:
-            serialized = json.dumps(value, cls=EnhancedJSONEncoder)
+            serialized = self.codec.encode(value)
 
             async with self.redis.pipeline(transaction=False) as pipe:
-                pipe.setex(key, expire, serialized)
+                pipe.setex(key, hard_expire, serialized)
+                if stale_ttl:
+                    pipe.setex(f"{key}{FRESH_MARKER_SUFFIX}", expire, 1)
                 for tag in tags:
                     tag_key = f"tag:{tag}"
                     pipe.zadd(tag_key, {key: expire_at})
-                    pipe.expire(tag_key, expire)
+                    pipe.expire(tag_key, hard_expire)
                 await pipe.execute()
 
             if self.l1 is not None:
@@ -164,56 +334,40 @@ class CacheService:
         except Exception as e:
             logger.error(f"[Cache] Write failure for key '{key}': {e}", exc_info=True)
 
-    async def invalidate(self, *keys: str, tags: list[str] | None = None) -> None:
+    async def invalidate(self, *keys: str, tags: list[str] | None = None) -> list[str]:
         """
         Surgically invalidates explicit keys and/or entire tag groups.
         Also evicts from this process's L1 and publishes to L1_INVALIDATE_CHANNEL
         so every sibling worker evicts its local copy.
 
+        Tag resolution, deletion and the L1 publish all happen server-side in
+        one Lua call (one round-trip, regardless of tag count or size).
+        Returns the concrete keys that were evicted.
+
         Usage:
             await service.invalidate("user:123", f"addresses:{id}")
             await service.invalidate(tags=["coupons", "products"])
         """
         tag_list = tags or []
-        now = int(time.time())
         valid_keys = [k for k in keys if k and k.strip()]
         invalidated_keys = list(valid_keys)
         invalidated_keys.extend(tag_list)
 
-        all_concrete_keys: set[str] = set(valid_keys)
-
-        if valid_keys:
-            try:
-                async with self.redis.pipeline(transaction=False) as pipe:
-                    pipe.delete(*valid_keys)
-                    await pipe.execute()
-            except Exception as e:
-                logger.error(f"[Cache] Explicit invalidation failed for keys {valid_keys}: {e}", exc_info=True)
-
-        for tag in tag_list:
-            tag_key = f"tag:{tag}"
+        evicted: list[str] = []
+        if valid_keys or tag_list:
             try:
-                async with self.redis.pipeline(transaction=False) as pipe:
-                    pipe.zremrangebyscore(tag_key, 0, now)
-                    pipe.zrange(tag_key, 0, -1)
-                    _, active_keys = await pipe.execute()
-
-                if active_keys:
-                    all_concrete_keys.update(active_keys)
-                    async with self.redis.pipeline(transaction=False) as pipe:
-                        pipe.delete(*active_keys)
-                        pipe.delete(tag_key)
-                        await pipe.execute()
+                # register_script only hashes locally; EVALSHA falls back to
+                # SCRIPT LOAD the first time a Redis instance sees it.
+                script = self.redis.register_script(_INVALIDATE_SCRIPT)
+                evicted = await script(
+                    keys=valid_keys + [f"tag:{tag}" for tag in tag_list],
+                    args=[int(time.time()), len(valid_keys), L1_INVALIDATE_CHANNEL],
+                )
             except Exception as e:
-                logger.error(f"[Cache] Tag invalidation failed for tag '{tag}': {e}", exc_info=True)
+                logger.error(f"[Cache] Invalidation failed for keys {valid_keys} tags {tag_list}: {e}", exc_info=True)
 
-        if all_concrete_keys:
-            if self.l1 is not None:
-                self.l1.delete(*all_concrete_keys)
-            try:
-                await self.redis.publish(L1_INVALIDATE_CHANNEL, json.dumps(list(all_concrete_keys)))
-            except Exception as e:
-                logger.error(f"[Cache] L1 invalidation publish failed: {e}", exc_info=True)
+        if evicted and self.l1 is not None:
+            self.l1.delete(*evicted)
 
         if invalidated_keys:
             await manager.broadcast_to_all(
@@ -222,6 +376,77 @@ class CacheService:
             )
             await asyncio.sleep(0.01)
 
+        return evicted
+
+
+def _cache_key(key_prefix: str, key_builder: Any, request: Request, kwargs: dict) -> str:
+    if callable(key_builder):
+        sig = inspect.signature(key_builder)
+        filtered_kwargs = {k: v for k, v in kwargs.items() if k in sig.parameters}
+        return f"{key_prefix}:{key_builder(**filtered_kwargs)}"
+    if isinstance(key_builder, str):
+        return f"{key_prefix}:{key_builder}"
+    if isinstance(key_builder, bool) and key_builder == False:
+        return f"{key_prefix}"
+    return f"{key_prefix}:{request.url.path}?{request.url.query}"
+
+
+def _resolve_tags(tags: Any, kwargs: dict) -> list[str]:
+    if callable(tags):
+        sig = inspect.signature(tags)
+        return tags(**{k: v for k, v in kwargs.items() if k in sig.parameters})
+    if isinstance(tags, list):
+        return tags
+    return []
+
+
+async def _load_with_lock(
+    cache: CacheService, key: str, lock_timeout: float, compute: Callable[[], Awaitable[Any]]
+) -> Any:
+    """Cross-worker half of a miss: the lock holder computes, everyone else
+    waits for its write rather than stampeding the backend."""
+    cache_stats.incr("miss")
+    token = await cache.acquire_lock(key, lock_timeout)
+    if token:
+        try:
+            return await compute()
+        finally:
+            await cache.release_lock(key, token)
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        cached = await cache.get(key)
+        if cached is not None:
+            cache_stats.incr("coalesced")
+            return cached
+    logger.warning(f"[Cache] Lock wait timed out for '{key}', loading without lock")
+    return await compute()
+
+
+async def _refresh(cache: CacheService, key: str, lock_timeout: float, compute: Callable[[], Awaitable[Any]]) -> None:
+    token = await cache.acquire_lock(key, lock_timeout)
+    if not token:
+        return  # another worker is already refreshing
+    cache_stats.incr("refresh")
+    try:
+        await compute()
+    except Exception as e:
+        logger.error(f"[Cache] Background refresh failed for '{key}': {e}", exc_info=True)
+    finally:
+        await cache.release_lock(key, token)
+
+
+def _schedule_refresh(cache: CacheService, key: str, lock_timeout: float, compute: Callable[[], Awaitable[Any]]) -> None:
+    """Stale-while-revalidate: refresh in the background, at most once per
+    key per process."""
+    refresh_key = f"{key}:refresh"
+    if refresh_key in _inflight:
+        return
+    task = asyncio.create_task(single_flight(refresh_key, lambda: _refresh(cache, key, lock_timeout, compute)))
+    _background_refreshes.add(task)
+    task.add_done_callback(_background_refreshes.discard)
+
 
 def cacheable(
     key_prefix: str,
@@ -230,8 +455,20 @@ def cacheable(
     tags: Optional[Union[list[str], Callable[..., list[str]]]] = None,
     cdn_ttl: Optional[int] = None,
     cdn_swr: int = 3600,
+    stale_ttl: Optional[int] = None,
+    lock_timeout: float = 10.0,
 ):
-    """Declarative route caching middleware supporting dynamic keys and tags."""
+    """Declarative route caching middleware supporting dynamic keys and tags.
+
+    Misses are single-flighted: concurrent requests for the same key in one
+    process share a single call of the wrapped coroutine, and across workers
+    a Redis lock (held for at most `lock_timeout` seconds) elects one leader
+    while the others poll for its result.
+
+    Pass `stale_ttl` to enable stale-while-revalidate: after `expire` seconds
+    the value is still served for up to `stale_ttl` more seconds while one
+    leader refreshes it in the background.
+    """
     def decorator(func: Callable[..., Any]):
         @wraps(func)
         async def wrapper(*args: Any, **kwargs: Any) -> Any:
@@ -243,37 +480,30 @@ def cacheable(
                 request.app.state.redis,
                 l1=getattr(request.app.state, "l1_cache", None),
             )
-
-            if callable(key_builder):
-                sig = inspect.signature(key_builder)
-                filtered_kwargs = {k: v for k, v in kwargs.items() if k in sig.parameters}
-                raw_key = f"{key_prefix}:{key_builder(**filtered_kwargs)}"
-            elif isinstance(key_builder, str):
-                raw_key = f"{key_prefix}:{key_builder}"
-            elif isinstance(key_builder, bool) and key_builder == False:
-                raw_key = f"{key_prefix}"
-            else:
-                raw_key = f"{key_prefix}:{request.url.path}?{request.url.query}"
-
+            raw_key = _cache_key(key_prefix, key_builder, request, kwargs)
             if cdn_ttl is not None:
                 set_public_cache(request, edge_ttl=cdn_ttl, swr=cdn_swr)
 
-            cached_data = await cache.get(raw_key)
-            if cached_data is not None:
-                return cached_data
-
-            result = await func(*args, **kwargs)
+            async def compute_and_store() -> Any:
+                result = await func(*args, **kwargs)
+                await cache.set_with_tags(
+                    key=raw_key, value=result, expire=expire, tags=_resolve_tags(tags, kwargs), stale_ttl=stale_ttl
+                )
+                return result
 
-            resolved_tags = []
-            if callable(tags):
-                sig = inspect.signature(tags)
-                filtered_tags_kwargs = {k: v for k, v in kwargs.items() if k in sig.parameters}
-                resolved_tags = tags(**filtered_tags_kwargs)
-            elif isinstance(tags, list):
-                resolved_tags = tags
+            if stale_ttl:
+                cached_data, is_stale = await cache.get_swr(raw_key)
+            else:
+                cached_data, is_stale = await cache.get(raw_key), False
 
-            await cache.set_with_tags(key=raw_key, value=result, expire=expire, tags=resolved_tags)
+            if cached_data is not None:
+                if is_stale:
+                    cache_stats.incr("stale")
+                    _schedule_refresh(cache, raw_key, lock_timeout, compute_and_store)
+                else:
+                    cache_stats.incr("hit")
+                return cached_data
 
-            return result
+            return await single_flight(raw_key, lambda: _load_with_lock(cache, raw_key, lock_timeout, compute_and_store))
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
@@ -9,6 +9,7 @@ from app.core.utils import generate_id
 from app.models.user import User
 from app.services.coupon import CouponService
 from app.models.cart import Cart
+from app.services.reservation import InventoryReservations
 
 logger = get_logger(__name__)
 
@@ -19,6 +20,7 @@ class CartService:
         self.settings_srv = settings_srv
         self.coupon_srv = coupon_srv
         self.cache_srv = cache_srv
+        self.reservations = InventoryReservations(cache_srv.redis)
 
     async def get_active_cart(self, cart_number: str | None = None, user_id: int | None = None, include_relations: bool = False) -> Cart | None:
         include_clause = {
@@ -126,6 +128,9 @@ class CartService:
         if quantity > variant.inventory:
             raise HTTPException(status_code=400, detail=f"Not enough inventory. Only {variant.inventory} items left.")
 
+        in_cart = sum(item.quantity for item in (getattr(cart, "items", None) or []) if item.variant_id == variant_id)
+        await self.hold_variant(cart, variant_id, in_cart + quantity, variant.inventory)
+
         return await self.db.cartitem.create(
             data={
                 "cart_id": cart.id,
@@ -140,6 +145,13 @@ class CartService:
             include={"variant": True}
         )
 
+    async def hold_variant(self, cart: Any, variant_id: int, quantity: int, inventory: int) -> None:
+        """Reserve `quantity` units of a variant for this cart (its total across
+        lines). Raises 400 when other carts already hold the rest."""
+        short = await self.reservations.hold(cart.id, {variant_id: quantity}, {variant_id: inventory})
+        if variant_id in short:
+            raise HTTPException(status_code=400, detail=f"Not enough inventory. Only {short[variant_id]} items left.")
+
     async def merge_guest_into_user_cart(self, user_id: int, cart_number: Optional[str] = None) -> None:
         if not cart_number:
             return
@@ -1,8 +1,17 @@
-from app.lib.cache import purge_cdn_urls, purge_vercel_tags
+from app.services.cdn_purge import cdn_purge_queue
 
 class CdnService:
+    """Purges go through the process's purge queue, which batches and
+    deduplicates them; callers don't wait for the CDN."""
+
     async def purge_cloudfare(self, *paths: str) -> None:
-        await purge_cdn_urls(*paths)
+        if cdn_purge_queue.running:
+            cdn_purge_queue.purge_paths(*paths)
+            return
+        await cdn_purge_queue.purge_now(paths=paths)
 
     async def purge_vercel(self, *tags: str) -> None:
-        await purge_vercel_tags(*tags)
\ No newline at end of file
+        if cdn_purge_queue.running:
+            cdn_purge_queue.purge_tags(*tags)
+            return
+        await cdn_purge_queue.purge_now(tags=tags)
@@ -0,0 +1,327 @@
+"""
+Coalesced CDN purges.
+
+One long-lived httpx client per process talks to Cloudflare and Vercel.
+Paths and tags purged within `window` seconds of each other are
+deduplicated and sent together, split to each provider's per-request
+limit (Cloudflare takes 30 files per purge call, and every path is one
+file per Origin it may be cached under). Each provider has a token bucket
+so bursts stay under its rate limit; 429s pause the bucket for the
+advertised Retry-After and 5xx/transport errors retry with backoff.
+"""
+import asyncio
+import random
+import time
+from typing import Any, Iterable, Optional
+import httpx
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+CF_MAX_FILES = 30       # files per purge_cache call
+VERCEL_MAX_TAGS = 16    # tags per invalidate-by-tags call
+CF_FILES_PER_SECOND = 800.0
+VERCEL_REQUESTS_PER_SECOND = 2.0
+
+
+def _resolve(waiters: list[asyncio.Future]) -> None:
+    for waiter in waiters:
+        if not waiter.done():
+            waiter.set_result(None)
+
+
+def _chunks(items: list, size: int) -> Iterable[list]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class RateLimiter:
+    """Token bucket: `rate` units per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, cost: float = 1.0) -> None:
+        cost = min(cost, self.burst)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= cost:
+                    self._tokens -= cost
+                    return
+                await asyncio.sleep((cost - self._tokens) / self.rate)
+
+
+class CdnPurgeQueue:
+    """Buffers Cloudflare path purges and Vercel tag purges and flushes them
+    as deduplicated, provider-sized batches over a shared connection pool.
+
+    One instance per worker process, started in the app lifespan. Before
+    start() (scripts, tests) purges are sent immediately on the same client.
+    """
+
+    def __init__(
+        self,
+        window: float = 0.5,
+        max_pending: int = 500,
+        max_attempts: int = 5,
+        retry_backoff: float = 0.5,
+        timeout: float = 5.0,
+        max_connections: int = 10,
+        cf_rate: float = CF_FILES_PER_SECOND,
+        vercel_rate: float = VERCEL_REQUESTS_PER_SECOND,
+    ) -> None:
+        self.window = window
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.cf_limiter = RateLimiter(cf_rate, burst=max(cf_rate, CF_MAX_FILES))
+        self.vercel_limiter = RateLimiter(vercel_rate, burst=max(vercel_rate, 1.0))
+        self._http: Optional[httpx.AsyncClient] = None
+        self._running = False
+        self._paths: dict[str, float] = {}  # path -> first queued at
+        self._tags: dict[str, float] = {}
+        self._waiters: list[asyncio.Future] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._flushes: set[asyncio.Task] = set()
+        self._inflight = 0  # purge requests sent or waiting to be sent
+        self._stats = {
+            "flushes": 0,
+            "requests": 0,
+            "paths_purged": 0,
+            "tags_purged": 0,
+            "deduplicated": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "failed": 0,
+            "batches_acked": 0,
+            "last_latency_ms": 0.0,
+            "max_latency_ms": 0.0,
+            "total_latency_ms": 0.0,
+        }
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 2.0)),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60.0,
+                ),
+                http2=True,
+            )
+        return self._http
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self) -> None:
+        self._running = True
+
+    async def stop(self) -> None:
+        """Send whatever is still buffered, then close the client."""
+        self._running = False
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        await self._flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    # -- producers -----------------------------------------------------
+
+    def purge_paths(self, *paths: str) -> asyncio.Future:
+        return self._submit(self._paths, paths)
+
+    def purge_tags(self, *tags: str) -> asyncio.Future:
+        return self._submit(self._tags, tags)
+
+    def _submit(self, pending: dict[str, float], items: Iterable[str]) -> asyncio.Future:
+        """Queue items for the next flush. The returned future resolves once
+        the batch holding them has been purged (or given up on)."""
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        now = time.time()
+        for item in items:
+            if not item:
+                continue
+            if item in pending:
+                self._stats["deduplicated"] += 1
+            else:
+                pending[item] = now
+        self._waiters.append(future)
+
+        if len(self._paths) + len(self._tags) >= self.max_pending:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            self._spawn_flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_after_window())
+        return future
+
+    async def purge_now(self, paths: Iterable[str] = (), tags: Iterable[str] = ()) -> None:
+        """Purge without buffering."""
+        now = time.time()
+        await self._send({p: now for p in paths if p}, {t: now for t in tags if t})
+
+    def _spawn_flush(self) -> None:
+        task = asyncio.create_task(self._flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush_after_window(self) -> None:
+        await asyncio.sleep(self.window)
+        self._timer = None
+        await self._flush()
+
+    async def _flush(self) -> None:
+        paths, tags, waiters = self._paths, self._tags, self._waiters
+        self._paths, self._tags, self._waiters = {}, {}, []
+        try:
+            if paths or tags:
+                self._stats["flushes"] += 1
+                await self._send(paths, tags)
+        finally:
+            _resolve(waiters)
+
+    # -- providers -----------------------------------------------------
+
+    async def _send(self, paths: dict[str, float], tags: dict[str, float]) -> None:
+        sends = []
+        if paths and self._cloudflare_enabled():
+            # Responses vary on Origin, so each path is cached once per origin
+            origins = [settings.FRONTEND_HOST, settings.DOMAIN]
+            files = [
+                ({"url": f"{settings.DOMAIN}{path}", "headers": {"Origin": origin}}, path)
+                for path in paths for origin in origins
+            ]
+            for chunk in _chunks(files, CF_MAX_FILES):
+                chunk_paths = {path for _, path in chunk}
+                sends.append(self._send_cloudflare(
+                    [f for f, _ in chunk], chunk_paths, min(paths[p] for p in chunk_paths)
+                ))
+        if tags and self._vercel_enabled():
+            for chunk in _chunks(list(tags), VERCEL_MAX_TAGS):
+                sends.append(self._send_vercel(chunk, min(tags[t] for t in chunk)))
+        if sends:
+            await asyncio.gather(*sends)
+
+    def _cloudflare_enabled(self) -> bool:
+        return bool(settings.CF_ZONE_ID and settings.CF_API_TOKEN)
+
+    def _vercel_enabled(self) -> bool:
+        return settings.is_production and bool(settings.VERCEL_API_TOKEN)
+
+    async def _send_cloudflare(self, files: list[dict], paths: set[str], queued_at: float) -> None:
+        data = await self._post(
+            "Cloudflare", self.cf_limiter, len(files),
+            f"{settings.CF_API_URL}/zones/{settings.CF_ZONE_ID}/purge_cache",
+            headers={"Authorization": f"Bearer {settings.CF_API_TOKEN}"},
+            json={"files": files},
+        )
+        if data is None:
+            return
+        if not data.get("success"):
+            self._stats["failed"] += 1
+            logger.warning(f"[CDN] Cloudflare rejected purge of {sorted(paths)}: {data.get('errors')}")
+            return
+        self._stats["paths_purged"] += len(paths)
+        self._record_latency(queued_at)
+
+    async def _send_vercel(self, tags: list[str], queued_at: float) -> None:
+        data = await self._post(
+            "Vercel", self.vercel_limiter, 1,
+            f"{settings.VERCEL_API_URL}/v1/edge-cache/invalidate-by-tags",
+            params={"projectIdOrName": settings.VERCEL_PROJECT_ID},
+            headers={"Authorization": f"Bearer {settings.VERCEL_API_TOKEN}"},
+            json={"tags": tags, "target": "production"},
+        )
+        if data is None:
+            return
+        self._stats["tags_purged"] += len(tags)
+        self._record_latency(queued_at)
+
+    async def _post(self, provider: str, limiter: RateLimiter, cost: float, url: str, **kwargs: Any) -> Optional[dict]:
+        """POST with rate limiting and retries. Returns the JSON body, or None
+        once the request has failed for good."""
+        self._inflight += 1
+        try:
+            for attempt in range(1, self.max_attempts + 1):
+                await limiter.acquire(cost)
+                self._stats["requests"] += 1
+                retry_after: Optional[float] = None
+                try:
+                    resp = await self.http.post(url, **kwargs)
+                    if resp.status_code == 429:
+                        self._stats["rate_limited"] += 1
+                        retry_after = float(resp.headers.get("Retry-After") or 1)
+                        limiter.pause(retry_after)
+                        error = "rate limited"
+                    elif resp.status_code >= 500:
+                        error = f"HTTP {resp.status_code}"
+                    elif resp.status_code >= 400:
+                        self._stats["failed"] += 1
+                        logger.warning(f"[CDN] {provider} purge rejected ({resp.status_code}): {resp.text[:300]}")
+                        return None
+                    else:
+                        return resp.json() if resp.content else {}
+                except httpx.HTTPError as e:
+                    error = repr(e)
+
+                if attempt == self.max_attempts:
+                    break
+                self._stats["retries"] += 1
+                delay = retry_after if retry_after is not None else self.retry_backoff * 2 ** (attempt - 1) * (1 + random.random() / 2)
+                logger.debug(f"[CDN] {provider} purge failed ({error}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+            self._stats["failed"] += 1
+            logger.warning(f"[CDN] {provider} purge failed after {self.max_attempts} attempts: {error}")
+            return None
+        finally:
+            self._inflight -= 1
+
+    def _record_latency(self, queued_at: float) -> None:
+        latency_ms = (time.time() - queued_at) * 1000
+        self._stats["batches_acked"] += 1
+        self._stats["last_latency_ms"] = round(latency_ms, 1)
+        self._stats["max_latency_ms"] = round(max(self._stats["max_latency_ms"], latency_ms), 1)
+        self._stats["total_latency_ms"] += latency_ms
+
+    # -- introspection -------------------------------------------------
+
+    def snapshot(self) -> dict:
+        acked = self._stats["batches_acked"]
+        return {
+            **self._stats,
+            "running": self.running,
+            "pending_paths": len(self._paths),
+            "pending_tags": len(self._tags),
+            "inflight_requests": self._inflight,
+            "avg_latency_ms": round(self._stats["total_latency_ms"] / acked, 1) if acked else 0.0,
+        }
+
+
+cdn_purge_queue = CdnPurgeQueue()
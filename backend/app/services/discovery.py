@@ -0,0 +1,93 @@
+"""
+Cursors for the discovery feed.
+
+Browsing pages are read by keyset instead of offset: the cursor carries the
+last hit's sort value and id, and the next page is a filter continuing after
+them (`price > v OR (price = v AND id > i)`), so page 500 costs the same as
+page 1 and never runs into Meilisearch's maxTotalHits.
+
+A feed is a list of segments, each a filter plus a sort, read one after
+the other. A sorted feed is a single segment. The random feed is a seeded
+shuffle: the seed picks one of the indexed random score fields and a pivot
+in [0, 1), and the feed reads `field >= pivot`, then wraps around to
+`field < pivot`, then documents indexed before the field existed. The
+same seed always yields the same order, so pages never repeat or skip.
+
+Text searches rank by relevance, which has no key to continue from, so
+they keep offset cursors. Every cursor is bound to the query it was issued
+for; one replayed against other filters restarts the feed.
+"""
+import base64
+import hashlib
+import random
+from typing import Any, Optional
+import orjson
+from app.services.search import RANDOM_SCORE_FIELDS
+
+CURSOR_VERSION = 1
+KEYSET_FIELDS = {"id", "min_variant_price", "max_variant_price"}  # sortable and filterable
+
+
+def query_fingerprint(*parts: Any) -> str:
+    return hashlib.blake2b(orjson.dumps(parts, default=str), digest_size=6).hexdigest()
+
+
+def encode_cursor(state: dict) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps({"v": CURSOR_VERSION, **state})).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], fingerprint: str) -> Optional[dict]:
+    """The cursor's state, or None if it is missing, malformed or was issued
+    for a different query. Values end up in filter strings, so every field
+    is type-checked here."""
+    if not cursor:
+        return None
+    try:
+        state = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        return None
+    if not isinstance(state, dict) or state.get("v") != CURSOR_VERSION or state.get("q") != fingerprint:
+        return None
+    if not isinstance(state.get("t"), int):
+        return None
+    if state.get("k") == "off":
+        return state if isinstance(state.get("o"), int) and state["o"] >= 0 else None
+    if state.get("k") not in ("key", "rnd") or not isinstance(state.get("seg"), int):
+        return None
+    after = state.get("a")
+    if after is not None:
+        if not (isinstance(after, list) and len(after) == 2 and isinstance(after[1], int)):
+            return None
+        if after[0] is not None and (isinstance(after[0], bool) or not isinstance(after[0], (int, float))):
+            return None
+    return state
+
+
+def keyset_sort(sort: str) -> Optional[tuple[str, str]]:
+    field, _, direction = sort.partition(":")
+    if field in KEYSET_FIELDS and direction in ("asc", "desc"):
+        return field, direction
+    return None
+
+
+def new_seed() -> str:
+    return f"{random.getrandbits(48):012x}"
+
+
+def shuffle_segments(seed: str) -> list[tuple[Optional[str], str, str]]:
+    """Segments of the seeded shuffle: (filter, sort field, direction)."""
+    digest = hashlib.blake2b(seed.encode(), digest_size=8).digest()
+    field = RANDOM_SCORE_FIELDS[digest[0] % len(RANDOM_SCORE_FIELDS)]
+    pivot = int.from_bytes(digest[1:], "big") / float(1 << 56)
+    return [
+        (f"{field} >= {pivot!r}", field, "asc"),
+        (f"{field} < {pivot!r}", field, "asc"),
+        (f"{field} NOT EXISTS", "id", "asc"),
+    ]
+
+
+def after_filter(field: str, direction: str, value: Any, last_id: int) -> str:
+    op = ">" if direction == "asc" else "<"
+    if field == "id" or value is None:
+        return f"id {op} {last_id}"
+    return f"({field} {op} {value!r} OR ({field} = {value!r} AND id {op} {last_id}))"
@@ -0,0 +1,262 @@
+"""
+Facet counts for the product feed's filter sidebar.
+
+Each active product contributes one count per distinct facet value (size,
+colour, age, width, length, price bucket) to every scope it belongs to:
+`all`, each of its categories and each of its collections. Scope snapshots
+are Redis hashes of `field:value -> count` plus `_total`.
+
+Updates are incremental. A product's last contribution is stored next to
+the snapshots, and re-indexing it applies old-minus-new to the affected
+hashes in one Lua call, so counts never wait on Meilisearch to finish
+indexing. A full rebuild recounts everything from the database; until one
+has run, snapshots are read straight from Meilisearch. Changes that arrive
+while a rebuild is running are parked and replayed on top of its result.
+"""
+import json
+from collections import Counter, defaultdict
+from typing import Any, Callable, Iterable, Optional
+from redis.asyncio import Redis
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+FACET_FIELDS: list[str] = ["sizes", "colors", "ages", "widths", "lengths"]
+PRICE_FIELD = "price_bucket"
+PRICE_BUCKETS: list[int] = [0, 2500, 5000, 10000, 20000, 50000, 100000]  # lower bounds, on min_variant_price
+
+SCOPE_KEY = "facets:scope:{scope}"            # hash: "field:value" -> product count, "_total"
+CONTRIBUTION_KEY = "facets:product:{id}"      # json: scopes and values last counted for the product
+BUILT_KEY = "facets:built"
+REBUILDING_KEY = "facets:rebuilding"          # set while a rebuild owns the snapshots
+PENDING_KEY = "facets:pending"                # hash: contribution key -> newest contribution, parked during a rebuild
+TOTAL_FIELD = "_total"
+REBUILD_BATCH_SIZE = 1000
+REBUILD_LOCK_TTL = 600
+
+# Moves the snapshots from the contribution stored at `key` to `new` ('' if
+# the product no longer counts): subtracts the old one, adds the new one and
+# drops fields that reach zero.
+_MOVE_LUA = """
+local function apply(c, delta)
+    for _, scope in ipairs(c.scopes) do
+        local key = 'facets:scope:' .. scope
+        if redis.call('HINCRBY', key, '_total', delta) <= 0 then
+            redis.call('HDEL', key, '_total')
+        end
+        for _, value in ipairs(c.values) do
+            if redis.call('HINCRBY', key, value, delta) <= 0 then
+                redis.call('HDEL', key, value)
+            end
+        end
+    end
+end
+
+local function move(key, new)
+    local old = redis.call('GET', key)
+    if (old or '') == new then return 0 end
+    if old then apply(cjson.decode(old), -1) end
+    if new ~= '' then
+        apply(cjson.decode(new), 1)
+        redis.call('SET', key, new)
+    else
+        redis.call('DEL', key)
+    end
+    return 1
+end
+"""
+
+# KEYS = contribution keys; ARGV[i] = new contribution for KEYS[i]. While a
+# rebuild runs, the changes are parked in facets:pending instead (returns -1),
+# since the rebuild would overwrite them.
+_APPLY_SCRIPT = _MOVE_LUA + """
+if redis.call('EXISTS', 'facets:rebuilding') == 1 then
+    for i, key in ipairs(KEYS) do
+        redis.call('HSET', 'facets:pending', key, ARGV[i])
+    end
+    return -1
+end
+local changed = 0
+for i, key in ipairs(KEYS) do
+    changed = changed + move(key, ARGV[i])
+end
+return changed
+"""
+
+# Ends a rebuild: clears the flag and applies the parked changes on top of
+# the rebuilt snapshots, atomically, so no change lands in between.
+_REPLAY_SCRIPT = _MOVE_LUA + """
+redis.call('DEL', 'facets:rebuilding')
+local pending = redis.call('HGETALL', 'facets:pending')
+redis.call('DEL', 'facets:pending')
+local changed = 0
+for i = 1, #pending, 2 do
+    changed = changed + move(pending[i], pending[i + 1])
+end
+return changed
+"""
+
+
+def price_bucket(price: Any) -> str:
+    price = float(price or 0)
+    label = f"{PRICE_BUCKETS[-1]}+"
+    for lo, hi in zip(PRICE_BUCKETS, PRICE_BUCKETS[1:]):
+        if lo <= price < hi:
+            label = f"{lo}-{hi}"
+            break
+    return label
+
+
+def scope_for(cat_ids: str = "", collections: str = "") -> str:
+    """The snapshot scope matching a feed query: one category or one
+    collection, otherwise the whole catalogue."""
+    if cat_ids and "," not in cat_ids and not collections:
+        return f"category:{cat_ids}"
+    if collections and "," not in collections and not cat_ids:
+        return f"collection:{collections}"
+    return "all"
+
+
+def contribution(doc: dict) -> str:
+    """What an indexed product document adds to the snapshots, as the JSON
+    stored per product ('' if it counts nowhere)."""
+    if not doc.get("active"):
+        return ""
+    scopes = ["all"]
+    scopes += [f"category:{slug}" for slug in sorted(set(doc.get("category_slugs") or []))]
+    scopes += [f"collection:{slug}" for slug in sorted(set(doc.get("collection_slugs") or []))]
+    values = {f"{field}:{value}" for field in FACET_FIELDS for value in (doc.get(field) or [])}
+    values.add(f"{PRICE_FIELD}:{doc.get(PRICE_FIELD) or price_bucket(doc.get('min_variant_price'))}")
+    return json.dumps({"scopes": scopes, "values": sorted(values)}, separators=(",", ":"))
+
+
+def shape(distribution: dict[str, dict[str, int]], total: int) -> dict:
+    """Snapshot or Meilisearch facetDistribution -> the response shape."""
+    buckets = distribution.get(PRICE_FIELD, {})
+    histogram = []
+    for lo, hi in zip(PRICE_BUCKETS, PRICE_BUCKETS[1:] + [None]):
+        label = f"{lo}-{hi}" if hi is not None else f"{lo}+"
+        histogram.append({"min": lo, "max": hi, "count": int(buckets.get(label, 0))})
+    return {
+        "total": total,
+        "facets": {field: {k: int(v) for k, v in distribution.get(field, {}).items()} for field in FACET_FIELDS},
+        "price_histogram": histogram,
+    }
+
+
+async def apply_facet_changes(redis: Redis, docs: dict[int, Optional[dict]]) -> None:
+    """Move the snapshots from each product's stored contribution to the one
+    for its new document (None for products that were deleted)."""
+    if not docs:
+        return
+    try:
+        script = redis.register_script(_APPLY_SCRIPT)
+        ids = list(docs)
+        changed = await script(
+            keys=[CONTRIBUTION_KEY.format(id=pid) for pid in ids],
+            args=[contribution(docs[pid]) if docs[pid] else "" for pid in ids],
+        )
+        if changed < 0:
+            logger.debug(f"[Facets] Rebuild running, parked changes for {len(ids)} products")
+        else:
+            logger.debug(f"[Facets] Updated counts for {changed} of {len(ids)} products")
+    except Exception as e:
+        logger.error(f"[Facets] Failed to apply facet changes for {list(docs)}: {e}")
+
+
+async def _delete_matching(redis: Redis, pattern: str) -> None:
+    batch: list[str] = []
+    async for key in redis.scan_iter(match=pattern, count=1000):
+        batch.append(key)
+        if len(batch) >= 1000:
+            await redis.delete(*batch)
+            batch = []
+    if batch:
+        await redis.delete(*batch)
+
+
+async def rebuild_facets(db: Any, cache_srv: Any, prepare: Callable[[Any], dict]) -> Optional[int]:
+    """Recount every snapshot from the database. Returns the number of
+    products counted, or None if another worker is already rebuilding."""
+    redis = cache_srv.redis
+    token = await cache_srv.acquire_lock("facets:rebuild", ttl=REBUILD_LOCK_TTL)
+    if token is None:
+        return None
+    built: Optional[int] = None
+    try:
+        await redis.delete(BUILT_KEY, PENDING_KEY)  # readers fall back to Meilisearch meanwhile
+        await redis.set(REBUILDING_KEY, token, ex=REBUILD_LOCK_TTL)
+        counts: dict[str, Counter] = defaultdict(Counter)
+        contributions: dict[int, str] = {}
+        last_id = 0
+        while True:
+            products = await db.product.find_many(
+                where={"active": True, "id": {"gt": last_id}},
+                include={"categories": True, "collections": True, "variants": True},
+                order={"id": "asc"},
+                take=REBUILD_BATCH_SIZE,
+            )
+            for product in products:
+                try:
+                    entry = contribution(prepare(product))
+                except Exception as e:
+                    logger.error(f"[Facets] Error preparing product {product.id}: {e}")
+                    continue
+                if not entry:
+                    continue
+                contributions[product.id] = entry
+                parsed = json.loads(entry)
+                for scope in parsed["scopes"]:
+                    counts[scope][TOTAL_FIELD] += 1
+                    counts[scope].update(parsed["values"])
+            if len(products) < REBUILD_BATCH_SIZE:
+                break
+            last_id = products[-1].id
+
+        await _delete_matching(redis, SCOPE_KEY.format(scope="*"))
+        await _delete_matching(redis, CONTRIBUTION_KEY.format(id="*"))
+        items = list(contributions.items())
+        for start in range(0, max(len(items), len(counts)), REBUILD_BATCH_SIZE):
+            async with redis.pipeline(transaction=False) as pipe:
+                for pid, entry in items[start:start + REBUILD_BATCH_SIZE]:
+                    pipe.set(CONTRIBUTION_KEY.format(id=pid), entry)
+                for scope in list(counts)[start:start + REBUILD_BATCH_SIZE]:
+                    pipe.hset(SCOPE_KEY.format(scope=scope), mapping=dict(counts[scope]))
+                await pipe.execute()
+        built = len(contributions)
+        logger.info(f"[Facets] Rebuilt {len(counts)} facet snapshots from {built} products")
+        return built
+    finally:
+        try:
+            replayed = await redis.register_script(_REPLAY_SCRIPT)()
+            if replayed:
+                logger.debug(f"[Facets] Replayed {replayed} changes parked during the rebuild")
+            if built is not None:
+                await redis.set(BUILT_KEY, built)  # only once the parked changes are in
+        except Exception as e:
+            logger.error(f"[Facets] Failed to replay changes parked during the rebuild: {e}")
+        await cache_srv.release_lock("facets:rebuild", token)
+
+
+async def get_facet_snapshot(redis: Redis, search_srv: Any, scope: str, filters: Iterable[str]) -> dict:
+    """The scope's snapshot from Redis, or from one Meilisearch facet query
+    (with `filters`) while no rebuild has completed."""
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.exists(BUILT_KEY)
+            pipe.hgetall(SCOPE_KEY.format(scope=scope))
+            built, raw = await pipe.execute()
+        if built:
+            distribution: dict[str, dict[str, int]] = defaultdict(dict)
+            for key, count in raw.items():
+                field, _, value = key.partition(":")
+                if value:
+                    distribution[field][value] = int(count)
+            return {"scope": scope, "source": "snapshot", **shape(distribution, int(raw.get(TOTAL_FIELD, 0)))}
+    except Exception as e:
+        logger.error(f"[Facets] Failed to read snapshot {scope}: {e}")
+
+    res = await search_srv.search_index("", {
+        "limit": 0, "filter": " AND ".join(filters), "facets": [*FACET_FIELDS, PRICE_FIELD],
+    })
+    return {"scope": scope, "source": "search", **shape(res.get("facetDistribution") or {}, res.get("estimatedTotalHits", 0))}
@@ -0,0 +1,349 @@
+import asyncio
+import itertools
+import json
+import time
+from typing import Any, Optional
+from redis.asyncio import Redis
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+DEAD_LETTER_KEY = "search:index:dead_letter"
+DEAD_LETTER_MAX = 1000
+
+# kind of the newest pending op per document when another op arrives
+_MERGE = {
+    ("add", "update"): "add",
+    ("update", "update"): "update",
+}
+
+
+def _resolve(waiters: list[asyncio.Future]) -> None:
+    for waiter in waiters:
+        if not waiter.done():
+            waiter.set_result(None)
+
+
+class SearchIndexQueue:
+    """Coalesces Meilisearch writes. Document adds, partial updates and
+    deletes queued within `window` seconds are grouped per index and kind
+    and sent as one Meilisearch task each; later ops on the same document
+    replace earlier ones. Producers don't wait on the task: a poller checks
+    in-flight tasks in bulk, retries failures (splitting failed batches to
+    isolate bad documents) and dead-letters what keeps failing. Callers that
+    must not act before the documents are searchable (cache purges) await
+    `wait_indexed`. Flushes run one at a time, so ops on the same document
+    reach Meilisearch in the order they were queued.
+
+    One instance per worker process, started in the app lifespan.
+    """
+
+    def __init__(
+        self,
+        window: float = 0.5,
+        max_batch: int = 1000,
+        poll_interval: float = 1.0,
+        max_attempts: int = 5,
+        retry_backoff: float = 1.0,
+    ) -> None:
+        self.window = window
+        self.max_batch = max_batch
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._client: Any = None
+        self._redis: Optional[Redis] = None
+        self._seq = itertools.count(1)
+        # (index, doc id) -> {"kind", "doc", "seq", "queued_at"}
+        self._pending: dict[tuple[str, str], dict] = {}
+        self._latest: dict[tuple[str, str], int] = {}
+        self._waiters: list[asyncio.Future] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        # (documents still queued or in flight, future) per wait_indexed caller
+        self._indexed_waiters: list[tuple[set[tuple[str, str]], asyncio.Future]] = []
+        self._submitting = 0  # documents flushed but not yet accepted as a task
+        self._inflight: dict[int, dict] = {}  # task uid -> batch
+        self._poller: Optional[asyncio.Task] = None
+        self._tasks: set[asyncio.Task] = set()
+        self._stats = {
+            "flushes": 0,
+            "tasks_submitted": 0,
+            "tasks_succeeded": 0,
+            "tasks_failed": 0,
+            "documents_indexed": 0,
+            "documents_deleted": 0,
+            "retries": 0,
+            "dead_lettered": 0,
+            "last_lag_ms": 0.0,
+            "max_lag_ms": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._client is not None
+
+    def start(self, client: Any, redis: Optional[Redis] = None) -> None:
+        self._client = client
+        self._redis = redis
+
+    async def stop(self) -> None:
+        """Submit whatever is still queued, then stop. In-flight tasks are
+        left to Meilisearch; they are just no longer tracked here."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        await self._flush()
+        if self._tasks:
+            # give in-progress submits a moment; retries still backing off are dropped
+            _, stuck = await asyncio.wait(self._tasks, timeout=5)
+            for task in stuck:
+                task.cancel()
+        if self._poller:
+            self._poller.cancel()
+            self._poller = None
+        self._client = None
+        # release wait_indexed callers; nothing will report on these any more
+        self._settle([(index, doc_id, seq) for (index, doc_id), seq in list(self._latest.items())])
+
+    # -- producers -----------------------------------------------------
+
+    def add(self, index: str, documents: list[dict]) -> asyncio.Future:
+        return self._submit(index, [(str(doc["id"]), "add", doc) for doc in documents])
+
+    def update(self, index: str, documents: list[dict]) -> asyncio.Future:
+        return self._submit(index, [(str(doc["id"]), "update", doc) for doc in documents])
+
+    def delete(self, index: str, document_ids: list[Any]) -> asyncio.Future:
+        return self._submit(index, [(str(doc_id), "delete", None) for doc_id in document_ids])
+
+    def _submit(self, index: str, ops: list[tuple[str, str, Optional[dict]]]) -> asyncio.Future:
+        """Queue ops for the next flush. The returned future resolves once
+        they have been handed to Meilisearch (not once indexed)."""
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        now = time.time()
+        for doc_id, kind, doc in ops:
+            key = (index, doc_id)
+            seq = next(self._seq)
+            prev = self._pending.get(key)
+            if prev and (prev["kind"], kind) in _MERGE:
+                kind, doc = _MERGE[(prev["kind"], kind)], {**prev["doc"], **doc}
+            self._pending[key] = {
+                "kind": kind,
+                "doc": doc,
+                "seq": seq,
+                "queued_at": prev["queued_at"] if prev else now,
+            }
+            self._latest[key] = seq
+        self._waiters.append(future)
+
+        if len(self._pending) >= self.max_batch:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            self._spawn(self._flush())
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_after_window())
+        return future
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush_after_window(self) -> None:
+        await asyncio.sleep(self.window)
+        self._timer = None
+        await self._flush()
+
+    async def _flush(self) -> None:
+        async with self._flush_lock:
+            await self._flush_pending()
+
+    async def _flush_pending(self) -> None:
+        pending, waiters = self._pending, self._waiters
+        self._pending, self._waiters = {}, []
+        if not pending:
+            _resolve(waiters)
+            return
+        if self._client is None:
+            logger.warning(f"[Search] Index queue stopped, dropping {len(pending)} ops")
+            self._settle([(index, doc_id, op["seq"]) for (index, doc_id), op in pending.items()])
+            _resolve(waiters)
+            return
+
+        batches: dict[tuple[str, str], dict] = {}
+        for (index, doc_id), op in pending.items():
+            batch = batches.setdefault((index, op["kind"]), {
+                "index": index, "kind": op["kind"], "items": [], "attempts": 0, "queued_at": op["queued_at"],
+            })
+            batch["items"].append((doc_id, op["seq"], op["doc"]))
+            batch["queued_at"] = min(batch["queued_at"], op["queued_at"])
+
+        self._stats["flushes"] += 1
+        self._submitting += len(pending)
+        try:
+            # one op per document per flush, so batches of different kinds never touch the same id
+            await asyncio.gather(*[self._send(batch) for batch in batches.values()])
+        finally:
+            self._submitting -= len(pending)
+            _resolve(waiters)
+
+    async def wait_indexed(self, index: str, document_ids: list[Any], timeout: float = 30.0) -> bool:
+        """Wait until every op queued so far for these documents has been
+        processed by Meilisearch (or given up on). Returns False on timeout."""
+        keys = {(index, str(doc_id)) for doc_id in document_ids} & self._latest.keys()
+        if not keys:
+            return True
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        waiter = (keys, future)
+        self._indexed_waiters.append(waiter)
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"[Search] Timed out after {timeout}s waiting for {len(keys)} documents in {index}")
+            return False
+        finally:
+            if waiter in self._indexed_waiters:
+                self._indexed_waiters.remove(waiter)
+
+    def _settle(self, items: list[tuple[str, str, int]]) -> None:
+        """Forget (index, doc id, seq) ops that are done, and wake the
+        wait_indexed callers with nothing left outstanding."""
+        for index, doc_id, seq in items:
+            key = (index, doc_id)
+            if self._latest.get(key) == seq:
+                del self._latest[key]
+        for keys, future in list(self._indexed_waiters):
+            keys.intersection_update(self._latest.keys())
+            if not keys and not future.done():
+                future.set_result(None)
+
+    # -- Meilisearch tasks ---------------------------------------------
+
+    async def _send(self, batch: dict) -> None:
+        index, kind = batch["index"], batch["kind"]
+        try:
+            if kind == "add":
+                task = await self._client.add_documents(index, [doc for _, _, doc in batch["items"]])
+            elif kind == "update":
+                task = await self._client.update_documents(index, [doc for _, _, doc in batch["items"]])
+            else:
+                task = await self._client.delete_documents(index, [doc_id for doc_id, _, _ in batch["items"]])
+        except Exception as e:
+            await self._failed(batch, f"submit failed: {e}", split=False)
+            return
+
+        batch["task_uid"] = task["taskUid"]
+        self._inflight[task["taskUid"]] = batch
+        self._stats["tasks_submitted"] += 1
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+
+    async def _poll(self) -> None:
+        while self._inflight:
+            await asyncio.sleep(self.poll_interval)
+            uids = list(self._inflight)[:100]
+            try:
+                res = await self._client.request(
+                    "GET", "/tasks", params={"uids": ",".join(map(str, uids)), "limit": len(uids)}
+                )
+            except Exception as e:
+                logger.warning(f"[Search] Failed to poll index tasks {uids}: {e}")
+                continue
+            for task in res.get("results", []):
+                status = task.get("status")
+                if status in ("enqueued", "processing"):
+                    continue
+                batch = self._inflight.pop(task["uid"], None)
+                if batch is None:
+                    continue
+                if status == "succeeded":
+                    self._succeeded(batch)
+                else:
+                    error = (task.get("error") or {}).get("message") or status
+                    await self._failed(batch, error, split=True)
+
+    def _succeeded(self, batch: dict) -> None:
+        lag_ms = (time.time() - batch["queued_at"]) * 1000
+        self._stats["tasks_succeeded"] += 1
+        self._stats["last_lag_ms"] = round(lag_ms, 1)
+        self._stats["max_lag_ms"] = round(max(self._stats["max_lag_ms"], lag_ms), 1)
+        count = "documents_deleted" if batch["kind"] == "delete" else "documents_indexed"
+        self._stats[count] += len(batch["items"])
+        self._settle([(batch["index"], doc_id, seq) for doc_id, seq, _ in batch["items"]])
+
+    async def _failed(self, batch: dict, error: str, split: bool) -> None:
+        self._stats["tasks_failed"] += 1
+        # drop documents that have been re-queued since; retrying would overwrite the newer op
+        items = [item for item in batch["items"] if self._latest.get((batch["index"], item[0])) == item[1]]
+        if not items:
+            return
+        batch = {**batch, "items": items, "attempts": batch["attempts"] + 1, "error": error}
+
+        if split and len(items) > 1:
+            # a rejected task usually means one bad document; bisect to find it
+            mid = len(items) // 2
+            logger.warning(f"[Search] {batch['kind']} of {len(items)} documents failed ({error}), splitting")
+            for half in (items[:mid], items[mid:]):
+                self._spawn(self._retry({**batch, "items": half, "attempts": 0}))
+            return
+
+        if batch["attempts"] >= self.max_attempts:
+            await self._dead_letter(batch)
+            return
+        self._spawn(self._retry(batch))
+
+    async def _retry(self, batch: dict) -> None:
+        self._stats["retries"] += 1
+        await asyncio.sleep(self.retry_backoff * (2 ** max(batch["attempts"] - 1, 0)))
+        await self._send(batch)
+
+    async def _dead_letter(self, batch: dict) -> None:
+        ids = [doc_id for doc_id, _, _ in batch["items"]]
+        self._settle([(batch["index"], doc_id, seq) for doc_id, seq, _ in batch["items"]])
+        self._stats["dead_lettered"] += len(ids)
+        logger.error(f"[Search] Giving up on {batch['kind']} of {ids} in {batch['index']}: {batch['error']}")
+        if self._redis is None:
+            return
+        entry = {
+            "index": batch["index"], "kind": batch["kind"], "ids": ids,
+            "error": batch["error"], "attempts": batch["attempts"], "at": time.time(),
+        }
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.lpush(DEAD_LETTER_KEY, json.dumps(entry))
+                pipe.ltrim(DEAD_LETTER_KEY, 0, DEAD_LETTER_MAX - 1)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"[Search] Failed to record dead letter for {ids}: {e}")
+
+    # -- introspection -------------------------------------------------
+
+    async def status(self, dead_letters: int = 20) -> dict:
+        """Queue depth and indexing lag for this worker, plus the shared dead-letter list."""
+        now = time.time()
+        queued = [op["queued_at"] for op in self._pending.values()]
+        queued += [batch["queued_at"] for batch in self._inflight.values()]
+        result: dict[str, Any] = {
+            **self._stats,
+            "running": self.running,
+            "pending_documents": len(self._pending) + self._submitting,
+            "inflight_tasks": len(self._inflight),
+            "inflight_documents": sum(len(b["items"]) for b in self._inflight.values()),
+            "lag_seconds": round(now - min(queued), 2) if queued else 0.0,
+            "dead_letter_total": None,
+            "dead_letters": [],
+        }
+        if self._redis is not None:
+            try:
+                result["dead_letter_total"] = await self._redis.llen(DEAD_LETTER_KEY)
+                raw = await self._redis.lrange(DEAD_LETTER_KEY, 0, dead_letters - 1)
+                result["dead_letters"] = [json.loads(item) for item in raw]
+            except Exception as e:
+                logger.error(f"[Search] Failed to read dead letters: {e}")
+        return result
+
+
+search_index_queue = SearchIndexQueue()
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from typing import Any, Callable, Optional
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def _resolve(waiters: list[asyncio.Future]) -> None:
+    for waiter in waiters:
+        if not waiter.done():
+            waiter.set_result(None)
+
+
+class ProductInvalidationBus:
+    """Debounces product re-indexing. Ids submitted within `window` seconds
+    of each other are flushed together as one ProductService.invalidate_all
+    call — one Meilisearch batch, one multi-path CDN purge, one tag
+    invalidation — instead of a full fan-out per id.
+
+    One instance per worker process, started in the app lifespan with a
+    factory that builds a ProductService from process-level resources
+    (request-scoped services may be gone by the time the window closes).
+    """
+
+    def __init__(self, window: float = 0.25, max_batch: int = 200) -> None:
+        self.window = window
+        self.max_batch = max_batch
+        self._factory: Optional[Callable[[], Any]] = None
+        self._pending: dict[int, None] = {}  # insertion-ordered set
+        self._waiters: list[asyncio.Future] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._flushes: set[asyncio.Task] = set()
+        self._stats = {
+            "flushes": 0,
+            "products": 0,
+            "last_batch_size": 0,
+            "max_batch_size": 0,
+            "last_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._factory is not None
+
+    def start(self, product_srv_factory: Callable[[], Any]) -> None:
+        self._factory = product_srv_factory
+
+    async def stop(self) -> None:
+        """Flush whatever is still queued, then stop accepting work."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        await self._flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        self._factory = None
+
+    def submit(self, *product_ids: int) -> asyncio.Future:
+        """Queue ids for the next flush. The returned future resolves once
+        the batch containing them has been processed; await it to keep
+        read-your-writes semantics, or drop it to fire and forget."""
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        for pid in product_ids:
+            if pid is not None:
+                self._pending[pid] = None
+        self._waiters.append(future)
+
+        if len(self._pending) >= self.max_batch:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            self._spawn_flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_after_window())
+        return future
+
+    def snapshot(self) -> dict:
+        flushes = self._stats["flushes"]
+        return {
+            **self._stats,
+            "pending": len(self._pending),
+            "avg_batch_size": round(self._stats["products"] / flushes, 2) if flushes else 0,
+            "avg_flush_ms": round(self._stats["total_flush_ms"] / flushes, 2) if flushes else 0,
+        }
+
+    def _spawn_flush(self) -> None:
+        task = asyncio.create_task(self._flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush_after_window(self) -> None:
+        await asyncio.sleep(self.window)
+        # Clear before flushing so stop()/max_batch can't cancel us mid-flush
+        self._timer = None
+        await self._flush()
+
+    async def _flush(self) -> None:
+        product_ids, waiters = list(self._pending), self._waiters
+        self._pending, self._waiters = {}, []
+        if not product_ids:
+            _resolve(waiters)
+            return
+
+        if self._factory is None:
+            logger.warning(f"[Invalidation] Bus stopped, dropping products {product_ids}")
+            _resolve(waiters)
+            return
+
+        start = time.perf_counter()
+        try:
+            await self._factory().invalidate_all(product_ids=product_ids, existing_product_ids=product_ids)
+        except Exception as e:
+            logger.error(f"[Invalidation] Batch flush failed for products {product_ids}: {e}", exc_info=True)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._stats["flushes"] += 1
+            self._stats["products"] += len(product_ids)
+            self._stats["last_batch_size"] = len(product_ids)
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(product_ids))
+            self._stats["last_flush_ms"] = round(elapsed_ms, 2)
+            self._stats["total_flush_ms"] += elapsed_ms
+            logger.debug(f"[Invalidation] Flushed {len(product_ids)} products in {elapsed_ms:.1f}ms")
+            _resolve(waiters)
+
+
+product_invalidation_bus = ProductInvalidationBus()
@@ -0,0 +1,225 @@
+"""
+Async Meilisearch client.
+
+One httpx.AsyncClient per process with a keep-alive pool, so searches run
+on the event loop instead of hopping to a worker thread (the sync SDK was
+capped by anyio's 40-thread limiter). HTTP/2 is negotiated when
+MEILI_HOST is https; plain http stays on pooled HTTP/1.1 connections.
+
+Searches issued in the same event-loop tick are coalesced into one
+`/multi-search` request. If Meilisearch rejects the batch (one bad filter
+fails the whole request) every query is retried on its own, so each
+caller gets its own result or error.
+"""
+import asyncio
+from typing import Any, Optional
+import httpx
+import orjson
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+MAX_MULTI_SEARCH = 50  # queries per /multi-search request
+
+
+class MeiliError(Exception):
+    def __init__(self, message: str, code: Optional[str] = None, status: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.code = code
+        self.status = status
+
+
+class MeiliClient:
+    def __init__(self, host: str, api_key: str, timeout: float = 5.0, max_connections: int = 100) -> None:
+        self.host = host.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._http: Optional[httpx.AsyncClient] = None
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.Handle] = None
+        self._batches: set[asyncio.Task] = set()
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                base_url=self.host,
+                headers={"Authorization": f"Bearer {self.api_key}"} if self.api_key else {},
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 2.0)),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=30.0,
+                ),
+                http2=self.host.startswith("https://"),
+            )
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def request(self, method: str, path: str, body: Any = None, params: Optional[dict] = None,
+                      timeout: Optional[float] = None) -> Any:
+        kwargs: dict[str, Any] = {"params": params}
+        if body is not None:
+            # str() for datetimes, matching what the sync SDK's CustomEncoder wrote
+            kwargs["content"] = orjson.dumps(body, default=str, option=orjson.OPT_PASSTHROUGH_DATETIME)
+            kwargs["headers"] = {"Content-Type": "application/json"}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        try:
+            resp = await self.http.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            raise MeiliError(f"{method} {path} failed: {e!r}", code="communication_error") from e
+        if resp.status_code >= 400:
+            try:
+                err = orjson.loads(resp.content)
+            except orjson.JSONDecodeError:
+                err = {"message": resp.text}
+            raise MeiliError(err.get("message", resp.text), code=err.get("code"), status=resp.status_code)
+        return orjson.loads(resp.content) if resp.content else None
+
+    # -- search ---------------------------------------------------------
+
+    async def search(self, index: str, query: str = "", options: Optional[dict] = None) -> dict:
+        """Queue a search for the current tick's /multi-search batch."""
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._pending.append(({"indexUid": index, "q": query, **(options or {})}, future))
+        if len(self._pending) >= MAX_MULTI_SEARCH:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_soon(self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def search_one(self, query: dict) -> dict:
+        """POST /indexes/{indexUid}/search right away, outside the tick's
+        /multi-search batch."""
+        body = {k: v for k, v in query.items() if k != "indexUid"}
+        return await self.request("POST", f"/indexes/{query['indexUid']}/search", body)
+
+    async def _send(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        queries = [query for query, _ in batch]
+        try:
+            if len(batch) == 1:
+                results: list = [await self.search_one(queries[0])]
+            else:
+                results = (await self.multi_search(queries))["results"]
+        except MeiliError as e:
+            if len(batch) == 1 or e.code == "communication_error":
+                results = [e] * len(batch)
+            else:
+                results = await asyncio.gather(*[self.search_one(q) for q in queries], return_exceptions=True)
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def multi_search(self, queries: list[dict]) -> dict:
+        """POST /multi-search; each query carries its own `indexUid`."""
+        return await self.request("POST", "/multi-search", {"queries": queries})
+
+    # -- documents ------------------------------------------------------
+
+    async def get_document(self, index: str, document_id: Any) -> dict:
+        return await self.request("GET", f"/indexes/{index}/documents/{document_id}")
+
+    async def get_documents(self, index: str, filter: Optional[str] = None, limit: int = 20,
+                            fields: Optional[list[str]] = None, offset: int = 0) -> list[dict]:
+        body: dict[str, Any] = {"limit": limit, "offset": offset}
+        if filter:
+            body["filter"] = filter
+        if fields:
+            body["fields"] = fields
+        res = await self.request("POST", f"/indexes/{index}/documents/fetch", body)
+        return res.get("results", [])
+
+    async def add_documents(self, index: str, documents: list[dict], primary_key: Optional[str] = "id") -> dict:
+        params = {"primaryKey": primary_key} if primary_key else None
+        return await self.request("POST", f"/indexes/{index}/documents", documents, params=params)
+
+    async def update_documents(self, index: str, documents: list[dict]) -> dict:
+        return await self.request("PUT", f"/indexes/{index}/documents", documents)
+
+    async def delete_document(self, index: str, document_id: Any) -> dict:
+        return await self.request("DELETE", f"/indexes/{index}/documents/{document_id}")
+
+    async def delete_documents(self, index: str, document_ids: list[Any]) -> dict:
+        return await self.request("POST", f"/indexes/{index}/documents/delete-batch", list(document_ids))
+
+    async def delete_all_documents(self, index: str) -> dict:
+        return await self.request("DELETE", f"/indexes/{index}/documents")
+
+    # -- indexes, settings and tasks -----------------------------------
+
+    async def get_index(self, index: str) -> dict:
+        return await self.request("GET", f"/indexes/{index}")
+
+    async def create_index(self, index: str, primary_key: Optional[str] = "id") -> dict:
+        return await self.request("POST", "/indexes", {"uid": index, "primaryKey": primary_key})
+
+    async def delete_index(self, index: str) -> dict:
+        return await self.request("DELETE", f"/indexes/{index}")
+
+    async def get_stats(self, index: str) -> dict:
+        return await self.request("GET", f"/indexes/{index}/stats")
+
+    async def swap_indexes(self, pairs: list[tuple[str, str]]) -> dict:
+        """Atomically exchange the documents and settings of each index pair."""
+        return await self.request("POST", "/swap-indexes", [{"indexes": list(pair)} for pair in pairs])
+
+    async def get_settings(self, index: str) -> dict:
+        return await self.request("GET", f"/indexes/{index}/settings")
+
+    async def update_settings(self, index: str, body: dict) -> dict:
+        return await self.request("PATCH", f"/indexes/{index}/settings", body)
+
+    async def get_task(self, task_uid: int) -> dict:
+        return await self.request("GET", f"/tasks/{task_uid}")
+
+    async def wait_for_task(self, task_uid: int, timeout_ms: int = 30000, interval: float = 0.05) -> dict:
+        """Poll a task until it leaves enqueued/processing. Backs off to 1s."""
+        deadline = asyncio.get_running_loop().time() + timeout_ms / 1000
+        while True:
+            task = await self.get_task(task_uid)
+            if task.get("status") not in ("enqueued", "processing"):
+                return task
+            if asyncio.get_running_loop().time() >= deadline:
+                raise MeiliError(f"Task {task_uid} still {task.get('status')} after {timeout_ms}ms", code="task_timeout")
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, 1.0)
+
+    async def health(self, timeout: Optional[float] = None) -> bool:
+        try:
+            res = await self.request("GET", "/health", timeout=timeout)
+            return bool(res) and res.get("status") == "available"
+        except MeiliError:
+            return False
+
+
+meili = MeiliClient(
+    settings.MEILI_HOST,
+    settings.MEILI_MASTER_KEY,
+    timeout=settings.MEILI_TIMEOUT,
+    max_connections=settings.MEILI_MAX_CONNECTIONS,
+)
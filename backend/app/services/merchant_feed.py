@@ -0,0 +1,240 @@
+"""
+Google/Meta merchant feed rendering.
+
+Items are rendered straight to XML strings (one fragment per product, all
+of its variants) so the feed can be streamed chunk by chunk instead of
+built as one ElementTree. Fragments are also what the incremental mode
+keeps in Redis: `merchant_feed:{target}:fragments` maps product id to its
+rendered items, and only products marked dirty (or updated since the last
+build) are re-rendered.
+"""
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Iterable, Optional
+from xml.sax.saxutils import escape
+from redis.asyncio import Redis
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+AgeGroupMapper = Callable[[Optional[str]], Optional[str]]
+
+FEED_TARGETS: tuple[str, ...] = ("google", "meta")
+FEED_BATCH_SIZE = 1000
+FEED_INCLUDE: dict = {"variants": True, "images": True, "categories": True}
+
+FRAGMENTS_KEY = "merchant_feed:{target}:fragments"
+BUILT_AT_KEY = "merchant_feed:{target}:built_at"
+DIRTY_KEY = "merchant_feed:{target}:dirty"
+
+AVAILABILITY_MAP: dict[str, dict[str, str]] = {
+    "google": {"in": "in_stock", "out": "out_of_stock"},
+    "meta": {"in": "in stock", "out": "out of stock"},
+}
+
+FEED_FOOTER = "</channel></rss>"
+
+
+def feed_header() -> str:
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0"><channel>'
+        "<title>Revoque Product Feed</title>"
+        f"<link>{escape(settings.FRONTEND_HOST)}</link>"
+        "<description>Automated product sync feed for Google Merchant Center</description>"
+    )
+
+
+def _el(tag: str, text: Any) -> str:
+    return f"<{tag}>{escape(str(text))}</{tag}>"
+
+
+def render_product(prod: Any, target: str, map_age_group: AgeGroupMapper) -> str:
+    """Render every variant of a product as <item> elements."""
+    availability = AVAILABILITY_MAP[target]
+    main_image = prod.image or (prod.images[0].image if prod.images else f"{settings.FRONTEND_HOST}/placeholder.jpg")
+    link = f"{settings.FRONTEND_HOST}/products/{prod.slug}"
+    description = prod.description or "No description available."
+    condition = "new" if prod.is_new else "used"
+    product_type = ", ".join(c.name for c in prod.categories) if prod.categories else None
+
+    parts: list[str] = []
+    for variant in prod.variants:
+        variant_title = prod.name or ""
+
+        detail_parts = []
+        if variant.size:
+            detail_parts.append(f"Size:{variant.size}")
+        if variant.width:
+            detail_parts.append(f"W:{variant.width}cm")
+        if variant.length:
+            detail_parts.append(f"L:{variant.length}cm")
+        if variant.age:
+            detail_parts.append(f"Age:{variant.age}")
+        if detail_parts:
+            variant_title += f" ({', '.join(detail_parts)})"
+
+        parts.append("<item>")
+        parts.append(_el("g:id", variant.sku))
+        parts.append(_el("g:title", variant_title.strip()))
+        parts.append(_el("g:description", description))
+        parts.append(_el("g:link", link))
+        parts.append(_el("g:image_link", main_image))
+        parts.append(_el("g:availability", availability["in"] if variant.inventory > 0 else availability["out"]))
+        parts.append(_el("g:condition", condition))
+        if variant.old_price and variant.old_price > variant.price:
+            parts.append(_el("g:price", f"{variant.old_price:.2f} NGN"))
+            parts.append(_el("g:sale_price", f"{variant.price:.2f} NGN"))
+        else:
+            parts.append(_el("g:price", f"{variant.price:.2f} NGN"))
+
+        if variant.size:
+            parts.append(_el("g:size", variant.size))
+        if variant.color:
+            parts.append(_el("g:color", variant.color))
+
+        if variant.age:
+            mapped_age = map_age_group(variant.age)
+            if mapped_age:
+                parts.append(_el("g:age_group", mapped_age))
+
+        if product_type:
+            parts.append(_el("g:product_type", product_type))
+        parts.append(_el("g:identifier_exists", "no"))
+        parts.append("</item>")
+
+    return "".join(parts)
+
+
+async def mark_feed_dirty(redis: Redis, product_ids: Iterable[int]) -> None:
+    """Queue products for re-rendering on the next incremental build."""
+    ids = [str(pid) for pid in product_ids if pid is not None]
+    if not ids:
+        return
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for target in FEED_TARGETS:
+                pipe.sadd(DIRTY_KEY.format(target=target), *ids)
+            await pipe.execute()
+    except Exception as e:
+        logger.error(f"[Feed] Failed to mark products {ids} dirty: {e}")
+
+
+async def reset_feed(redis: Redis) -> None:
+    """Force the next incremental build to start from scratch."""
+    try:
+        await redis.delete(*[BUILT_AT_KEY.format(target=target) for target in FEED_TARGETS])
+    except Exception as e:
+        logger.error(f"[Feed] Failed to reset merchant feed: {e}")
+
+
+async def iter_feed_batches(db: Any, batch_size: int = FEED_BATCH_SIZE) -> AsyncIterator[list]:
+    """Active products, newest id first. Pages by keyset on id so every
+    page is an index range scan instead of an ever-growing OFFSET."""
+    last_id = None
+    while True:
+        where: dict = {"active": True}
+        if last_id is not None:
+            where["id"] = {"lt": last_id}
+        products = await db.product.find_many(
+            where=where,
+            include=FEED_INCLUDE,
+            order={"id": "desc"},
+            take=batch_size,
+        )
+        if not products:
+            return
+        yield products
+        if len(products) < batch_size:
+            return
+        last_id = products[-1].id
+
+
+async def stream_feed(db: Any, target: str, map_age_group: AgeGroupMapper) -> AsyncIterator[str]:
+    yield feed_header()
+    async for products in iter_feed_batches(db):
+        yield "".join(render_product(prod, target, map_age_group) for prod in products)
+    yield FEED_FOOTER
+
+
+async def refresh_feed_fragments(db: Any, cache_srv: Any, target: str, map_age_group: AgeGroupMapper) -> int:
+    """Bring the stored fragments up to date: a full render on the first
+    build, afterwards only products marked dirty or updated since the last
+    build. Returns the number of products rendered."""
+    redis = cache_srv.redis
+    fragments_key = FRAGMENTS_KEY.format(target=target)
+    built_at_key = BUILT_AT_KEY.format(target=target)
+    dirty_key = DIRTY_KEY.format(target=target)
+
+    token = await cache_srv.acquire_lock(fragments_key, ttl=300)
+    if token is None:
+        return 0  # another worker is building; serve what's stored
+
+    try:
+        started = datetime.now(timezone.utc)
+        built_at = await redis.get(built_at_key)
+        rendered = 0
+
+        if built_at is None:
+            await redis.delete(fragments_key, dirty_key)
+            async for products in iter_feed_batches(db):
+                await redis.hset(fragments_key, mapping={
+                    str(prod.id): render_product(prod, target, map_age_group) for prod in products
+                })
+                rendered += len(products)
+        else:
+            dirty = await redis.smembers(dirty_key)
+            if dirty:
+                await redis.srem(dirty_key, *dirty)
+            changed = await db.product.find_many(
+                where={"OR": [
+                    {"id": {"in": [int(pid) for pid in dirty]}},
+                    {"updated_at": {"gt": datetime.fromisoformat(built_at)}},
+                ]},
+                include=FEED_INCLUDE,
+            )
+            live = {
+                str(prod.id): render_product(prod, target, map_age_group)
+                for prod in changed if prod.active
+            }
+            gone = (set(dirty) | {str(prod.id) for prod in changed}) - live.keys()
+            async with redis.pipeline(transaction=False) as pipe:
+                if live:
+                    pipe.hset(fragments_key, mapping=live)
+                if gone:
+                    pipe.hdel(fragments_key, *gone)
+                await pipe.execute()
+            rendered = len(live)
+
+        await redis.set(built_at_key, started.isoformat())
+        logger.debug(f"[Feed] Rendered {rendered} products for {target} feed")
+        return rendered
+    finally:
+        await cache_srv.release_lock(fragments_key, token)
+
+
+async def stream_incremental_feed(db: Any, cache_srv: Any, target: str, map_age_group: AgeGroupMapper) -> AsyncIterator[str]:
+    """Serve the feed from stored fragments after re-rendering what changed.
+    Falls back to the full stream while the first build is still running on
+    another worker."""
+    await refresh_feed_fragments(db, cache_srv, target, map_age_group)
+    redis = cache_srv.redis
+    if not await redis.exists(BUILT_AT_KEY.format(target=target)):
+        async for chunk in stream_feed(db, target, map_age_group):
+            yield chunk
+        return
+
+    yield feed_header()
+    seen: set[str] = set()  # HSCAN can repeat fields across a rehash
+    chunk: list[str] = []
+    async for product_id, fragment in redis.hscan_iter(FRAGMENTS_KEY.format(target=target), count=FEED_BATCH_SIZE):
+        if product_id in seen:
+            continue
+        seen.add(product_id)
+        chunk.append(fragment)
+        if len(chunk) >= FEED_BATCH_SIZE:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+    yield FEED_FOOTER
@@ -16,6 +16,7 @@ from app.services.cart import CartService
 from app.services.coupon import CouponService
 from app.core.notifications.events import SendInvoiceEvent, OrderConfirmedEvent
 from app.services.cache import CacheService
+from app.services.reservation import InventoryReservations
 from app.services.storage import MediaStorageService
 from app.models.order import Order, PaginatedOrders
 from app.utils.emails import generate_referral_cashback_email
@@ -43,6 +44,7 @@ class OrderService:
         self.cache_srv = cache_srv
         self.queue = queue
         self.storage_srv = storage_srv
+        self.reservations = InventoryReservations(cache_srv.redis)
 
     async def get_by_number(self, order_number: str, include_relations: bool = True) -> Any:
         if not include_relations:
@@ -138,6 +140,23 @@ class OrderService:
                 detail=f"Some items in your cart are out of stock and must be removed before checkout: {names}",
             )
 
+        # Re-hold every line for the payment window; fails if another cart's hold won the last units
+        quantities: Dict[int, int] = {}
+        for item in cart.items:
+            quantities[item.variant_id] = quantities.get(item.variant_id, 0) + item.quantity
+        short = await self.reservations.hold(
+            cart.id,
+            quantities,
+            {item.variant_id: item.variant.inventory for item in cart.items},
+            ttl=settings.INVENTORY_CHECKOUT_HOLD_TTL,
+        )
+        if short:
+            names = ", ".join(
+                f"{item.name or 'Unnamed item'} (only {short[item.variant_id]} left)"
+                for item in cart.items if item.variant_id in short
+            )
+            raise HTTPException(status_code=400, detail=f"Some items in your cart are no longer available: {names}")
+
         data: Dict[str, Any] = {
             "order_number": order_number,
             "email": cart.email,
@@ -268,42 +287,66 @@ class OrderService:
         except Exception as e:
             raise Exception(str(e))
 
+    async def _decrement_inventory(self, quantities: Dict[int, int]) -> list[dict]:
+        """
+        Decrements every variant in one statement. Rows are locked in id order
+        (so concurrent orders can't deadlock) and each SET reads the latest
+        committed inventory, so parallel checkouts never lose an update.
+        `sold_out` is true for variants this call flipped to OUT_OF_STOCK.
+        """
+        values = ", ".join(f"({int(vid)}, {int(qty)})" for vid, qty in sorted(quantities.items()))
+        return await self.db.query_raw(
+            f"""
+            WITH items(variant_id, qty) AS (VALUES {values}),
+            locked AS (
+                SELECT pv.id, pv.status
+                FROM "product_variants" pv
+                JOIN items ON items.variant_id = pv.id
+                ORDER BY pv.id
+                FOR UPDATE OF pv
+            )
+            UPDATE "product_variants" v
+            SET inventory = GREATEST(v.inventory - items.qty, 0),
+                status = CASE WHEN v.inventory - items.qty <= 0 THEN 'OUT_OF_STOCK'::"ProductStatus" ELSE v.status END,
+                updated_at = NOW()
+            FROM items, locked
+            WHERE v.id = items.variant_id AND locked.id = v.id
+            RETURNING v.id, v.sku, v.product_id, v.inventory,
+                      (v.status = 'OUT_OF_STOCK' AND locked.status <> 'OUT_OF_STOCK') AS sold_out
+            """
+        )
+
     async def decrement_variant_inventory_for_order(self, order: Any) -> None:
-        out_of_stock_variants = []
+        quantities: Dict[int, int] = {}
         for item in order.order_items:
-            try:
-                variant_id = item.variant_id
-                quantity = item.quantity
-
-                if variant_id is None:
-                    logger.warning(
-                        f"OrderItem {item.id} on order {order.id} has no variant "
-                        f"(deleted since order was placed) — skipping inventory decrement"
-                    )
-                    continue
-
-                variant = await self.db.productvariant.find_unique(where={"id": variant_id})
-                if not variant:
-                    logger.warning(f"Variant {variant_id} not found for order {order.id}")
-                    continue
+            if item.variant_id is None:
+                logger.warning(
+                    f"OrderItem {item.id} on order {order.id} has no variant "
+                    f"(deleted since order was placed) — skipping inventory decrement"
+                )
+                continue
+            quantities[item.variant_id] = quantities.get(item.variant_id, 0) + item.quantity
 
-                new_inventory = max(0, variant.inventory - quantity)
-                update_data: Dict[str, Any] = {"inventory": new_inventory}
-                out_of_stock = False
+        rows: list[dict] = []
+        if quantities:
+            try:
+                rows = await self._decrement_inventory(quantities)
+                missing = quantities.keys() - {row["id"] for row in rows}
+                if missing:
+                    logger.warning(f"Variants {sorted(missing)} not found for order {order.id}")
+            except Exception as e:
+                logger.error(f"Failed to decrement inventory for order {order.id}: {e}")
 
-                if new_inventory == 0 and variant.status != "OUT_OF_STOCK":
-                    update_data["status"] = "OUT_OF_STOCK"
-                    out_of_stock = True
+        if rows:
+            await self.reservations.commit(order.cart_id, {row["id"]: row["inventory"] for row in rows})
 
-                await self.db.productvariant.update(where={"id": variant_id}, data=update_data)
-                await self.product_srv.invalidate(id=variant.product_id)
-                if out_of_stock:
-                    out_of_stock_variants.append(variant)
+        touched_product_ids: list[int] = list(dict.fromkeys(row["product_id"] for row in rows))
+        out_of_stock_variants = [row for row in rows if row["sold_out"]]
 
-            except Exception as e:
-                logger.error(
-                    f"Failed to decrement inventory for item {item.id} on order {order.id}: {e}"
-                )
+        try:
+            await self.product_srv.invalidate_many(touched_product_ids)
+        except Exception as e:
+            logger.error(f"Failed to re-index products {touched_product_ids} for order {order.id}: {e}")
 
         try:
             await self.cache_srv.invalidate(tags=["gallery"])
@@ -313,7 +356,7 @@ class OrderService:
         if out_of_stock_variants and self.notification_srv:
             try:
                 slack_text: str = f"🚨 *OUT OF STOCK* 🚨\nOrder ID: {order.id}\n" + "\n".join([
-                    f"• SKU: {v.sku}, Product ID: {v.product_id}" for v in out_of_stock_variants
+                    f"• SKU: {v['sku']}, Product ID: {v['product_id']}" for v in out_of_stock_variants
                 ])
                 await self.notification_srv.send(
                     channel_name="slack",
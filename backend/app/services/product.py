@@ -1,20 +1,46 @@
 import asyncio
-import base64
 import random
-import xml.etree.ElementTree as ET
-from typing import List, Optional, Any, Dict
-from collections import Counter
-from app.services.cache import CacheService, cacheable
-from fastapi import HTTPException, Request
+from typing import AsyncIterator, List, Optional, Any, Dict
+from app.services.cache import CacheService
+from fastapi import HTTPException
 from prisma.enums import PaymentStatus
-from meilisearch.errors import MeilisearchApiError
 from prisma import Prisma
 from app.core.config import settings
 from app.core.logging import get_logger
 from app.core.utils import url_to_list
 from app.models.product import Product
-from app.services.search import SearchService
+from app.services.search import RANDOM_SCORE_FIELDS, SearchService
 from app.services.cdn import CdnService
+from app.services.invalidation import product_invalidation_bus
+from app.services.merchant_feed import (
+    mark_feed_dirty,
+    reset_feed,
+    stream_feed,
+    stream_incremental_feed,
+)
+from app.services.sitemap import mark_sitemap_dirty, reset_sitemap
+from app.services.reservation import forget_stock
+from app.services.facets import (
+    FACET_FIELDS,
+    PRICE_FIELD,
+    apply_facet_changes,
+    get_facet_snapshot,
+    price_bucket,
+    rebuild_facets,
+    scope_for,
+    shape,
+)
+from app.services.reindex import ProductIndexRebuild
+from app.services.recommendations import CARD_KEY, RecommendationEngine
+from app.services.discovery import (
+    after_filter,
+    decode_cursor,
+    encode_cursor,
+    keyset_sort,
+    new_seed,
+    query_fingerprint,
+    shuffle_segments,
+)
 
 logger = get_logger(__name__)
 
@@ -79,94 +105,14 @@ class ProductService:
             logger.warning(f"Unrecognized age value in feed: {age_str!r}")
         return mapped
 
-    @cacheable(key_prefix="merchant_feed", tags=["products"])
-    async def generate_merchant_feed_xml(self, request: Request, target) -> str:
-        """
-        Generates Google Merchant Feed.
-        Optimized to process 20k+ records in batches to keep memory footprints low.
-        """
-        rss = ET.Element("rss", version="2.0")
-        rss.set("xmlns:g", "http://base.google.com/ns/1.0")
-        channel = ET.SubElement(rss, "channel")
-        ET.SubElement(channel, "title").text = "Revoque Product Feed"
-        ET.SubElement(channel, "link").text = settings.FRONTEND_HOST
-        ET.SubElement(channel, "description").text = "Automated product sync feed for Google Merchant Center"
-
-        batch_size = 1000
-        skip = 0
-
-        availability_map = {
-            "google": {"in": "in_stock", "out": "out_of_stock"},
-            "meta": {"in": "in stock", "out": "out of stock"},
-        }
+    def stream_merchant_feed(self, target: str) -> AsyncIterator[str]:
+        """Full feed streamed straight from the database, one chunk per page."""
+        return stream_feed(self.db, target, self.map_age_group)
 
-        while True:
-            products = await self.db.product.find_many(
-                where={"active": True},
-                include={"variants": True, "images": True, "categories": True},
-                order={"created_at": "desc"},
-                take=batch_size,
-                skip=skip
-            )
-            if not products:
-                break
-
-            for prod in products:
-                for variant in prod.variants:
-                    item = ET.SubElement(channel, "item")
-                    ET.SubElement(item, "g:id").text = variant.sku
-
-                    variant_title = prod.name or ""
-
-                    detail_parts = []
-                    if variant.size:
-                        detail_parts.append(f"Size:{variant.size}")
-                    if variant.width:
-                        detail_parts.append(f"W:{variant.width}cm")
-                    if variant.length:
-                        detail_parts.append(f"L:{variant.length}cm")
-                    if variant.age:
-                        detail_parts.append(f"Age:{variant.age}")
-                    if detail_parts:
-                        variant_title += f" ({', '.join(detail_parts)})"
-
-                    ET.SubElement(item, "g:title").text = variant_title.strip()
-                    ET.SubElement(item, "g:description").text = prod.description or "No description available."
-
-                    ET.SubElement(item, "g:link").text = f"{settings.FRONTEND_HOST}/products/{prod.slug}"
-
-                    main_image = prod.image or (prod.images[0].image if prod.images else f"{settings.FRONTEND_HOST}/placeholder.jpg")
-                    ET.SubElement(item, "g:image_link").text = main_image
-                    ET.SubElement(item, "g:availability").text = (
-                        availability_map[target]["in"] if variant.inventory > 0 else availability_map[target]["out"]
-                    )
-                    ET.SubElement(item, "g:condition").text = "new" if prod.is_new else "used"
-                    if variant.old_price and variant.old_price > variant.price:
-                        ET.SubElement(item, "g:price").text = f"{variant.old_price:.2f} NGN"
-                        ET.SubElement(item, "g:sale_price").text = f"{variant.price:.2f} NGN"
-                    else:
-                        ET.SubElement(item, "g:price").text = f"{variant.price:.2f} NGN"
-
-
-                    if variant.size: ET.SubElement(item, "g:size").text = variant.size
-                    if variant.color: ET.SubElement(item, "g:color").text = variant.color
-
-                    if variant.age:
-                        mapped_age = self.map_age_group(variant.age)
-                        if mapped_age:
-                            ET.SubElement(item, "g:age_group").text = mapped_age
-
-                    if prod.categories:
-                        ET.SubElement(item, "g:product_type").text = ", ".join(
-                            c.name for c in prod.categories
-                        )
-                    ET.SubElement(item, "g:identifier_exists").text = "no"
-
-            skip += batch_size
-            await asyncio.sleep(0.01)  # Yield loop to allow other network requests to process
-
-        xml_str = ET.tostring(rss, encoding="utf-8", method="xml").decode("utf-8")
-        return f'<?xml version="1.0" encoding="utf-8"?>\n{xml_str}'
+    def stream_incremental_merchant_feed(self, target: str) -> AsyncIterator[str]:
+        """Feed served from stored per-product fragments; only products that
+        changed since the last build are re-rendered."""
+        return stream_incremental_feed(self.db, self.cache_srv, target, self.map_age_group)
 
     async def get_similar_products(self, product_id: int, limit: int) -> list:
         key: str = f"product:{product_id}:similar"
@@ -176,7 +122,7 @@ class ProductService:
 
         ids = ids[:limit]
 
-        documents = self.search_srv.get_documents_by_filter(
+        documents = await self.search_srv.get_documents_by_filter(
             f"id IN [{','.join(ids)}]", limit
         )
 
@@ -189,96 +135,162 @@ class ProductService:
         return documents
 
     async def get_personalized_recommendations(self, user_id: int, limit: int) -> list:
-        product_ids = await self.cache_srv.redis.lrange(f"user:{user_id}:history", 0, 4)
-        if not product_ids:
-            return []
-
-        recommendation_scores = Counter()
-        seen = set(product_ids)
-
-        for pid in product_ids:
-            similar_ids = await self.cache_srv.redis.lrange(f"product:{pid}:similar", 0, -1)
-            for sid in similar_ids:
-                if sid not in seen:
-                    recommendation_scores[sid] += 1
-
-        if not recommendation_scores:
-            return []
-
-        top_ids = [pid for pid, _ in recommendation_scores.most_common(10)]
-        filter_str = " OR ".join([f"id = {pid}" for pid in top_ids])
-
-        results = await self.search_srv.search_index("", {"filter": filter_str, "limit": limit, "attributesToRetrieve": PRODUCT_ATTRIBUTES})
-        return results["hits"]
+        engine = RecommendationEngine(self.cache_srv, self.search_srv)
+        return await engine.recommend(user_id, limit, attributes=PRODUCT_ATTRIBUTES)
 
     async def get_discovery_feed(self, **kwargs) -> Dict[str, Any]:
+        """
+        One page of the product feed. Sorted browsing continues by keyset and
+        the default random feed is a seeded shuffle whose seed travels in the
+        cursor (pass `seed` to pin it per session); text searches and sorts
+        that can't be used as a key page by offset. See app.services.discovery.
+        """
         search = kwargs.get("search", "")
         limit = kwargs.get("limit", 20)
-        cursor = kwargs.get("cursor")
         sort = kwargs.get("sort", "id:desc")
-
-        offset = 0
-        if cursor:
-            try:
-                offset = int(self._decode_cursor(cursor))
-            except (ValueError, TypeError):
-                offset = 0
+        skip_offset = kwargs.get("skip_offset")
 
         base_filters: list[str] = self._build_search_filters_list(kwargs)
         disable_random_feed: bool = self._has_active_filters(kwargs) or bool(search)
 
-        search_params: Dict[str, Any] = {"limit": limit, "offset": offset, "attributesToRetrieve": PRODUCT_ATTRIBUTES}
-        if base_filters:
-            search_params["filter"] = " AND ".join(base_filters)
-
-        search_params["sort"] = [sort] if disable_random_feed else ["random_score:asc"]
+        fingerprint = query_fingerprint(search, base_filters, sort if disable_random_feed else "shuffle")
+        state = decode_cursor(kwargs.get("cursor"), fingerprint)
+        keyset = keyset_sort(sort) if disable_random_feed and not search else None
 
         try:
-            res = await self.search_srv.search_index(search if disable_random_feed else "", search_params)
-            hits = res["hits"]
-            total_count = res["estimatedTotalHits"]
+            if skip_offset is not None or (disable_random_feed and keyset is None):
+                return await self._offset_feed_page(search, base_filters, sort, limit, skip_offset, state, fingerprint, disable_random_feed)
+
+            if state and state["k"] != ("key" if keyset else "rnd"):
+                state = None
+            if keyset:
+                seed, segments = None, [(None, *keyset)]
+            else:
+                seed = (state or {}).get("s") or kwargs.get("seed") or new_seed()
+                segments = shuffle_segments(str(seed))
+            return await self._keyset_feed_page(base_filters, segments, limit, state, fingerprint, seed)
         except Exception as e:
             logger.error(f"Meilisearch cluster error: {e}")
             raise HTTPException(status_code=502, detail="Search service unavailable")
 
+    async def _offset_feed_page(self, search, base_filters, sort, limit, skip_offset, state, fingerprint, disable_random_feed) -> Dict[str, Any]:
+        offset = skip_offset if skip_offset is not None else (state["o"] if state and state["k"] == "off" else 0)
+        search_params: Dict[str, Any] = {"limit": limit, "offset": offset, "attributesToRetrieve": PRODUCT_ATTRIBUTES}
+        if base_filters:
+            search_params["filter"] = " AND ".join(base_filters)
+        search_params["sort"] = [sort] if disable_random_feed else ["random_score:asc"]
+        if offset == 0:
+            search_params["facets"] = [*FACET_FIELDS, PRICE_FIELD]
+
+        res = await self.search_srv.search_index(search if disable_random_feed else "", search_params)
+        hits = res["hits"]
+        total_count = res["estimatedTotalHits"]
+
         next_cursor = None
         next_offset = offset + len(hits)
         if next_offset < total_count and len(hits) == limit:
-            next_cursor = self._encode_cursor(str(next_offset))
+            next_cursor = encode_cursor({"q": fingerprint, "k": "off", "t": total_count, "o": next_offset})
 
         return {
             "products": hits,
             "limit": limit,
             "total_count": total_count,
             "next_cursor": next_cursor,
+            **self._feed_facets(res if offset == 0 else None),
         }
 
-    async def query_collection_index(self) -> dict:
-        collections = ["trending", "new-arrivals", "featured"]
-
-        async def fetch_collection(col: str):
-            search_params = {
-                "limit": 6 if col == "trending" else 8,
-                "sort": ["id:desc"],
-                "filter": f'active = true AND collection_slugs = "{col}"',
-                "attributesToRetrieve": PRODUCT_ATTRIBUTES
+    def _feed_facets(self, res: Optional[dict]) -> Dict[str, Any]:
+        if res is None or "facetDistribution" not in res:
+            return {}
+        facets = shape(res["facetDistribution"] or {}, res.get("estimatedTotalHits", 0))
+        return {"facets": facets["facets"], "price_histogram": facets["price_histogram"]}
+
+    async def _keyset_feed_page(self, base_filters, segments, limit, state, fingerprint, seed) -> Dict[str, Any]:
+        """Read segments in order from the cursor's position until the page
+        is full. The first page also counts the whole feed and its facets, in
+        the same /multi-search request; later pages carry the total in the cursor."""
+        seg = state["seg"] if state else 0
+        after = state["a"] if state else None
+        total_count = state["t"] if state else None
+
+        hits: list = []
+        count: Optional[dict] = None
+        while seg < len(segments) and len(hits) < limit:
+            seg_filter, field, direction = segments[seg]
+            filters = list(base_filters)
+            if seg_filter:
+                filters.append(seg_filter)
+            if after:
+                filters.append(after_filter(field, direction, *after))
+            params: Dict[str, Any] = {
+                "limit": limit - len(hits),
+                "filter": " AND ".join(filters),
+                "sort": [f"{field}:{direction}"] + ([] if field == "id" else [f"id:{direction}"]),
+                "attributesToRetrieve": [*PRODUCT_ATTRIBUTES, field],
             }
-            try:
-                res = await self.search_srv.search_index("", search_params)
-            except MeilisearchApiError as e:
-                if getattr(e, "code", None) in {"invalid_search_filter", "invalid_search_sort"}:
-                    await self.search_srv.ensure_index_ready()
-                    res = await self.search_srv.search_index("", search_params)
-                else:
-                    raise HTTPException(status_code=502, detail="Search service communication error")
+            if total_count is None:
+                count_params = {"limit": 0, "filter": " AND ".join(base_filters), "facets": [*FACET_FIELDS, PRICE_FIELD]}
+                res, count = await asyncio.gather(
+                    self.search_srv.search_index("", params),
+                    self.search_srv.search_index("", count_params),
+                )
+                total_count = count["estimatedTotalHits"]
+            else:
+                res = await self.search_srv.search_index("", params)
+
+            page = res["hits"]
+            if page:
+                after = [None if field == "id" else page[-1].get(field), page[-1]["id"]]
+                if field not in PRODUCT_ATTRIBUTES:
+                    for hit in page:
+                        hit.pop(field, None)
+            hits += page
+            if res["estimatedTotalHits"] > len(page):
+                break  # this segment has more
+            seg, after = seg + 1, None
+
+        next_cursor = None
+        if seg < len(segments):
+            cursor_state = {"q": fingerprint, "k": "rnd" if seed else "key", "t": total_count or 0, "seg": seg, "a": after}
+            if seed:
+                cursor_state["s"] = seed
+            next_cursor = encode_cursor(cursor_state)
+
+        return {
+            "products": hits,
+            "limit": limit,
+            "total_count": total_count or 0,
+            "next_cursor": next_cursor,
+            **self._feed_facets(count),
+        }
 
-            key_name: str = "arrival" if col == "new-arrivals" else col
-            return key_name, res.get("hits", [])
+    async def get_facet_snapshot(self, cat_ids: str = "", collections: str = "") -> dict:
+        scope = scope_for(cat_ids, collections)
+        filters = self._build_search_filters_list({"cat_ids": cat_ids, "collections": collections})
+        return await get_facet_snapshot(self.cache_srv.redis, self.search_srv, scope, filters)
 
-        tasks = [fetch_collection(col) for col in collections]
-        completed_tasks = await asyncio.gather(*tasks)
+    async def rebuild_facets(self) -> Optional[int]:
+        try:
+            return await rebuild_facets(self.db, self.cache_srv, self._prepare_product_data_for_indexing)
+        except Exception as e:
+            logger.error(f"[Facets] Rebuild failed: {e}")
+            return None
 
-        return {key: hits for key, hits in completed_tasks}
+    async def query_collection_index(self) -> dict:
+        collections = {"trending": 6, "new-arrivals": 8, "featured": 8}
+        results = await self.search_srv.multi_search([
+            {
+                "limit": limit,
+                "sort": ["id:desc"],
+                "filter": f'active = true AND collection_slugs = "{col}"',
+                "attributesToRetrieve": PRODUCT_ATTRIBUTES,
+            }
+            for col, limit in collections.items()
+        ])
+        return {
+            ("arrival" if col == "new-arrivals" else col): res.get("hits", [])
+            for col, res in zip(collections, results)
+        }
 
     def _has_active_filters(self, kw) -> bool:
         return any([
@@ -300,17 +312,6 @@ class ProductService:
         if kw.get("length"): filters.append(f"lengths IN [{kw['length']}]")
         return filters
 
-    def _encode_cursor(self, value: str) -> str:
-        """Encodes a plain string value (like an offset integer) into a URL-safe base64 string."""
-        return base64.urlsafe_b64encode(value.encode()).decode()
-
-    def _decode_cursor(self, cursor: str) -> str:
-        """Decodes a URL-safe base64 string back into its original plain string value."""
-        try:
-            return base64.urlsafe_b64decode(cursor.encode()).decode()
-        except Exception:
-            return "0"
-
     def _prepare_product_data_for_indexing(self, product: Product) -> dict:
         product_dict: dict = {
             "id": product.id,
@@ -320,7 +321,7 @@ class ProductService:
             "sku": product.sku,
             "active": product.active,
             "is_new": getattr(product, "is_new", False),
-            "random_score": random.random(),
+            **{field: random.random() for field in RANDOM_SCORE_FIELDS},
         }
 
         product_dict["collection_slugs"] = [c.slug for c in (product.collections or [])]
@@ -364,6 +365,7 @@ class ProductService:
         variant_prices = [v["price"] for v in variants if v.get("price") is not None]
         product_dict["min_variant_price"] = min(variant_prices) if variant_prices else 0
         product_dict["max_variant_price"] = max(variant_prices) if variant_prices else 0
+        product_dict["price_bucket"] = price_bucket(product_dict["min_variant_price"])
 
         product_dict["status"] = (
             "IN STOCK" if any(v["inventory"] > 0 for v in variants) else "OUT OF STOCK"
@@ -372,33 +374,20 @@ class ProductService:
         return product_dict
 
     async def invalidate(self, id: int) -> None:
-        try:
-            product = await self.db.product.find_unique(
-                where={"id": id},
-                include={
-                    "categories": True,
-                    "collections": True,
-                    "variants": True,
-                    "images": True,
-                    "shared_collections": True,
-                }
-            )
-
-            if not product:
-                logger.warning(f"Product with id {id} not found for re-indexing.")
-                return
-
-            product_data = self._prepare_product_data_for_indexing(product=product)
-            await self.search_srv.update_document(index_name=settings.MEILI_PRODUCTS_INDEX, document=product_data)
-            await asyncio.gather(
-                self.cdn_srv.purge_cloudfare(f"/api/product/{product.slug}"),
-                self.cdn_srv.purge_vercel(f"product:{product.slug}", "products"),
-                return_exceptions=True
-            )
-            await self.cache_srv.invalidate(f"product:{product.slug}", tags=["products", "catalog", "gallery"])
-        except Exception as e:
-            logger.error(f"Error re-indexing product {id}: {e}")
+        await self.invalidate_many([id])
 
+    async def invalidate_many(self, product_ids: List[int]) -> None:
+        """
+        Re-indexes products and purges their caches. Inside the app this goes
+        through the debounced invalidation bus, so ids from concurrent callers
+        are flushed together as one invalidate_all; returns once that batch is done.
+        """
+        if not product_ids:
+            return
+        if product_invalidation_bus.running:
+            await product_invalidation_bus.submit(*product_ids)
+            return
+        await self.invalidate_all(product_ids=product_ids, existing_product_ids=product_ids)
 
     async def invalidate_all(self, product_ids: Optional[List[int]] = None, existing_product_ids: Optional[List[int]] = None):
         """
@@ -407,6 +396,8 @@ class ProductService:
         try:
             logger.debug("Starting re-indexing process...")
             if product_ids:
+                await mark_feed_dirty(self.cache_srv.redis, product_ids)
+                await mark_sitemap_dirty(self.cache_srv.redis, product_ids)
                 products = await self.db.product.find_many(
                     where={"id": {"in": product_ids}},
                     include={
@@ -417,12 +408,16 @@ class ProductService:
                         "shared_collections": True,
                     }
                 )
+                documents = [self._prepare_product_data_for_indexing(p) for p in products]
+                by_id = {doc["id"]: doc for doc in documents}
+                await apply_facet_changes(self.cache_srv.redis, {pid: by_id.get(pid) for pid in product_ids})
                 if not products:
                     logger.warning(f"Products with ids {product_ids} not found for re-indexing.")
                     return
+                await forget_stock(self.cache_srv.redis, [v.id for p in products for v in (p.variants or [])])
 
-                documents = [self._prepare_product_data_for_indexing(p) for p in products]
-                await self.search_srv.add_documents_to_index(index_name=settings.MEILI_PRODUCTS_INDEX, documents=documents)
+                # purge only once the documents are searchable, or the old results get cached again
+                await self.search_srv.add_documents_to_index(index_name=settings.MEILI_PRODUCTS_INDEX, documents=documents, wait=True)
 
                 existing_set = set(existing_product_ids or [])
                 cloudfare_paths = [f"/api/product/{p.slug}" for p in products if p.id in existing_set]
@@ -437,52 +432,26 @@ class ProductService:
                     await asyncio.gather(*tasks, return_exceptions=True)
                 await self.cache_srv.invalidate(
                     *vercel_tags,
+                    *[CARD_KEY.format(id=p.id) for p in products],
                     tags=["products", "catalog", "gallery", "stats-trends"]
                 )
                 logger.debug(f"Successfully targeted indexed {len(documents)} products")
                 return
 
-            # Full Index Rebuild in Chunks
-            logger.debug("Clearing search index for clean sync...")
-            await self.search_srv.clear_index(index_name=settings.MEILI_PRODUCTS_INDEX)
-
-            BATCH_SIZE = 500
-            skip = 0
-            total_processed = 0
-
-            while True:
-                products_batch = await self.db.product.find_many(
-                    include={
-                        "categories": True,
-                        "collections": True,
-                        "variants": True,
-                        "images": True,
-                        "shared_collections": True,
-                    },
-                    where={"active": True},
-                    take=BATCH_SIZE,
-                    skip=skip
-                )
-                if not products_batch:
-                    break
-
-                documents = []
-                for product in products_batch:
-                    try:
-                        product_data = self._prepare_product_data_for_indexing(product)
-                        documents.append(product_data)
-                    except Exception as e:
-                        logger.error(f"Error preparing product model {product.id}: {e}")
-
-                if documents:
-                    await self.search_srv.add_documents_to_index(index_name=settings.MEILI_PRODUCTS_INDEX, documents=documents)
-
-                total_processed += len(documents)
-                logger.debug(f"Indexed batch chunk: {skip // BATCH_SIZE + 1} ({len(documents)} records added)")
-
-                skip += BATCH_SIZE
-                await asyncio.sleep(0.05)  # Yield block back to application loop thread
+            # Full rebuild into a shadow index that is swapped in once complete;
+            # the live index keeps serving until then
+            total_processed = await ProductIndexRebuild(
+                db=self.db,
+                client=self.search_srv.client,
+                cache_srv=self.cache_srv,
+                prepare=self._prepare_product_data_for_indexing,
+            ).run()
+            if total_processed is None:
+                return
 
+            await reset_feed(self.cache_srv.redis)
+            await reset_sitemap(self.cache_srv.redis)
+            await self.rebuild_facets()
             await self.cdn_srv.purge_vercel("products")
             await self.cache_srv.invalidate(tags=["products", "catalog"])
             logger.debug(f"Successfully batch indexed total of {total_processed} products")
@@ -495,10 +464,12 @@ class ProductService:
         try:
             if len(product_ids) == 0:
                 return
-            await asyncio.gather(*[
-                self.search_srv.delete_document(index_name=settings.MEILI_PRODUCTS_INDEX, document_id=str(pid))
-                for pid in product_ids
-            ])
+            await self.search_srv.delete_documents(
+                index_name=settings.MEILI_PRODUCTS_INDEX, document_ids=[str(pid) for pid in product_ids], wait=True
+            )
+            await mark_feed_dirty(self.cache_srv.redis, product_ids)
+            await mark_sitemap_dirty(self.cache_srv.redis, product_ids)
+            await apply_facet_changes(self.cache_srv.redis, {pid: None for pid in product_ids})
             keys: list[str] = [f"product:{id}" for id in product_ids]
             await self.cdn_srv.purge_vercel("products")
             await self.cache_srv.invalidate(tags=["products", "catalog", "stats-trends"] + keys)
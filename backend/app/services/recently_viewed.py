@@ -31,13 +31,15 @@ class RecentlyViewedService:
 
         product_ids = await self.cache_srv.redis.zrevrange(key, 0, limit - 1)
 
-        products = []
-        for pid in product_ids:
-            try:
-                product = self.search_srv.get_document_by_id(doc_id=pid)
-                if product:
-                    products.append(product)
-            except Exception as e:
-                logger.error(f"Error getting product: {str(e)}")
-
-        return products
\ No newline at end of file
+        if not product_ids:
+            return []
+
+        try:
+            documents = await self.search_srv.get_documents_by_filter(f"id IN [{','.join(product_ids)}]", len(product_ids))
+        except Exception as e:
+            logger.error(f"Error getting products: {str(e)}")
+            return []
+
+        # one fetch for the whole list, then back into most-recent-first order
+        by_id = {str(doc["id"]): doc for doc in documents}
+        return [by_id[pid] for pid in product_ids if pid in by_id]
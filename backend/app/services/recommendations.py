@@ -0,0 +1,200 @@
+"""
+Personalized recommendations scored in-process.
+
+The worker's embedding job writes each product's nearest neighbors with
+their cosine similarity to `product:{id}:neighbors` and stamps the id in
+`recs:neighbors:updated`. Every process keeps those rows in a compact
+neighbor matrix (one row of ids and one of weights per product), so a
+request costs one Redis round trip for the user's history and the list of
+rows the worker refreshed since the last sync, plus one pipelined round
+trip for whatever rows are missing or stale.
+
+Scores are the similarity-weighted neighbor counts over the history, with
+each history item decayed by how far back it sits, computed in one NumPy
+pass. Products come from the process's L1 product cards; only misses are
+fetched from Meilisearch.
+"""
+import time
+from typing import Any, Optional
+import numpy as np
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+NEIGHBORS_KEY = "product:{id}:neighbors"  # zset: neighbor id -> similarity
+LEGACY_NEIGHBORS_KEY = "product:{id}:similar"  # list, ranking only
+UPDATED_KEY = "recs:neighbors:updated"  # zset: product id -> time its row was rewritten
+HISTORY_KEY = "user:{id}:history"  # list, most recent first
+CARD_KEY = "product:card:{id}"
+
+ROW_WIDTH = 10  # neighbors kept per product
+MAX_ROWS = 50_000
+ROW_TTL = 3600  # reload rows even without an update stamp (the stamp zset is trimmed)
+HISTORY_SIZE = 20
+HALF_LIFE = 5.0  # history positions until an item counts half
+
+
+class NeighborMatrix:
+    """Per-process neighbor rows. Row i holds up to ROW_WIDTH neighbor ids
+    (padded with -1) and their similarity weights for the product mapped
+    to i. Rows are loaded on demand and dropped when the worker re-stamps
+    them; the whole matrix is reset if it outgrows MAX_ROWS."""
+
+    def __init__(self, width: int = ROW_WIDTH, max_rows: int = MAX_ROWS, row_ttl: float = ROW_TTL) -> None:
+        self.width = width
+        self.max_rows = max_rows
+        self.row_ttl = row_ttl
+        self.synced_at = time.time()  # newest update stamp seen; rows load fresh anyway
+        self._reset(256)
+
+    def _reset(self, capacity: int) -> None:
+        self.ids = np.full((capacity, self.width), -1, dtype=np.int64)
+        self.weights = np.zeros((capacity, self.width), dtype=np.float32)
+        self.loaded_at = np.zeros(capacity, dtype=np.float64)
+        self.rows: dict[int, int] = {}
+        self._free: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def missing(self, product_ids: list[int], now: float) -> list[int]:
+        return [
+            pid for pid in product_ids
+            if pid not in self.rows or now - self.loaded_at[self.rows[pid]] > self.row_ttl
+        ]
+
+    def drop(self, product_ids: list[int]) -> None:
+        for pid in product_ids:
+            row = self.rows.pop(pid, None)
+            if row is not None:
+                self._free.append(row)
+
+    def put(self, product_id: int, neighbor_ids: list[int], weights: list[float], now: float) -> None:
+        row = self.rows.get(product_id)
+        if row is None:
+            if len(self.rows) >= self.max_rows:
+                logger.info(f"[Recs] Neighbor matrix full ({len(self.rows)} rows), resetting")
+                self._reset(len(self.ids))
+            row = self._free.pop() if self._free else len(self.rows)
+            if row >= len(self.ids):
+                self._grow()
+            self.rows[product_id] = row
+        n = min(len(neighbor_ids), self.width)
+        self.ids[row, :] = -1
+        self.weights[row, :] = 0.0
+        self.ids[row, :n] = neighbor_ids[:n]
+        self.weights[row, :n] = weights[:n]
+        self.loaded_at[row] = now
+
+    def _grow(self) -> None:
+        capacity = len(self.ids) * 2
+        self.ids = np.concatenate([self.ids, np.full_like(self.ids, -1)])[:capacity]
+        self.weights = np.concatenate([self.weights, np.zeros_like(self.weights)])[:capacity]
+        self.loaded_at = np.concatenate([self.loaded_at, np.zeros_like(self.loaded_at)])[:capacity]
+
+    def score(self, history: list[int], limit: int, half_life: float = HALF_LIFE) -> list[int]:
+        """Top `limit` neighbor ids of `history` (most recent first), by
+        similarity summed over the history with exponential recency decay.
+        Products already in the history are excluded."""
+        present = [(pos, self.rows[pid]) for pos, pid in enumerate(history) if pid in self.rows]
+        if not present or limit <= 0:
+            return []
+        positions = np.fromiter((pos for pos, _ in present), dtype=np.float32, count=len(present))
+        rows = np.fromiter((row for _, row in present), dtype=np.int64, count=len(present))
+
+        decay = np.power(np.float32(0.5), positions / np.float32(half_life))
+        ids = self.ids[rows].ravel()
+        weights = (self.weights[rows] * decay[:, None]).ravel()
+
+        keep = (ids >= 0) & (weights > 0) & ~np.isin(ids, np.asarray(history, dtype=np.int64))
+        if not keep.any():
+            return []
+        candidates, inverse = np.unique(ids[keep], return_inverse=True)
+        scores = np.bincount(inverse, weights=weights[keep])
+        top = np.argsort(-scores, kind="stable")[:limit]
+        return candidates[top].tolist()
+
+
+class RecommendationEngine:
+    def __init__(self, cache_srv: Any, search_srv: Any, matrix: Optional[NeighborMatrix] = None) -> None:
+        self.cache_srv = cache_srv
+        self.redis = cache_srv.redis
+        self.search_srv = search_srv
+        self.matrix = matrix if matrix is not None else neighbor_matrix
+
+    async def recommend(self, user_id: int, limit: int, attributes: Optional[list[str]] = None) -> list[dict]:
+        history, updated = await self._history_and_updates(user_id)
+        if not history:
+            return []
+
+        now = time.time()
+        self.matrix.drop(updated)
+        await self._load(self.matrix.missing(history, now), now)
+
+        top_ids = self.matrix.score(history, limit)
+        if not top_ids:
+            return []
+        return await self.cards(top_ids, attributes)
+
+    async def _history_and_updates(self, user_id: int) -> tuple[list[int], list[int]]:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.lrange(HISTORY_KEY.format(id=user_id), 0, HISTORY_SIZE - 1)
+            pipe.zrangebyscore(UPDATED_KEY, f"({self.matrix.synced_at}", "+inf", withscores=True)
+            raw_history, stamps = await pipe.execute()
+
+        history: list[int] = []
+        for pid in raw_history:
+            if pid.isdigit() and int(pid) not in history:
+                history.append(int(pid))
+        if stamps:
+            self.matrix.synced_at = max(self.matrix.synced_at, max(score for _, score in stamps))
+        return history, [int(pid) for pid, _ in stamps if pid.isdigit()]
+
+    async def _load(self, product_ids: list[int], now: float) -> None:
+        """Fetch the given rows in one pipelined round trip. Products the
+        worker has not scored yet fall back to their legacy similar list
+        with unit weights."""
+        if not product_ids:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for pid in product_ids:
+                pipe.zrevrange(NEIGHBORS_KEY.format(id=pid), 0, self.matrix.width - 1, withscores=True)
+                pipe.lrange(LEGACY_NEIGHBORS_KEY.format(id=pid), 0, self.matrix.width - 1)
+            results = await pipe.execute()
+
+        for i, pid in enumerate(product_ids):
+            scored, legacy = results[2 * i], results[2 * i + 1]
+            if scored:
+                ids = [int(n) for n, _ in scored]
+                weights = [max(float(w), 0.0) for _, w in scored]
+            else:
+                ids = [int(n) for n in legacy if n.isdigit()]
+                weights = [1.0] * len(ids)
+            self.matrix.put(pid, ids, weights, now)
+
+    async def cards(self, product_ids: list[int], attributes: Optional[list[str]] = None) -> list[dict]:
+        """Product documents in the given order, from this process's L1 where
+        possible. Misses are fetched in one documents call and kept there."""
+        l1 = self.cache_srv.l1
+        found: dict[int, dict] = {}
+        if l1 is not None:
+            for pid in product_ids:
+                card = l1.get(CARD_KEY.format(id=pid))
+                if card is not None:
+                    found[pid] = card
+
+        misses = [pid for pid in product_ids if pid not in found]
+        if misses:
+            documents = await self.search_srv.get_documents_by_filter(
+                f"id IN [{','.join(map(str, misses))}]", len(misses)
+            )
+            for doc in documents:
+                card = {k: doc[k] for k in attributes if k in doc} if attributes else dict(doc)
+                found[int(doc["id"])] = card
+                if l1 is not None:
+                    l1.set(CARD_KEY.format(id=doc["id"]), card)
+
+        return [found[pid] for pid in product_ids if pid in found]
+
+
+neighbor_matrix = NeighborMatrix()
@@ -0,0 +1,238 @@
+"""
+Blue/green rebuild of the products search index.
+
+The live index keeps serving while a shadow index (`{live}_{timestamp}`,
+with the live index's settings) is filled: products are read by keyset on
+id and uploaded a few batches at a time in parallel. After every wave the
+last uploaded id is checkpointed in Redis, so a rebuild that dies half way
+resumes from there instead of from zero.
+
+Once the copy is done, products changed since the rebuild started are
+re-applied, the shadow's ids are reconciled against the DB and its
+document count checked, and only then are the two indexes swapped in one
+Meilisearch task. The old documents (now under the shadow name) are dropped.
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.services.meili import MeiliClient, MeiliError
+from app.services.search import REQUIRED_FILTERABLES, REQUIRED_SORTABLES, get_or_create_index
+
+logger = get_logger(__name__)
+
+REINDEX_BATCH_SIZE = 1000
+REINDEX_PARALLEL = 4  # batches uploaded concurrently per wave
+REINDEX_LOCK_TTL = 3600
+CHECKPOINT_KEY = "search:reindex:{index}"  # hash: shadow, last_id, indexed, started_at
+ID_PAGE_SIZE = 10_000
+
+PRODUCT_INCLUDE: dict = {
+    "categories": True,
+    "collections": True,
+    "variants": True,
+    "images": True,
+    "shared_collections": True,
+}
+
+
+class ProductIndexRebuild:
+    def __init__(
+        self,
+        db: Any,
+        client: MeiliClient,
+        cache_srv: Any,
+        prepare: Callable[[Any], dict],
+        index_name: Optional[str] = None,
+        batch_size: int = REINDEX_BATCH_SIZE,
+        parallel: int = REINDEX_PARALLEL,
+    ) -> None:
+        self.db = db
+        self.client = client
+        self.cache_srv = cache_srv
+        self.redis = cache_srv.redis
+        self.prepare = prepare
+        self.index = index_name or settings.MEILI_PRODUCTS_INDEX
+        self.batch_size = batch_size
+        self.parallel = parallel
+        self.checkpoint_key = CHECKPOINT_KEY.format(index=self.index)
+        self.skipped: set[int] = set()  # products that failed to serialize
+
+    async def run(self) -> Optional[int]:
+        """Rebuild and swap. Returns the number of documents in the new live
+        index, or None if another worker is already rebuilding."""
+        token = await self.cache_srv.acquire_lock(f"reindex:{self.index}", ttl=REINDEX_LOCK_TTL)
+        if token is None:
+            logger.info(f"[Search] Rebuild of {self.index} already running on another worker")
+            return None
+        try:
+            shadow, last_id, indexed, started_at = await self._start_or_resume()
+            indexed = await self._copy(shadow, last_id, indexed)
+            await self._catch_up(shadow, since=started_at)
+            total = await self._validate(shadow)
+
+            swap_started = datetime.now(timezone.utc)
+            await self._wait(await self.client.swap_indexes([(self.index, shadow)]), "swap")
+            await self.redis.delete(self.checkpoint_key)
+            try:
+                await self.client.delete_index(shadow)  # holds the previous documents now
+            except MeiliError as e:
+                logger.warning(f"[Search] Failed to drop old index {shadow}: {e}")
+
+            # writes that went to the old live index while validating
+            await self._catch_up(self.index, since=swap_started)
+            logger.info(f"[Search] Swapped {shadow} in as {self.index} ({total} documents, {indexed} uploaded)")
+            return total
+        finally:
+            await self.cache_srv.release_lock(f"reindex:{self.index}", token)
+
+    async def _wait(self, task: dict, what: str) -> None:
+        result = await self.client.wait_for_task(task["taskUid"], timeout_ms=120_000)
+        if result.get("status") != "succeeded":
+            raise MeiliError(f"{what} task {task['taskUid']} {result.get('status')}: {result.get('error')}")
+
+    async def _start_or_resume(self) -> tuple[str, int, int, datetime]:
+        checkpoint = await self.redis.hgetall(self.checkpoint_key)
+        if checkpoint:
+            shadow = checkpoint["shadow"]
+            try:
+                await self.client.get_index(shadow)
+                logger.info(f"[Search] Resuming rebuild into {shadow} after id {checkpoint['last_id']}")
+                return (
+                    shadow,
+                    int(checkpoint["last_id"]),
+                    int(checkpoint["indexed"]),
+                    datetime.fromisoformat(checkpoint["started_at"]),
+                )
+            except MeiliError as e:
+                logger.warning(f"[Search] Checkpointed index {shadow} is gone ({e}), starting over")
+
+        started_at = datetime.now(timezone.utc)
+        shadow = f"{self.index}_{int(time.time())}"
+        if not await get_or_create_index(self.index, self.client):
+            raise MeiliError(f"Live index {self.index} unavailable", code="communication_error")
+
+        index_settings = await self.client.get_settings(self.index)
+        index_settings["filterableAttributes"] = sorted(set(index_settings.get("filterableAttributes") or []) | set(REQUIRED_FILTERABLES))
+        index_settings["sortableAttributes"] = sorted(set(index_settings.get("sortableAttributes") or []) | set(REQUIRED_SORTABLES))
+        await self._wait(await self.client.create_index(shadow), "create")
+        await self._wait(await self.client.update_settings(shadow, index_settings), "settings")
+
+        await self.redis.hset(self.checkpoint_key, mapping={
+            "shadow": shadow, "last_id": 0, "indexed": 0, "started_at": started_at.isoformat(),
+        })
+        logger.info(f"[Search] Rebuilding {self.index} into {shadow}")
+        return shadow, 0, 0, started_at
+
+    def _documents(self, products: list) -> list[dict]:
+        documents = []
+        for product in products:
+            try:
+                documents.append(self.prepare(product))
+            except Exception as e:
+                self.skipped.add(product.id)
+                logger.error(f"Error preparing product model {product.id}: {e}")
+        return documents
+
+    async def _upload(self, index: str, documents: list[dict]) -> None:
+        if documents:
+            await self._wait(await self.client.add_documents(index, documents), "upload")
+
+    async def _copy(self, shadow: str, last_id: int, indexed: int) -> int:
+        """Read the next wave while the previous one uploads; checkpoint a
+        wave only once all of its batches have been indexed."""
+        uploading: Optional[asyncio.Task] = None
+        wave_end, wave_count = last_id, 0
+        cursor = last_id
+        while True:
+            wave: list[list] = []
+            for _ in range(self.parallel):
+                products = await self.db.product.find_many(
+                    where={"active": True, "id": {"gt": cursor}},
+                    include=PRODUCT_INCLUDE,
+                    order={"id": "asc"},
+                    take=self.batch_size,
+                )
+                if not products:
+                    break
+                wave.append(products)
+                cursor = products[-1].id
+                if len(products) < self.batch_size:
+                    break
+
+            if uploading is not None:
+                await uploading
+                indexed += wave_count
+                await self.redis.hset(self.checkpoint_key, mapping={"last_id": wave_end, "indexed": indexed})
+                logger.debug(f"[Search] Rebuild checkpoint at id {wave_end} ({indexed} documents)")
+            if not wave:
+                return indexed
+
+            batches = [self._documents(products) for products in wave]
+            uploading = asyncio.ensure_future(asyncio.gather(*[self._upload(shadow, docs) for docs in batches]))
+            wave_end, wave_count = cursor, sum(len(docs) for docs in batches)
+
+    async def _catch_up(self, index: str, since: datetime) -> None:
+        """Re-apply products updated since `since`, including those where only
+        a variant changed (stock decrements don't touch the product row):
+        active ones are re-added, the rest removed."""
+        last_id = 0
+        while True:
+            products = await self.db.product.find_many(
+                where={
+                    "id": {"gt": last_id},
+                    "OR": [
+                        {"updated_at": {"gte": since}},
+                        {"variants": {"some": {"updated_at": {"gte": since}}}},
+                    ],
+                },
+                include=PRODUCT_INCLUDE,
+                order={"id": "asc"},
+                take=self.batch_size,
+            )
+            if not products:
+                return
+            await self._upload(index, self._documents([p for p in products if p.active]))
+            inactive = [str(p.id) for p in products if not p.active]
+            if inactive:
+                await self._wait(await self.client.delete_documents(index, inactive), "delete")
+            last_id = products[-1].id
+
+    async def _index_ids(self, index: str) -> set[int]:
+        ids: set[int] = set()
+        offset = 0
+        while True:
+            page = await self.client.get_documents(index, limit=ID_PAGE_SIZE, offset=offset, fields=["id"])
+            ids.update(int(doc["id"]) for doc in page)
+            if len(page) < ID_PAGE_SIZE:
+                return ids
+            offset += ID_PAGE_SIZE
+
+    async def _validate(self, shadow: str) -> int:
+        """Make the shadow's ids match the active products in the DB, then
+        check its document count. Raises (leaving the checkpoint for the next
+        run) if they still disagree."""
+        rows = await self.db.query_raw('SELECT id FROM "products" WHERE active = true')
+        expected = {int(row["id"]) for row in rows}
+        present = await self._index_ids(shadow)
+
+        extra = present - expected
+        if extra:
+            await self._wait(await self.client.delete_documents(shadow, [str(i) for i in extra]), "delete")
+        missing = sorted(expected - present - self.skipped)
+        for start in range(0, len(missing), self.batch_size):
+            products = await self.db.product.find_many(
+                where={"id": {"in": missing[start:start + self.batch_size]}}, include=PRODUCT_INCLUDE
+            )
+            await self._upload(shadow, self._documents(products))
+        if extra or missing:
+            logger.warning(f"[Search] Reconciled {shadow}: removed {len(extra)}, added {len(missing)}")
+
+        stats = await self.client.get_stats(shadow)
+        count = stats.get("numberOfDocuments", 0)
+        want = len(expected - self.skipped)
+        if count != want:
+            raise MeiliError(f"{shadow} has {count} documents, expected {want}", code="reindex_count_mismatch")
+        return count
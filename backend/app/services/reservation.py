@@ -0,0 +1,182 @@
+"""
+Inventory reservations.
+
+Every variant has a small ledger in Redis:
+
+    inv:{id}:stock  cached DB inventory, reloaded from the caller after STOCK_TTL
+    inv:{id}:held   units currently held across all carts
+    inv:{id}:holds  zset of cart id -> hold expiry (ms)
+    inv:{id}:qty    hash of cart id -> units held
+
+A cart *holds* the absolute quantity it wants; the Lua script purges expired
+holds, checks `stock - held + own hold` and applies every variant in the
+request or none of them. Scripts run one at a time on the Redis server, so
+concurrent shoppers fighting over the last units are serialized there
+instead of on Postgres row locks. Payment *commits* a hold: the units leave
+the ledger and the stock is reset to the decremented DB value.
+"""
+import time
+from typing import Dict, Iterable, Optional
+from redis.asyncio import Redis
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+STOCK_TTL = 300  # seconds before the cached stock is refreshed from the DB
+
+_HOLD_SCRIPT = """
+local cart, now, expires = ARGV[1], tonumber(ARGV[2]), ARGV[3]
+local stock_ttl, ledger_ttl = ARGV[4], ARGV[5]
+local n = #KEYS / 4
+local short = {}
+
+for i = 0, n - 1 do
+    local stock, held, holds, qty = KEYS[i*4+1], KEYS[i*4+2], KEYS[i*4+3], KEYS[i*4+4]
+    local want = tonumber(ARGV[6 + i*2])
+    if tonumber(ARGV[7 + i*2]) >= 0 then
+        redis.call('SET', stock, ARGV[7 + i*2], 'NX', 'EX', stock_ttl)
+    end
+
+    local expired = redis.call('ZRANGEBYSCORE', holds, '-inf', now)
+    for _, id in ipairs(expired) do
+        local q = tonumber(redis.call('HGET', qty, id) or '0')
+        redis.call('HDEL', qty, id)
+        redis.call('ZREM', holds, id)
+        if q > 0 then redis.call('DECRBY', held, q) end
+    end
+
+    local current = tonumber(redis.call('HGET', qty, cart) or '0')
+    local available = tonumber(redis.call('GET', stock) or '0') - tonumber(redis.call('GET', held) or '0') + current
+    -- shrinking a hold always succeeds, even if stock dropped below it
+    if want > current and want > available then
+        table.insert(short, i)
+        table.insert(short, math.max(available, 0))
+    end
+end
+if #short > 0 then
+    return short
+end
+
+for i = 0, n - 1 do
+    local held, holds, qty = KEYS[i*4+2], KEYS[i*4+3], KEYS[i*4+4]
+    local want = tonumber(ARGV[6 + i*2])
+    local current = tonumber(redis.call('HGET', qty, cart) or '0')
+    if want > 0 then
+        redis.call('HSET', qty, cart, want)
+        redis.call('ZADD', holds, expires, cart)
+    else
+        redis.call('HDEL', qty, cart)
+        redis.call('ZREM', holds, cart)
+    end
+    if want ~= current then
+        redis.call('INCRBY', held, want - current)
+    end
+    redis.call('EXPIRE', held, ledger_ttl)
+    redis.call('EXPIRE', holds, ledger_ttl)
+    redis.call('EXPIRE', qty, ledger_ttl)
+end
+return short
+"""
+
+_COMMIT_SCRIPT = """
+local cart, stock_ttl = ARGV[1], ARGV[2]
+for i = 0, #KEYS / 4 - 1 do
+    local stock, held, holds, qty = KEYS[i*4+1], KEYS[i*4+2], KEYS[i*4+3], KEYS[i*4+4]
+    local q = tonumber(redis.call('HGET', qty, cart) or '0')
+    if q > 0 then
+        redis.call('HDEL', qty, cart)
+        redis.call('DECRBY', held, q)
+    end
+    redis.call('ZREM', holds, cart)
+    redis.call('SET', stock, ARGV[3 + i], 'EX', stock_ttl)
+end
+return 1
+"""
+
+
+def _keys(variant_id: int) -> list[str]:
+    prefix = f"inv:{int(variant_id)}"
+    return [f"{prefix}:stock", f"{prefix}:held", f"{prefix}:holds", f"{prefix}:qty"]
+
+
+async def forget_stock(redis: Redis, variant_ids: Iterable[int]) -> None:
+    """Drop cached stock after an inventory edit so the next hold reloads it from the DB."""
+    keys = [_keys(vid)[0] for vid in variant_ids if vid is not None]
+    if not keys:
+        return
+    try:
+        await redis.delete(*keys)
+    except Exception as e:
+        logger.error(f"[Inventory] Failed to reset stock for {keys}: {e}")
+
+
+class InventoryReservations:
+    def __init__(self, redis: Redis) -> None:
+        self.redis = redis
+        self._hold_script = redis.register_script(_HOLD_SCRIPT)
+        self._commit_script = redis.register_script(_COMMIT_SCRIPT)
+
+    async def hold(
+        self,
+        holder: int,
+        quantities: Dict[int, int],
+        stock: Dict[int, int],
+        ttl: Optional[int] = None,
+    ) -> Dict[int, int]:
+        """
+        Set `holder`'s hold on each variant to the given quantity (0 releases it),
+        all or nothing. `stock` is the DB inventory per variant, used when the
+        cached stock has expired. Returns {variant_id: units available} for the
+        variants that can't be held; an empty dict means every hold was applied.
+        """
+        if not quantities:
+            return {}
+        ttl = ttl or settings.INVENTORY_HOLD_TTL
+        variant_ids = sorted(quantities)
+        keys: list[str] = []
+        args: list = []
+        for vid in variant_ids:
+            keys += _keys(vid)
+            # -1: stock unknown, leave the cached value alone (releases don't need it)
+            args += [max(int(quantities[vid]), 0), max(int(stock[vid] or 0), 0) if vid in stock else -1]
+
+        now_ms = int(time.time() * 1000)
+        ledger_ttl = max(ttl, settings.INVENTORY_CHECKOUT_HOLD_TTL) * 2
+        try:
+            short = await self._hold_script(
+                keys=keys,
+                args=[str(holder), now_ms, now_ms + ttl * 1000, STOCK_TTL, ledger_ttl, *args],
+            )
+        except Exception as e:
+            # Fail open: the DB checks still apply and payment still decrements in one UPDATE
+            logger.error(f"[Inventory] Failed to hold {quantities} for cart {holder}: {e}")
+            return {}
+        return {variant_ids[int(short[i])]: int(short[i + 1]) for i in range(0, len(short), 2)}
+
+    async def release(self, holder: int, variant_ids: Iterable[int]) -> None:
+        await self.hold(holder, {vid: 0 for vid in variant_ids}, {})
+
+    async def commit(self, holder: int, inventory: Dict[int, int]) -> None:
+        """Drop `holder`'s holds once the order is paid and pin each variant's
+        stock to its decremented DB inventory."""
+        if not inventory:
+            return
+        variant_ids = sorted(inventory)
+        keys: list[str] = []
+        for vid in variant_ids:
+            keys += _keys(vid)
+        try:
+            await self._commit_script(
+                keys=keys,
+                args=[str(holder), STOCK_TTL, *[max(int(inventory[vid]), 0) for vid in variant_ids]],
+            )
+        except Exception as e:
+            logger.error(f"[Inventory] Failed to commit holds of cart {holder}: {e}")
+
+    async def available(self, variant_id: int) -> Optional[int]:
+        """Units not held by any cart, or None if the stock isn't cached."""
+        stock, held = await self.redis.mget(_keys(variant_id)[:2])
+        if stock is None:
+            return None
+        return int(stock) - int(held or 0)
@@ -1,190 +1,214 @@
 import asyncio
-from datetime import datetime
-from typing import Any, Optional
-from meilisearch import Client
-from meilisearch.errors import MeilisearchApiError
-from anyio import to_thread
+from typing import Optional
 from app.core.config import settings
 from app.core.logging import get_logger
-from json import JSONEncoder
-from uuid import UUID
+from app.services.meili import MAX_MULTI_SEARCH, MeiliClient, MeiliError, meili
+from app.services.index_queue import search_index_queue
 
+# independent shuffles of the catalogue; a discovery feed seed picks one
+RANDOM_SCORE_FIELDS: list[str] = ["random_score", "random_score_1", "random_score_2", "random_score_3"]
+REQUIRED_FILTERABLES: list[str] = ["id", "category_slugs", "collection_slugs", "name", "max_variant_price", "min_variant_price", "active", "sizes", "colors", "ages", "widths", "lengths", "price_bucket", *RANDOM_SCORE_FIELDS]
+REQUIRED_SORTABLES: list[str] = ["id", "created_at", "max_variant_price", "min_variant_price", *RANDOM_SCORE_FIELDS]
 
-client = Client(settings.MEILI_HOST, settings.MEILI_MASTER_KEY)
+logger = get_logger(__name__)
 
-REQUIRED_FILTERABLES: list[str] = ["id", "category_slugs", "collection_slugs", "name", "max_variant_price", "min_variant_price", "active", "sizes", "colors", "ages", "widths", "lengths"]
-REQUIRED_SORTABLES: list[str] = ["id", "random_score", "created_at", "max_variant_price", "min_variant_price"]
+# Indexes known to exist in this process; SearchService is built per request
+_ready_indexes: set[str] = set()
 
-logger = get_logger(__name__)
 
+def _empty_result(query: dict) -> dict:
+    return {"hits": [], "estimatedTotalHits": 0, "query": query.get("q", ""), "limit": query.get("limit", 0), "offset": 0}
 
-class CustomEncoder(JSONEncoder):
-    def default(self, o):
-        if isinstance(o, (UUID, datetime)):
-            return str(o)
-        return super().default(o)
 
-def get_or_create_index(index_name: str) -> Optional[Any]:
+async def get_or_create_index(index_name: str, client: MeiliClient = meili) -> bool:
     """
-    Get or create a Meilisearch index safely. Returns None if Meilisearch is unreachable.
+    Make sure a Meilisearch index exists, creating and configuring it if needed.
+    Returns False if Meilisearch is unreachable.
     """
+    if index_name in _ready_indexes:
+        return True
     try:
-        return client.get_index(index_name)
-    except MeilisearchApiError as e:
-        logger.warning(f"MeilisearchApiError while fetching index: {index_name}")
-        error_code = getattr(e, "code", None)
-        if error_code == "index_not_found":
-            try:
-                index = client.index(index_name)
-                create_task = client.create_index(uid=index_name)
-                index.wait_for_task(create_task.task_uid)
-
-                filter_task = index.update_filterable_attributes(REQUIRED_FILTERABLES)
-                index.wait_for_task(filter_task.task_uid)
-
-                sort_task = index.update_sortable_attributes(REQUIRED_SORTABLES)
-                index.wait_for_task(sort_task.task_uid)
-                return index
-            except Exception as inner_e:
-                logger.error(f"Failed to create and configure index {index_name}: {inner_e}")
-                return None
-    except Exception as e:
-        logger.warning(f"Meilisearch instance unreachable or returning invalid response for {index_name}: {e}")
+        await client.get_index(index_name)
+    except MeiliError as e:
+        if e.code != "index_not_found":
+            logger.warning(f"Meilisearch instance unreachable or returning invalid response for {index_name}: {e}")
+            return False
+        logger.warning(f"Meilisearch index {index_name} not found, creating it")
         try:
-            client.create_index(index_name)
-            return client.index(index_name)
-        except Exception:
-            return None
+            task = await client.create_index(index_name)
+            await client.wait_for_task(task["taskUid"])
+            task = await client.update_settings(index_name, {
+                "filterableAttributes": REQUIRED_FILTERABLES,
+                "sortableAttributes": REQUIRED_SORTABLES,
+            })
+            await client.wait_for_task(task["taskUid"])
+        except Exception as inner_e:
+            logger.error(f"Failed to create and configure index {index_name}: {inner_e}")
+            return False
+    _ready_indexes.add(index_name)
+    return True
 
 
 class SearchService:
-    def __init__(self):
-        self._index = None
+    def __init__(self, client: MeiliClient = meili):
+        self.client = client
         self.index_name = settings.MEILI_PRODUCTS_INDEX
 
-    @property
-    def index(self):
-        """
-        Dynamically try to fetch the index if it wasn't successfully loaded initially.
-        """
-        if self._index is None:
-            self._index = get_or_create_index(self.index_name)
-        return self._index
+    async def index_ready(self, index_name: Optional[str] = None) -> bool:
+        return await get_or_create_index(index_name or self.index_name, self.client)
 
     async def search_index(self, query: str, options: dict) -> dict:
-        if not self.index:
+        if not await self.index_ready():
             logger.warning("Search dropped: Meilisearch index is unavailable.")
             return {"hits": [], "nbHits": 0, "exhaustiveNbHits": False, "query": query, "limit": 0, "offset": 0, "processingTimeMs": 0}
 
-        def _search():
-            return self.index.search(query, options)
-            
         try:
-            return await to_thread.run_sync(_search)
+            return await self.client.search(self.index_name, query, options)
         except Exception as e:
             logger.error(f"Error during search query: {e}")
             return {"hits": [], "nbHits": 0}
 
-    async def ensure_index_ready(self):
-        if not self.index:
-            return
-        def _configure():
-            filter_task = self.index.update_filterable_attributes(REQUIRED_FILTERABLES)
-            self.index.wait_for_task(filter_task.task_uid)
-
-            sort_task = self.index.update_sortable_attributes(REQUIRED_SORTABLES)
-            self.index.wait_for_task(sort_task.task_uid)
+    async def multi_search(self, queries: list[dict]) -> list[dict]:
+        """
+        Runs several queries in one /multi-search round trip. Each query is a
+        search body (`q`, `filter`, `limit`, ...) against the products index
+        unless it names its own `indexUid`. Results come back in query order;
+        a query Meilisearch rejects gets an empty result instead of failing the rest.
+        """
+        if not queries:
+            return []
+        if not await self.index_ready():
+            logger.warning("Multi-search dropped: Meilisearch index is unavailable.")
+            return [_empty_result(q) for q in queries]
 
+        bodies = [{"indexUid": self.index_name, "q": "", **q} for q in queries]
         try:
-            await to_thread.run_sync(_configure)
+            results: list[dict] = []
+            for start in range(0, len(bodies), MAX_MULTI_SEARCH):
+                res = await self.client.multi_search(bodies[start:start + MAX_MULTI_SEARCH])
+                results += res["results"]
+            return results
+        except MeiliError as e:
+            if e.code == "communication_error":
+                logger.error(f"Error during multi-search: {e}")
+                return [_empty_result(q) for q in queries]
+            logger.error(f"Multi-search rejected ({e.code}: {e}), retrying queries one by one")
+
+        # straight to /indexes/{uid}/search; client.search would batch them back into /multi-search
+        singles = await asyncio.gather(*[self.client.search_one(body) for body in bodies], return_exceptions=True)
+        return [_empty_result(q) if isinstance(r, BaseException) else r for q, r in zip(queries, singles)]
+
+    async def validate_index(self) -> bool:
+        """
+        Startup check: make sure the products index exists and has every
+        required filterable/sortable attribute, updating settings only when
+        something is missing. Keeps configuration off the request path.
+        """
+        if not await self.index_ready():
+            return False
+        try:
+            current = await self.client.get_settings(self.index_name)
+            filterable = set(current.get("filterableAttributes") or [])
+            sortable = set(current.get("sortableAttributes") or [])
+            missing_filterable = set(REQUIRED_FILTERABLES) - filterable
+            missing_sortable = set(REQUIRED_SORTABLES) - sortable
+            if not missing_filterable and not missing_sortable:
+                logger.debug(f"Meilisearch index {self.index_name} settings OK")
+                return True
+
+            logger.warning(
+                f"Meilisearch index {self.index_name} missing filterable {sorted(missing_filterable)} "
+                f"/ sortable {sorted(missing_sortable)}, updating settings"
+            )
+            task = await self.client.update_settings(self.index_name, {
+                "filterableAttributes": sorted(filterable | set(REQUIRED_FILTERABLES)),
+                "sortableAttributes": sorted(sortable | set(REQUIRED_SORTABLES)),
+            })
+            result = await self.client.wait_for_task(task["taskUid"], timeout_ms=120_000)
+            return result.get("status") == "succeeded"
         except Exception as e:
-            logger.error(f"Failed to run ensure_index_ready: {e}")
-
+            logger.error(f"Failed to validate index {self.index_name}: {e}")
+            return False
 
-    def get_document_by_id(self, doc_id: str):
-        if not self.index:
+    async def get_document_by_id(self, doc_id: str) -> Optional[dict]:
+        if not await self.index_ready():
             return None
         try:
-            doc = self.index.get_document(doc_id)
-            return dict(doc)
+            return await self.client.get_document(self.index_name, doc_id)
         except Exception as e:
             logger.error(f"Error fetching document by ID: {e}")
             return None
 
-    def get_documents_by_filter(self, filter_str: str, limit: int) -> list:
-        if not self.index:
+    async def get_documents_by_filter(self, filter_str: str, limit: int) -> list:
+        if not await self.index_ready():
             return []
         try:
-            results = self.index.get_documents({"filter": filter_str, "limit": limit})
-            return results.results
+            return await self.client.get_documents(self.index_name, filter=filter_str, limit=limit)
         except Exception as e:
             logger.error(f"Error fetching documents by filter: {e}")
             return []
 
     async def update_document(self, index_name: str, document: dict) -> None:
-        if not self.index:
-            logger.warning("Skipping document update: Meilisearch unavailable.")
-            return
-        def _update():
-            task = self.index.update_documents([document], serializer=CustomEncoder)
-            self.index.wait_for_task(task.task_uid, timeout_in_ms=30000)
-            return task
+        await self._write("update", index_name, [document])
 
-        try:
-            task = await to_thread.run_sync(_update)
-            logger.debug(f"Updated document {document['id']} in index {index_name}, task: {task.task_uid}")
-        except Exception as e:
-            logger.error(f"Failed to update document: {e}")
+    async def add_documents_to_index(self, index_name: str, documents: list, wait: bool = False) -> None:
+        await self._write("add", index_name, documents, wait=wait)
 
-    async def add_documents_to_index(self, index_name: str, documents: list) -> None:
-        if not self.index:
-            logger.warning("Skipping add documents: Meilisearch unavailable.")
-            return
-        def _add():
-            task = self.index.add_documents(documents, primary_key="id", serializer=CustomEncoder)
-            self.index.wait_for_task(task.task_uid, timeout_in_ms=30000)
-            return task
+    async def delete_document(self, index_name: str, document_id: str) -> None:
+        await self._write("delete", index_name, [document_id])
 
-        try:
-            task = await to_thread.run_sync(_add)
-            logger.debug(f"Added {len(documents)} documents to index {index_name}, task: {task.task_uid}")
-        except Exception as e:
-            logger.error(f"Failed to add documents: {e}")
+    async def delete_documents(self, index_name: str, document_ids: list, wait: bool = False) -> None:
+        await self._write("delete", index_name, document_ids, wait=wait)
 
-    async def delete_document(self, index_name: str, document_id: str) -> None:
-        if not self.index:
+    async def _write(self, kind: str, index_name: str, payload: list, wait: bool = False) -> None:
+        """
+        Hands the write to the index queue, which batches it with other writes
+        and tracks the Meilisearch task. Outside the app (workers, scripts) the
+        task is submitted directly. With `wait`, returns once Meilisearch has
+        processed it (up to 30s), so callers can purge caches afterwards.
+        """
+        if not payload:
+            return
+        if search_index_queue.running:
+            # the queue retries through Meilisearch outages
+            getattr(search_index_queue, kind)(index_name, payload)
+            if wait:
+                ids = payload if kind == "delete" else [doc["id"] for doc in payload]
+                await search_index_queue.wait_indexed(index_name, ids, timeout=30)
+            return
+        if not await self.index_ready(index_name):
+            logger.warning(f"Skipping {kind} of {len(payload)} documents: Meilisearch unavailable.")
             return
-        def _delete():
-            task = self.index.delete_document(document_id)
-            self.index.wait_for_task(task.task_uid, timeout_in_ms=30000)
-            return task
-
         try:
-            task = await to_thread.run_sync(_delete)
-            logger.debug(f"Deleted document {document_id} from index {index_name}, task: {task.task_uid}")
+            if kind == "add":
+                task = await self.client.add_documents(index_name, payload, primary_key="id")
+            elif kind == "update":
+                task = await self.client.update_documents(index_name, payload)
+            else:
+                task = await self.client.delete_documents(index_name, payload)
+            logger.debug(f"Enqueued {kind} of {len(payload)} documents in index {index_name}, task: {task['taskUid']}")
+            if wait:
+                await self.client.wait_for_task(task["taskUid"], timeout_ms=30_000)
         except Exception as e:
-            logger.error(f"Failed to delete document: {e}")
+            logger.error(f"Failed to {kind} documents: {e}")
 
     async def clear_index(self, index_name: str) -> None:
-        if not self.index:
+        if not await self.index_ready(index_name):
             return
-        def _clear():
-            task = self.index.delete_all_documents()
-            self.index.wait_for_task(task.task_uid, timeout_in_ms=30000)
-            return task
-
         try:
-            task = await to_thread.run_sync(_clear)
-            logger.debug(f"Cleared index {index_name}, task: {task.task_uid}")
+            task = await self.client.delete_all_documents(index_name)
+            logger.debug(f"Clearing index {index_name}, task: {task['taskUid']}")
         except Exception as e:
             logger.error(f"Failed to clear index: {e}")
 
-    def update_settings(self):
-        if not self.index:
+    async def update_settings(self):
+        if not await self.index_ready():
             return
         try:
-            self.index.update_filterable_attributes(REQUIRED_FILTERABLES)
-            self.index.update_sortable_attributes(REQUIRED_SORTABLES)
+            await self.client.update_settings(self.index_name, {
+                "filterableAttributes": REQUIRED_FILTERABLES,
+                "sortableAttributes": REQUIRED_SORTABLES,
+            })
         except Exception as e:
             logger.error(f"Failed to update settings: {e}")
 
@@ -192,28 +216,15 @@ class SearchService:
         """
         Directly checks Meilisearch instance status.
         """
-        def _check_health() -> bool:
-            try:
-                # Fallback to direct client call if index hasn't initialized
-                target = self.index.http if self.index else client.http
-                health = target.get("/health")
-                return health.get("status") == "available"
-            except Exception:
-                return False
-
         try:
-            return await asyncio.wait_for(
-                to_thread.run_sync(_check_health),
-                timeout=2.0
-            )
+            return await asyncio.wait_for(self.client.health(timeout=2.0), timeout=2.0)
         except Exception:
             return False
 
-    def delete_index(self, index_name: str) -> None:
+    async def delete_index(self, index_name: str) -> None:
         try:
-            client.delete_index(index_name)
+            await self.client.delete_index(index_name)
+            _ready_indexes.discard(index_name)
             logger.debug(f"Deleted index {index_name}")
-            if index_name == self.index_name:
-                self._index = None
         except Exception as e:
-            logger.error(f"Failed to delete index: {e}")
\ No newline at end of file
+            logger.error(f"Failed to delete index: {e}")
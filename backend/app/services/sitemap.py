@@ -0,0 +1,188 @@
+"""
+Sharded sitemap.
+
+The sitemap index lists one `pages` shard (home, collections, categories)
+plus one shard per block of SITEMAP_SHARD_SIZE product ids. Shards are
+stored gzip-compressed in Redis and never expire; a product change marks
+only its own shard dirty and the next index request rebuilds just that
+shard. The pages shard is rebuilt when a category or collection has a
+newer `updated_at` than the stored build.
+"""
+import gzip
+import re
+from datetime import datetime
+from typing import Any, Iterable, Optional
+from xml.sax.saxutils import escape
+from redis.asyncio import Redis
+from redis.client import NEVER_DECODE
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.services.cache import CacheService
+
+logger = get_logger(__name__)
+
+SITEMAP_SHARD_SIZE = 10_000  # product ids per shard; the protocol caps a file at 50k URLs
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+PAGES_SHARD = "pages"
+_SHARD_NAME = re.compile(r"pages|products-\d+")
+
+SHARD_KEY = "sitemap:shard:{name}"   # gzip-compressed <urlset>
+LASTMOD_KEY = "sitemap:lastmod"      # hash: shard name -> lastmod of its newest URL
+DIRTY_KEY = "sitemap:dirty"          # set of shard names waiting for a rebuild
+PAGES_BUILT_KEY = "sitemap:pages:source"
+
+
+def product_shard(product_id: int) -> str:
+    return f"products-{int(product_id) // SITEMAP_SHARD_SIZE}"
+
+
+def _lastmod(value: Any) -> Optional[str]:
+    """W3C date from a datetime or the ISO string query_raw returns."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    return str(value)[:10]
+
+
+def _urlset(urls: Iterable[tuple[str, Optional[str]]]) -> bytes:
+    parts = [f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">']
+    for loc, lastmod in urls:
+        parts.append(f"<url><loc>{escape(loc)}</loc>")
+        if lastmod:
+            parts.append(f"<lastmod>{lastmod}</lastmod>")
+        parts.append("</url>")
+    parts.append("</urlset>")
+    return "".join(parts).encode()
+
+
+async def mark_sitemap_dirty(redis: Redis, product_ids: Iterable[int]) -> None:
+    """Queue the shards holding these products for a rebuild."""
+    shards = {product_shard(pid) for pid in product_ids if pid is not None}
+    if not shards:
+        return
+    try:
+        await redis.sadd(DIRTY_KEY, *shards)
+    except Exception as e:
+        logger.error(f"[Sitemap] Failed to mark shards {shards} dirty: {e}")
+
+
+async def reset_sitemap(redis: Redis) -> None:
+    """Drop the shard list so the next request rebuilds every shard."""
+    try:
+        await redis.delete(LASTMOD_KEY)
+    except Exception as e:
+        logger.error(f"[Sitemap] Failed to reset sitemap: {e}")
+
+
+class SitemapService:
+    def __init__(self, db: Any, cache_srv: CacheService) -> None:
+        self.db = db
+        self.cache_srv = cache_srv
+        self.redis = cache_srv.redis
+        self.base_url = settings.FRONTEND_HOST.rstrip("/")
+
+    async def _build_pages(self) -> tuple[bytes, Optional[str]]:
+        collections = await self.db.query_raw('SELECT slug, updated_at FROM "collections" ORDER BY id')
+        categories = await self.db.query_raw('SELECT slug, updated_at FROM "categories" ORDER BY id')
+        urls = [(f"{self.base_url}/", None)]
+        urls += [(f"{self.base_url}/collections/{c['slug']}", _lastmod(c["updated_at"])) for c in collections]
+        urls += [(f"{self.base_url}/collections?cat_ids={c['slug']}", _lastmod(c["updated_at"])) for c in categories]
+        lastmods = [lastmod for _, lastmod in urls if lastmod]
+        return _urlset(urls), max(lastmods) if lastmods else None
+
+    async def _build_products(self, shard: int) -> tuple[bytes, Optional[str], int]:
+        rows = await self.db.query_raw(
+            'SELECT slug, updated_at FROM "products" WHERE active = true AND id >= $1 AND id < $2 ORDER BY id',
+            shard * SITEMAP_SHARD_SIZE,
+            (shard + 1) * SITEMAP_SHARD_SIZE,
+        )
+        urls = [(f"{self.base_url}/products/{row['slug']}", _lastmod(row["updated_at"])) for row in rows]
+        lastmods = [lastmod for _, lastmod in urls if lastmod]
+        return _urlset(urls), max(lastmods) if lastmods else None, len(rows)
+
+    async def rebuild_shard(self, name: str) -> None:
+        if name == PAGES_SHARD:
+            body, lastmod = await self._build_pages()
+            count = 1
+        else:
+            body, lastmod, count = await self._build_products(int(name.rsplit("-", 1)[1]))
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if count:
+                pipe.set(SHARD_KEY.format(name=name), gzip.compress(body, compresslevel=6))
+                pipe.hset(LASTMOD_KEY, name, lastmod or "")
+            else:
+                pipe.delete(SHARD_KEY.format(name=name))
+                pipe.hdel(LASTMOD_KEY, name)
+            await pipe.execute()
+        logger.debug(f"[Sitemap] Rebuilt shard {name} ({count} urls)")
+
+    async def _pages_source_version(self) -> str:
+        rows = await self.db.query_raw(
+            'SELECT (SELECT max(updated_at) FROM "collections") AS collections, '
+            '(SELECT max(updated_at) FROM "categories") AS categories, '
+            '(SELECT count(*) FROM "collections") + (SELECT count(*) FROM "categories") AS total'
+        )
+        row = rows[0] if rows else {}
+        return f"{row.get('collections')}|{row.get('categories')}|{row.get('total')}"
+
+    async def refresh(self) -> None:
+        """Rebuild whatever is missing or dirty. Serialized across workers;
+        a worker that loses the lock serves the shards already stored."""
+        token = await self.cache_srv.acquire_lock("sitemap", ttl=120)
+        if token is None:
+            return
+        try:
+            if not await self.redis.exists(LASTMOD_KEY):
+                rows = await self.db.query_raw('SELECT max(id) AS max_id FROM "products"')
+                max_id = (rows[0]["max_id"] if rows else None) or 0
+                shards = [PAGES_SHARD] + [f"products-{n}" for n in range(max_id // SITEMAP_SHARD_SIZE + 1)]
+                await self.redis.delete(DIRTY_KEY)
+            else:
+                shards = list(await self.redis.smembers(DIRTY_KEY))
+                if shards:
+                    await self.redis.srem(DIRTY_KEY, *shards)
+
+            pages_version = await self._pages_source_version()
+            if PAGES_SHARD not in shards and await self.redis.get(PAGES_BUILT_KEY) != pages_version:
+                shards.append(PAGES_SHARD)
+
+            for name in shards:
+                try:
+                    await self.rebuild_shard(name)
+                except Exception as e:
+                    logger.error(f"[Sitemap] Failed to rebuild shard {name}: {e}")
+                    await self.redis.sadd(DIRTY_KEY, name)
+            if PAGES_SHARD in shards:
+                await self.redis.set(PAGES_BUILT_KEY, pages_version)
+        finally:
+            await self.cache_srv.release_lock("sitemap", token)
+
+    async def get_index(self, shard_url: Any) -> bytes:
+        """<sitemapindex> for every stored shard; `shard_url(name)` builds its URL."""
+        await self.refresh()
+        lastmods = await self.redis.hgetall(LASTMOD_KEY)
+
+        def _order(name: str) -> tuple[int, int]:
+            return (0, 0) if name == PAGES_SHARD else (1, int(name.rsplit("-", 1)[1]))
+
+        parts = [f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">']
+        for name in sorted(lastmods, key=_order):
+            parts.append(f"<sitemap><loc>{escape(str(shard_url(name)))}</loc>")
+            if lastmods[name]:
+                parts.append(f"<lastmod>{lastmods[name]}</lastmod>")
+            parts.append("</sitemap>")
+        parts.append("</sitemapindex>")
+        return "".join(parts).encode()
+
+    async def get_shard(self, name: str) -> Optional[bytes]:
+        """The stored gzip body for a shard, building it first if it's missing."""
+        if not _SHARD_NAME.fullmatch(name):
+            return None
+        key = SHARD_KEY.format(name=name)
+        body = await self.redis.execute_command("GET", key, **{NEVER_DECODE: True})
+        if body is None:
+            await self.rebuild_shard(name)
+            body = await self.redis.execute_command("GET", key, **{NEVER_DECODE: True})
+        return body
@@ -1,21 +1,183 @@
-import asyncio, time
+import asyncio, json, os, socket, time, uuid, zlib
+from collections import deque
+from redis.asyncio import Redis
 from fastapi import WebSocket, WebSocketDisconnect
 from datetime import datetime, timezone, timedelta
 from app.core.logging import logger
-from typing import Dict, Optional
+from typing import Deque, Dict, Iterable, Optional
+
+WS_BROADCAST_CHANNEL = "ws:broadcast"
+WS_NODE_CHANNEL_PREFIX = "ws:node:"
+WS_ROUTE_PREFIX = "ws:route:"        # hash per shard: connection id -> node id
+WS_PRESENCE_PREFIX = "ws:presence:"  # hash per shard: connection id -> metadata JSON
+WS_SEEN_PREFIX = "ws:seen:"          # zset per shard: connection id -> last heartbeat
+
+# Drop a connection's presence only if this node still owns it — the user
+# may already have reconnected elsewhere.
+# KEYS: route, presence, seen  ARGV: connection id, node id
+_PRESENCE_REMOVE_SCRIPT = """
+if redis.call('HGET', KEYS[1], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+return 1
+"""
+
+# Expire idle presence in one shard. Entries owned by this node are removed
+# and returned so the caller can close the sockets; entries owned by another
+# node are only removed once they are past the orphan cutoff (that node has
+# missed several cleanup passes, so it's gone).
+# KEYS: route, presence, seen  ARGV: idle cutoff, orphan cutoff, node id
+_PRESENCE_EXPIRE_SCRIPT = """
+local stale = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[1], 'WITHSCORES')
+local mine = {}
+for i = 1, #stale, 2 do
+    local id = stale[i]
+    local owner = redis.call('HGET', KEYS[1], id)
+    if owner == ARGV[3] or not owner or tonumber(stale[i + 1]) <= tonumber(ARGV[2]) then
+        redis.call('HDEL', KEYS[1], id)
+        redis.call('HDEL', KEYS[2], id)
+        redis.call('ZREM', KEYS[3], id)
+        if owner == ARGV[3] then
+            table.insert(mine, id)
+        end
+    end
+end
+return mine
+"""
+
+
+def _serialize(message: dict) -> str:
+    # Same wire format as Starlette's send_json
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+class _Outbox:
+    """Per-socket outbound queue drained by its own task, so a slow client
+    only ever delays itself. Holds pre-serialized frames; once the queue is
+    half full, `invalidate` messages are folded into one pending key set
+    instead of queued. At `outbox_size`, queued invalidate frames are folded
+    too; if the queue is still full of chat/notification frames, the socket
+    is closed rather than silently losing one (the client reconnects and
+    refetches)."""
+
+    def __init__(self, manager: "InMemoryWebSocketManager", websocket: WebSocket) -> None:
+        self.manager = manager
+        self.websocket = websocket
+        # (frame, keys) -- keys only for invalidate frames, so they can be folded later
+        self.frames: Deque[tuple[str, Optional[list]]] = deque()
+        self.invalidate_keys: set = set()
+        self.overflowed = False
+        self._wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self._drain())
+
+    def push(self, frame: str, keys: Optional[Iterable[str]] = None) -> None:
+        if self.overflowed:
+            return
+        if len(self.frames) >= self.manager.outbox_size:
+            self._fold_invalidates()
+        if len(self.frames) >= self.manager.outbox_size:
+            self.overflowed = True
+            self.manager.stats["overflowed"] += 1
+            logger.warning(f"⚠️ WebSocket outbox full ({len(self.frames)} frames), closing slow client")
+        else:
+            self.frames.append((frame, None if keys is None else list(keys)))
+        self._wakeup.set()
+
+    def push_invalidate(self, frame: str, keys: Iterable[str]) -> None:
+        if len(self.frames) >= self.manager.outbox_size // 2:
+            self.invalidate_keys.update(keys)
+            self.manager.stats["coalesced"] += 1
+            self._wakeup.set()
+            return
+        self.push(frame, keys)
+
+    def _fold_invalidates(self) -> None:
+        kept: Deque[tuple[str, Optional[list]]] = deque()
+        for frame, keys in self.frames:
+            if keys is None:
+                kept.append((frame, keys))
+            else:
+                self.invalidate_keys.update(keys)
+                self.manager.stats["coalesced"] += 1
+        self.frames = kept
+
+    def close(self) -> None:
+        if self.task is not asyncio.current_task():
+            self.task.cancel()
+
+    def _next_frame(self) -> str:
+        if self.frames:
+            return self.frames.popleft()[0]
+        keys, self.invalidate_keys = list(self.invalidate_keys), set()
+        return _serialize({
+            "keys": keys,
+            "type": "invalidate",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        })
+
+    async def _drain(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self.frames or self.invalidate_keys or self.overflowed:
+                if self.overflowed:
+                    await self.manager.drop_socket(self.websocket)
+                    return
+                frame = self._next_frame()
+                try:
+                    async with self.manager.send_slots:
+                        await asyncio.wait_for(self.websocket.send_text(frame), timeout=self.manager.send_timeout)
+                    self.manager.stats["sent"] += 1
+                except asyncio.TimeoutError:
+                    self.manager.stats["timeouts"] += 1
+                    logger.debug("❌ WebSocket send timed out, dropping slow client")
+                    await self.manager.drop_socket(self.websocket)
+                    return
+                except Exception as e:
+                    if not isinstance(e, WebSocketDisconnect):
+                        logger.debug(f"❌ Failed to send message: {e}")
+                    await self.manager.drop_socket(self.websocket)
+                    return
+
 
 class InMemoryWebSocketManager:
-    def __init__(self, idle_timeout_seconds: int = 60 * 5) -> None:
+    def __init__(
+        self,
+        idle_timeout_seconds: int = 60 * 5,
+        max_concurrent_sends: int = 256,
+        send_timeout: float = 5.0,
+        outbox_size: int = 100,
+    ) -> None:
         self.connections: Dict[str, WebSocket] = {}
         self.heartbeats: Dict[str, Dict] = {}
         self.idle_timeout = timedelta(seconds=idle_timeout_seconds)
         self.cleanup_task = None
+        self.send_timeout = send_timeout
+        self.outbox_size = outbox_size
+        self.send_slots = asyncio.Semaphore(max_concurrent_sends)
+        # keyed by id(websocket): one socket can be registered under several ids
+        self._outboxes: Dict[int, _Outbox] = {}
+        self.stats: Dict[str, int] = {"sent": 0, "overflowed": 0, "coalesced": 0, "timeouts": 0}
 
     async def start(self) -> None:
         """Start background tasks (like idle cleanup)."""
         if not self.cleanup_task:
             self.cleanup_task = asyncio.create_task(self._idle_cleanup_loop())
 
+    async def stop(self) -> None:
+        """Cancel idle cleanup and every outbox drain task."""
+        tasks = [outbox.task for outbox in self._outboxes.values()]
+        if self.cleanup_task:
+            tasks.append(self.cleanup_task)
+        for task in tasks:
+            task.cancel()
+        self._outboxes.clear()
+        if tasks:
+            await asyncio.wait(tasks, timeout=1.0)
+
     async def register(self, user_id: str, websocket: WebSocket) -> None:
         """Register an already-accepted WebSocket under a new ID."""
         self.connections[str(user_id)] = websocket
@@ -33,8 +195,9 @@ class InMemoryWebSocketManager:
 
     async def disconnect(self, user_id: str) -> None:
         if user_id in self.connections:
+            websocket = self.connections[str(user_id)]
             try:
-                await self.connections[str(user_id)].close()
+                await websocket.close()
             except:
                 pass
             try:
@@ -42,43 +205,70 @@ class InMemoryWebSocketManager:
                 self.heartbeats.pop(str(user_id), None)
             except Exception as e:
                 logger.error(f"❌ Failed to disconnect user {user_id}: {e}")
+            if all(ws is not websocket for ws in self.connections.values()):
+                outbox = self._outboxes.pop(id(websocket), None)
+                if outbox:
+                    outbox.close()
             logger.debug(f"👋 User {user_id} disconnected.")
 
-    async def send_to_user(self, user_id: str, data: dict, message_type: str = "general") -> bool:
-        if user_id not in self.connections:
-            logger.warning(f"⚠️ User {user_id} not connected.")
-            return False
+    async def drop_socket(self, websocket: WebSocket) -> None:
+        """Disconnect every id registered to a socket that failed a send."""
+        for user_id in [uid for uid, ws in self.connections.items() if ws is websocket]:
+            await self.disconnect(user_id)
+        self._outboxes.pop(id(websocket), None)
+
+    def _outbox(self, websocket: WebSocket) -> _Outbox:
+        outbox = self._outboxes.get(id(websocket))
+        if outbox is None or outbox.websocket is not websocket:
+            outbox = self._outboxes[id(websocket)] = _Outbox(self, websocket)
+        return outbox
 
+    def _frame(self, data: dict, message_type: str) -> Optional[str]:
         message = {
             **data,
             "type": message_type,
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
-
         try:
-            await self.connections[user_id].send_json(message)
-            return True
-        except WebSocketDisconnect:
-            await self.disconnect(user_id)
-            return False
+            return _serialize(message)
         except Exception as e:
-            logger.debug(f"❌ Failed to send message to {user_id}: {e}")
-            await self.disconnect(user_id)
+            logger.error(f"❌ Failed to serialize '{message_type}' message: {e}")
+            return None
+
+    def _push_user(self, user_id: str, frame: str) -> bool:
+        websocket = self.connections.get(user_id)
+        if websocket is None:
             return False
+        self._outbox(websocket).push(frame)
+        return True
 
-    async def broadcast_to_all(self, data: dict, message_type: str = "broadcast") -> int:
-        message = {
-            **data,
-            "type": message_type,
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }
+    def _push_all(self, frame: str, message_type: str, keys: Iterable[str] = ()) -> int:
+        sockets = {id(ws): ws for ws in self.connections.values()}
+        for websocket in sockets.values():
+            outbox = self._outbox(websocket)
+            if message_type == "invalidate":
+                outbox.push_invalidate(frame, keys)
+            else:
+                outbox.push(frame)
+        return len(sockets)
 
-        sent = 0
-        for user_id in list(self.connections.keys()):
-            if await self.send_to_user(user_id, message, message_type=message_type):
-                sent += 1
+    async def send_to_user(self, user_id: str, data: dict, message_type: str = "general") -> bool:
+        """Queue a message for one user. Delivery happens on the socket's
+        outbox task; a failed send disconnects the user from there."""
+        if user_id not in self.connections:
+            logger.warning(f"⚠️ User {user_id} not connected.")
+            return False
+
+        frame = self._frame(data, message_type)
+        return frame is not None and self._push_user(user_id, frame)
 
-        return sent
+    async def broadcast_to_all(self, data: dict, message_type: str = "broadcast") -> int:
+        """Serialize once and queue on every connected socket. Never waits on
+        a client, so its cost doesn't grow with slow connections."""
+        frame = self._frame(data, message_type)
+        if frame is None:
+            return 0
+        return self._push_all(frame, message_type, data.get("keys", []))
 
     def get_connected_users(self) -> list:
         return list(self.connections.keys())
@@ -112,7 +302,7 @@ class InMemoryWebSocketManager:
                 "last_seen": int(time.time()) - int(data.get("updated_at", 0))
             })
 
-        await manager.broadcast_to_all({"users": sessions}, "online-users")
+        await self.broadcast_to_all({"users": sessions}, "online-users")
 
     async def promote_connection(self, old_id: str, new_id: str, metadata: Dict) -> bool:
         if old_id not in self.connections:
@@ -141,4 +331,247 @@ class InMemoryWebSocketManager:
             await asyncio.sleep(60)
 
 
-manager = InMemoryWebSocketManager()
+class RedisWebSocketManager(InMemoryWebSocketManager):
+    """Cross-node fan-out on top of the in-process manager.
+
+    Sockets still live in this process, but every node subscribes to
+    `ws:broadcast` and to its own `ws:node:{node_id}` channel, so
+    broadcast_to_all reaches every replica/worker and send_to_user routes
+    to whichever node holds the user. Presence (route, metadata, last
+    heartbeat) is sharded across `presence_shards` Redis hashes/zsets by
+    crc32 of the connection id; broadcast_sessions and idle cleanup read
+    those instead of scanning the local `heartbeats` dict, which is kept
+    only as this node's write-through copy.
+
+    Until start() is given a Redis client it behaves exactly like
+    InMemoryWebSocketManager.
+    """
+
+    def __init__(self, *args, presence_shards: int = 16, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.presence_shards = presence_shards
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.redis: Optional[Redis] = None
+        self.listener_task = None
+        self._pubsub = None
+
+    @property
+    def node_channel(self) -> str:
+        return f"{WS_NODE_CHANNEL_PREFIX}{self.node_id}"
+
+    def _shard_keys(self, user_id: str) -> list[str]:
+        shard = zlib.crc32(user_id.encode()) % self.presence_shards
+        return [f"{WS_ROUTE_PREFIX}{shard}", f"{WS_PRESENCE_PREFIX}{shard}", f"{WS_SEEN_PREFIX}{shard}"]
+
+    async def start(self, redis: Optional[Redis] = None) -> None:
+        if redis is not None and self.redis is None:
+            self.redis = redis
+            self._remove_presence_script = redis.register_script(_PRESENCE_REMOVE_SCRIPT)
+            self._expire_presence_script = redis.register_script(_PRESENCE_EXPIRE_SCRIPT)
+            # Subscribe before returning so nothing published after start() is missed
+            self._pubsub = redis.pubsub()
+            await self._pubsub.subscribe(WS_BROADCAST_CHANNEL, self.node_channel)
+            self.listener_task = asyncio.create_task(self._listen())
+            logger.debug(f"🛰️ WebSocket backplane started on node {self.node_id}")
+        await super().start()
+
+    async def stop(self) -> None:
+        if self.listener_task:
+            self.listener_task.cancel()
+            await asyncio.wait([self.listener_task], timeout=1.0)
+            self.listener_task = None
+        if self.redis is not None:
+            for user_id in list(self.connections):
+                await self._remove_presence(user_id)
+            try:
+                await self._pubsub.unsubscribe()
+                await self._pubsub.close()
+            except Exception:
+                pass
+        await super().stop()
+
+    async def _listen(self) -> None:
+        async for message in self._pubsub.listen():
+            if message["type"] != "message":
+                continue
+            try:
+                envelope = json.loads(message["data"])
+                if "user" in envelope:
+                    self._push_user(envelope["user"], envelope["frame"])
+                elif envelope.get("origin") != self.node_id:
+                    self._push_all(envelope["frame"], envelope["type"], envelope.get("keys", []))
+            except Exception as e:
+                logger.error(f"❌ Bad backplane message: {e}")
+
+    async def _write_presence(self, user_id: str, metadata: Optional[dict]) -> None:
+        route, presence, seen = self._shard_keys(user_id)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hset(route, user_id, self.node_id)
+                if metadata is not None:
+                    pipe.hset(presence, user_id, json.dumps(metadata))
+                    pipe.zadd(seen, {user_id: int(metadata.get("updated_at") or time.time())})
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"❌ Failed to write presence for {user_id}: {e}")
+
+    async def _remove_presence(self, user_id: str) -> None:
+        try:
+            await self._remove_presence_script(keys=self._shard_keys(user_id), args=[user_id, self.node_id])
+        except Exception as e:
+            logger.error(f"❌ Failed to remove presence for {user_id}: {e}")
+
+    async def register(self, user_id: str, websocket: WebSocket) -> None:
+        await super().register(user_id, websocket)
+        if self.redis is not None:
+            await self._write_presence(str(user_id), None)
+
+    async def connect(self, user_id: str, websocket: WebSocket, metadata: Optional[dict] = None) -> bool:
+        if not await super().connect(user_id, websocket, metadata):
+            return False
+        if self.redis is not None:
+            await self._write_presence(str(user_id), metadata)
+        return True
+
+    async def disconnect(self, user_id: str) -> None:
+        was_local = str(user_id) in self.connections
+        await super().disconnect(user_id)
+        if self.redis is not None and was_local:
+            await self._remove_presence(str(user_id))
+
+    async def promote_connection(self, old_id: str, new_id: str, metadata: Dict) -> bool:
+        if not await super().promote_connection(old_id, new_id, metadata):
+            return False
+        if self.redis is not None:
+            await self._remove_presence(old_id)
+            await self._write_presence(str(new_id), self.heartbeats[str(new_id)])
+        return True
+
+    async def handle_heartbeat(self, user_id: str, metadata: Dict) -> None:
+        await super().handle_heartbeat(user_id, metadata)
+        if self.redis is not None and user_id in self.heartbeats:
+            await self._write_presence(user_id, metadata)
+
+    async def handle_heartbeat_field(self, user_id: str, field: str, value: str) -> None:
+        await super().handle_heartbeat_field(user_id, field, value)
+        user_id = str(user_id)
+        if self.redis is None or not isinstance(self.heartbeats.get(user_id), dict):
+            return
+        _, presence, seen = self._shard_keys(user_id)
+        try:
+            if field == "updated_at":
+                # Pings are the hot path: only bump the score, leave the JSON alone
+                await self.redis.zadd(seen, {user_id: int(value)})
+            else:
+                await self.redis.hset(presence, user_id, json.dumps(self.heartbeats[user_id]))
+        except Exception as e:
+            logger.error(f"Failed to update presence field {field} for user {user_id}: {e}")
+
+    async def send_to_user(self, user_id: str, data: dict, message_type: str = "general") -> bool:
+        """Deliver locally if the user is on this node, otherwise publish to
+        the owning node's channel (looked up in the route shard)."""
+        if self.redis is None or user_id in self.connections:
+            return await super().send_to_user(user_id, data, message_type)
+
+        try:
+            node_id = await self.redis.hget(self._shard_keys(user_id)[0], user_id)
+        except Exception as e:
+            logger.error(f"❌ Failed to look up node for {user_id}: {e}")
+            return False
+        if not node_id:
+            logger.warning(f"⚠️ User {user_id} not connected.")
+            return False
+
+        frame = self._frame(data, message_type)
+        if frame is None:
+            return False
+        try:
+            await self.redis.publish(
+                f"{WS_NODE_CHANNEL_PREFIX}{node_id}",
+                json.dumps({"user": user_id, "frame": frame}),
+            )
+        except Exception as e:
+            logger.error(f"❌ Failed to route message to {user_id} on {node_id}: {e}")
+            return False
+        return True
+
+    async def broadcast_to_all(self, data: dict, message_type: str = "broadcast") -> int:
+        """Queue on local sockets, then publish once for the other nodes.
+        Returns the number of local sockets reached."""
+        frame = self._frame(data, message_type)
+        if frame is None:
+            return 0
+        keys = data.get("keys", []) if message_type == "invalidate" else []
+        count = self._push_all(frame, message_type, keys)
+        if self.redis is not None:
+            try:
+                await self.redis.publish(WS_BROADCAST_CHANNEL, json.dumps({
+                    "origin": self.node_id,
+                    "type": message_type,
+                    "frame": frame,
+                    "keys": keys,
+                }))
+            except Exception as e:
+                logger.error(f"❌ Failed to publish broadcast '{message_type}': {e}")
+        return count
+
+    async def get_sessions(self) -> list[dict]:
+        """Cluster-wide session list from every presence shard."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for shard in range(self.presence_shards):
+                pipe.hgetall(f"{WS_PRESENCE_PREFIX}{shard}")
+                pipe.zrange(f"{WS_SEEN_PREFIX}{shard}", 0, -1, withscores=True)
+            results = await pipe.execute()
+
+        now = int(time.time())
+        sessions = []
+        for presence, seen in zip(results[::2], results[1::2]):
+            last_seen = dict(seen)
+            for key, raw in presence.items():
+                data = json.loads(raw)
+                sessions.append({
+                    "id": key,
+                    "type": data.get("type", "guest"),
+                    "email": data.get("email", "Unknown"),
+                    "location": data.get("location", "Unknown"),
+                    "path": data.get("path", "/"),
+                    "last_seen": now - int(last_seen.get(key, now)),
+                })
+        return sessions
+
+    async def broadcast_sessions(self):
+        if self.redis is None:
+            return await super().broadcast_sessions()
+        try:
+            sessions = await self.get_sessions()
+        except Exception as e:
+            logger.error(f"❌ Failed to read presence: {e}")
+            return
+        await self.broadcast_to_all({"users": sessions}, "online-users")
+
+    async def _idle_cleanup_loop(self):
+        if self.redis is None:
+            return await super()._idle_cleanup_loop()
+        while True:
+            now = int(time.time())
+            cutoff = now - self.idle_timeout.seconds
+            # A live node expires its own entries within a minute of the
+            # cutoff; anything much older belongs to a node that died.
+            orphan_cutoff = cutoff - 3 * 60
+            for shard in range(self.presence_shards):
+                try:
+                    expired = await self._expire_presence_script(
+                        keys=[f"{WS_ROUTE_PREFIX}{shard}", f"{WS_PRESENCE_PREFIX}{shard}", f"{WS_SEEN_PREFIX}{shard}"],
+                        args=[cutoff, orphan_cutoff, self.node_id],
+                    )
+                except Exception as e:
+                    logger.error(f"❌ Presence cleanup failed for shard {shard}: {e}")
+                    continue
+                for user_id in expired:
+                    logger.debug(f"⏳ Disconnecting idle user {user_id}")
+                    await self.disconnect(user_id)
+
+            await asyncio.sleep(60)
+
+
+manager = RedisWebSocketManager()
@@ -0,0 +1,74 @@
+"""
+Local stand-in for the Cloudflare and Vercel purge APIs.
+
+    async with run_cdn_stub() as stub:
+        settings.CF_API_URL = stub.cf_url
+        stub.fail("cloudflare", 429, times=1, retry_after=0.1)
+        ...
+        assert stub.requests["cloudflare"][0]["files"]
+
+Runs uvicorn on a free port inside the test's event loop.
+"""
+import asyncio
+import contextlib
+from typing import AsyncIterator
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+class CdnStub:
+    def __init__(self) -> None:
+        self.requests: dict[str, list[dict]] = {"cloudflare": [], "vercel": []}
+        self.attempts: dict[str, int] = {"cloudflare": 0, "vercel": 0}
+        self._failures: dict[str, list[tuple[int, float]]] = {"cloudflare": [], "vercel": []}
+        self.port = 0
+
+    @property
+    def cf_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/client/v4"
+
+    @property
+    def vercel_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def fail(self, provider: str, status: int, times: int = 1, retry_after: float = 0.0) -> None:
+        self._failures[provider] += [(status, retry_after)] * times
+
+    async def _handle(self, provider: str, request: Request, ok: dict) -> JSONResponse:
+        self.attempts[provider] += 1
+        if self._failures[provider]:
+            status, retry_after = self._failures[provider].pop(0)
+            headers = {"Retry-After": str(retry_after)} if status == 429 else {}
+            return JSONResponse({"success": False, "errors": [{"code": status}]}, status_code=status, headers=headers)
+        self.requests[provider].append(await request.json())
+        return JSONResponse(ok)
+
+    def app(self) -> Starlette:
+        async def purge_cache(request: Request):
+            return await self._handle("cloudflare", request, {"success": True, "errors": [], "result": {"id": request.path_params["zone"]}})
+
+        async def invalidate_by_tags(request: Request):
+            return await self._handle("vercel", request, {})
+
+        return Starlette(routes=[
+            Route("/client/v4/zones/{zone}/purge_cache", purge_cache, methods=["POST"]),
+            Route("/v1/edge-cache/invalidate-by-tags", invalidate_by_tags, methods=["POST"]),
+        ])
+
+
+@contextlib.asynccontextmanager
+async def run_cdn_stub() -> AsyncIterator[CdnStub]:
+    stub = CdnStub()
+    server = uvicorn.Server(uvicorn.Config(stub.app(), host="127.0.0.1", port=0, log_level="warning", lifespan="off"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    stub.port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        yield stub
+    finally:
+        server.should_exit = True
+        await task
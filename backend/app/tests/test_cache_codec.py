@@ -0,0 +1,41 @@
+import json
+from datetime import datetime
+from pydantic import BaseModel
+from app.lib.codec import (
+    BinaryCodec,
+    EnhancedJSONEncoder,
+    FORMAT_ORJSON,
+    FORMAT_ORJSON_ZSTD,
+    JsonCodec,
+)
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+    created_at: datetime
+
+
+def test_small_payload_is_not_compressed():
+    codec = BinaryCodec(compress_threshold=1024)
+    raw = codec.encode({"foo": "bar"})
+    assert raw[0] == FORMAT_ORJSON
+    assert codec.decode(raw) == {"foo": "bar"}
+
+def test_large_payload_is_compressed():
+    codec = BinaryCodec(compress_threshold=1024)
+    value = {"items": [{"id": i, "name": f"product {i}"} for i in range(500)]}
+    raw = codec.encode(value)
+    assert raw[0] == FORMAT_ORJSON_ZSTD
+    assert len(raw) < len(json.dumps(value))
+    assert codec.decode(raw) == value
+
+def test_legacy_json_entries_stay_readable():
+    legacy = json.dumps({"items": [1, 2, 3]}, cls=EnhancedJSONEncoder)
+    assert BinaryCodec().decode(legacy) == {"items": [1, 2, 3]}
+    assert BinaryCodec().decode(legacy.encode()) == {"items": [1, 2, 3]}
+
+def test_binary_matches_legacy_json_shape():
+    value = {"items": [Item(id=1, name="a", created_at=datetime(2025, 1, 1, 12, 30))], 1: b"raw"}
+    legacy = JsonCodec().decode(JsonCodec().encode(value))
+    assert BinaryCodec().decode(BinaryCodec().encode(value)) == legacy
@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+from app.services.cache import _refresh, cache_stats, single_flight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_load():
+    cache_stats.reset()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"calls": calls}
+
+    results = await asyncio.gather(*[single_flight("k", load) for _ in range(50)])
+
+    assert calls == 1
+    assert all(r == {"calls": 1} for r in results)
+    assert cache_stats.snapshot()["coalesced"] == 49
+
+
+@pytest.mark.asyncio
+async def test_followers_receive_leader_exception():
+    async def load():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(*[single_flight("err", load) for _ in range(5)], return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_key_is_released_after_load():
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await single_flight("again", load) == 1
+    assert await single_flight("again", load) == 2
+
+
+@pytest.mark.asyncio
+async def test_refresh_is_counted_only_when_this_worker_holds_the_lock():
+    class Cache:
+        def __init__(self, token):
+            self.token = token
+
+        async def acquire_lock(self, key, ttl):
+            return self.token
+
+        async def release_lock(self, key, token):
+            pass
+
+    computed = []
+
+    async def compute():
+        computed.append(1)
+
+    cache_stats.reset()
+    await _refresh(Cache(None), "k", 1.0, compute)  # another worker is refreshing
+    assert cache_stats.snapshot()["refresh"] == 0 and not computed
+
+    await _refresh(Cache("token"), "k", 1.0, compute)
+    assert cache_stats.snapshot()["refresh"] == 1 and computed == [1]
@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+from app.core.config import settings
+from app.services.cdn_purge import CF_MAX_FILES, CdnPurgeQueue
+from app.tests.cdn_stub import run_cdn_stub
+
+
+@pytest.fixture
+def cdn_settings(monkeypatch):
+    monkeypatch.setattr(settings, "CF_ZONE_ID", "zone")
+    monkeypatch.setattr(settings, "CF_API_TOKEN", "cf-token")
+    monkeypatch.setattr(settings, "VERCEL_API_TOKEN", "vercel-token")
+    monkeypatch.setattr(settings, "ENVIRONMENT", "production")
+
+
+@pytest.mark.asyncio
+async def test_purges_are_coalesced_deduplicated_and_batched(cdn_settings, monkeypatch):
+    async with run_cdn_stub() as stub:
+        monkeypatch.setattr(settings, "CF_API_URL", stub.cf_url)
+        monkeypatch.setattr(settings, "VERCEL_API_URL", stub.vercel_url)
+        queue = CdnPurgeQueue(window=0.05)
+        queue.start()
+
+        # 40 product updates, each purging its page plus the shared tag
+        await asyncio.gather(*[
+            asyncio.gather(queue.purge_paths(f"/api/product/p-{i % 20}"), queue.purge_tags(f"product:p-{i % 20}", "products"))
+            for i in range(40)
+        ])
+        await queue.stop()
+
+        files = [f for body in stub.requests["cloudflare"] for f in body["files"]]
+        assert len(files) == 20 * 2  # one per path and Origin
+        assert all(len(body["files"]) <= CF_MAX_FILES for body in stub.requests["cloudflare"])
+        assert len(stub.requests["cloudflare"]) == 2
+        tags = [t for body in stub.requests["vercel"] for t in body["tags"]]
+        assert sorted(tags) == sorted({f"product:p-{i}" for i in range(20)} | {"products"})
+
+        stats = queue.snapshot()
+        assert stats["paths_purged"] == 20 and stats["tags_purged"] == 21
+        assert stats["deduplicated"] == 20 + 39 + 20
+        assert stats["pending_paths"] == stats["inflight_requests"] == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limits_and_server_errors_are_retried(cdn_settings, monkeypatch):
+    async with run_cdn_stub() as stub:
+        monkeypatch.setattr(settings, "CF_API_URL", stub.cf_url)
+        queue = CdnPurgeQueue(retry_backoff=0.01, max_attempts=3)
+        stub.fail("cloudflare", 429, retry_after=0.05)
+        stub.fail("cloudflare", 503)
+
+        await queue.purge_now(paths=["/api/bank-details/"])
+        assert stub.attempts["cloudflare"] == 3
+        assert len(stub.requests["cloudflare"]) == 1
+
+        stub.fail("cloudflare", 500, times=3)
+        await queue.purge_now(paths=["/api/reviews/"])
+        stats = queue.snapshot()
+        assert stats["rate_limited"] == 1 and stats["retries"] == 4 and stats["failed"] == 1
+        assert stats["paths_purged"] == 1
+        await queue.stop()
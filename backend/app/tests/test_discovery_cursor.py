@@ -0,0 +1,39 @@
+import base64
+import orjson
+from app.services.discovery import (
+    after_filter,
+    decode_cursor,
+    encode_cursor,
+    keyset_sort,
+    query_fingerprint,
+    shuffle_segments,
+)
+
+
+def test_cursor_round_trip_and_rejection():
+    fp = query_fingerprint("", ["active = true"], "min_variant_price:asc")
+    state = {"q": fp, "k": "key", "t": 120, "seg": 0, "a": [1500.5, 42]}
+    cursor = encode_cursor(state)
+
+    assert decode_cursor(cursor, fp) == {"v": 1, **state}
+    # issued for another query, garbage, or an injected filter value
+    assert decode_cursor(cursor, query_fingerprint("", ["active = false"], "min_variant_price:asc")) is None
+    assert decode_cursor("not-a-cursor", fp) is None
+    forged = base64.urlsafe_b64encode(orjson.dumps({**state, "v": 1, "a": ["1 OR id > 0", 42]})).decode()
+    assert decode_cursor(forged, fp) is None
+
+
+def test_keyset_filters_and_seeded_shuffle():
+    assert keyset_sort("min_variant_price:desc") == ("min_variant_price", "desc")
+    assert keyset_sort("created_at:desc") is None
+    assert after_filter("min_variant_price", "desc", 1500.5, 42) == (
+        "(min_variant_price < 1500.5 OR (min_variant_price = 1500.5 AND id < 42))"
+    )
+    assert after_filter("id", "asc", None, 42) == "id > 42"
+
+    segments = shuffle_segments("abc123")
+    assert segments == shuffle_segments("abc123")
+    assert segments != shuffle_segments("abc124")
+    (first, field, _), (second, _, _), (rest, _, _) = segments
+    assert first.startswith(f"{field} >= ") and second.startswith(f"{field} < ")
+    assert rest == f"{field} NOT EXISTS"
@@ -0,0 +1,35 @@
+from datetime import datetime
+import pytest
+from app.core.utils import EmailTemplates, email_templates, render_email_template
+
+
+def cart_context(i: int) -> dict:
+    return {
+        "user_name": f"User {i}",
+        "project_name": "Botcommerce",
+        "cart_link": "https://example.com/cart",
+        "cart": {
+            "cart_number": f"CART-{i}",
+            "subtotal": 1000 * i,
+            "total": 1000 * i,
+            "updated_at": datetime(2026, 1, 1),
+            "cart_items": [{"name": f"Item {i}", "quantity": 1, "price": 1000 * i, "image": "a.mp4"}],
+        },
+    }
+
+
+def test_templates_compile_once_and_are_reused():
+    registry = EmailTemplates(email_templates.path)
+    assert registry.warm() >= len(list(email_templates.path.glob("*.html")))
+    assert registry.get("abandoned_cart.html") is registry.get("abandoned_cart.html")
+    html = render_email_template(template_name="abandoned_cart.html", context=cart_context(3))
+    assert "Hi User 3," in html and "a.webp" in html and "₦3,000.00" in html
+
+
+@pytest.mark.asyncio
+async def test_render_many_matches_single_renders():
+    contexts = [cart_context(i) for i in range(1, 451)]
+    batch = await email_templates.render_many("abandoned_cart.html", contexts)
+    assert len(batch) == 450
+    assert batch[0] == await email_templates.render_async("abandoned_cart.html", contexts[0])
+    assert batch[449] == email_templates.render("abandoned_cart.html", contexts[449])
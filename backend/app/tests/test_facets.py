@@ -0,0 +1,81 @@
+import uuid
+from types import SimpleNamespace
+import pytest
+import pytest_asyncio
+import redis.asyncio as redis
+from app.core.config import settings
+from app.services.cache import CacheService
+from app.services.facets import BUILT_KEY, apply_facet_changes, get_facet_snapshot, rebuild_facets
+
+
+def doc(pid, sizes, price, categories=("kids",), active=True):
+    return {
+        "id": pid, "active": active, "sizes": list(sizes), "colors": [], "ages": [], "widths": [], "lengths": [],
+        "category_slugs": list(categories), "collection_slugs": [], "min_variant_price": price,
+    }
+
+
+class NoSearch:
+    async def search_index(self, query, options):
+        raise AssertionError("snapshot should be served from Redis")
+
+
+@pytest_asyncio.fixture
+async def client():
+    client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    try:
+        await client.ping()
+    except Exception:
+        pytest.skip("Redis not reachable at REDIS_URL")
+    await client.set(BUILT_KEY, 0)
+    yield client
+    await client.delete(BUILT_KEY)
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_incremental_updates_move_counts_between_scopes(client):
+    cat = f"cat-{uuid.uuid4().hex[:8]}"
+    a, b = uuid.uuid4().int % 10**9, uuid.uuid4().int % 10**9
+    await apply_facet_changes(client, {
+        a: doc(a, ["S", "M", "M"], 3000, [cat]),
+        b: doc(b, ["M"], 12000, [cat]),
+    })
+    snap = await get_facet_snapshot(client, NoSearch(), f"category:{cat}", [])
+    assert snap["total"] == 2
+    assert snap["facets"]["sizes"] == {"S": 1, "M": 2}
+    assert [bucket["count"] for bucket in snap["price_histogram"] if bucket["count"]] == [1, 1]
+
+    # a loses size S and drops in price, b goes inactive;
+    # re-applying an unchanged document is a no-op
+    await apply_facet_changes(client, {a: doc(a, ["M"], 1000, [cat]), b: doc(b, ["M"], 12000, [cat], active=False)})
+    await apply_facet_changes(client, {a: doc(a, ["M"], 1000, [cat])})
+    snap = await get_facet_snapshot(client, NoSearch(), f"category:{cat}", [])
+    assert snap["total"] == 1
+    assert snap["facets"]["sizes"] == {"M": 1}
+    assert snap["price_histogram"][0] == {"min": 0, "max": 2500, "count": 1}
+
+    await apply_facet_changes(client, {a: None, b: None})
+    assert await client.exists(f"facets:scope:category:{cat}") == 0
+
+
+@pytest.mark.asyncio
+async def test_changes_during_a_rebuild_are_replayed_after_it(client):
+    cat = f"cat-{uuid.uuid4().hex[:8]}"
+    a = uuid.uuid4().int % 10**9
+    products = [SimpleNamespace(id=a, doc=doc(a, ["S"], 3000, [cat]))]
+
+    class Db:
+        class product:
+            @staticmethod
+            async def find_many(**kwargs):
+                read = list(products)
+                # a is re-indexed after the rebuild has read it
+                await apply_facet_changes(client, {a: doc(a, ["L"], 3000, [cat])})
+                return read
+
+    assert await rebuild_facets(Db(), CacheService(redis=client), lambda product: product.doc) == 1
+    snap = await get_facet_snapshot(client, NoSearch(), f"category:{cat}", [])
+    assert snap["facets"]["sizes"] == {"L": 1}
+
+    await apply_facet_changes(client, {a: None})
@@ -0,0 +1,109 @@
+import asyncio
+import pytest
+from app.services.index_queue import SearchIndexQueue
+
+
+class FakeMeili:
+    """Records submitted tasks; documents with `bad` set make their task fail."""
+
+    def __init__(self):
+        self.tasks: dict[int, dict] = {}
+
+    def _task(self, kind, payload):
+        uid = len(self.tasks) + 1
+        failed = kind != "delete" and any(doc.get("bad") for doc in payload)
+        self.tasks[uid] = {"uid": uid, "kind": kind, "payload": payload,
+                           "status": "failed" if failed else "succeeded",
+                           "error": {"message": "invalid document"} if failed else None}
+        return {"taskUid": uid}
+
+    async def add_documents(self, index, documents):
+        return self._task("add", documents)
+
+    async def update_documents(self, index, documents):
+        return self._task("update", documents)
+
+    async def delete_documents(self, index, ids):
+        return self._task("delete", ids)
+
+    async def request(self, method, path, params=None):
+        uids = [int(uid) for uid in params["uids"].split(",")]
+        return {"results": [self.tasks[uid] for uid in uids]}
+
+
+async def _drain(queue: SearchIndexQueue):
+    for _ in range(200):
+        await asyncio.sleep(0.01)
+        status = await queue.status()
+        if not status["pending_documents"] and not status["inflight_tasks"] and not queue._tasks:
+            return status
+    raise AssertionError("queue did not drain")
+
+
+@pytest.mark.asyncio
+async def test_writes_in_one_window_coalesce_per_document():
+    meili = FakeMeili()
+    queue = SearchIndexQueue(window=0.02, poll_interval=0.01)
+    queue.start(meili)
+
+    queue.add("products", [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}])
+    queue.update("products", [{"id": 1, "price": 5}])
+    queue.delete("products", [2, 3])
+    status = await _drain(queue)
+
+    submitted = {t["kind"]: t["payload"] for t in meili.tasks.values()}
+    assert submitted == {"add": [{"id": 1, "name": "a", "price": 5}], "delete": ["2", "3"]}
+    assert status["tasks_succeeded"] == 2
+    assert status["documents_indexed"] == 1 and status["documents_deleted"] == 2
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_split_and_bad_document_dead_lettered():
+    meili = FakeMeili()
+    queue = SearchIndexQueue(window=0.01, poll_interval=0.01, max_attempts=2, retry_backoff=0.01)
+    queue.start(meili)
+
+    queue.add("products", [{"id": i, "bad": i == 3} for i in range(4)])
+    status = await _drain(queue)
+
+    indexed = sorted(doc["id"] for t in meili.tasks.values() if t["status"] == "succeeded" for doc in t["payload"])
+    assert indexed == [0, 1, 2]
+    assert status["dead_lettered"] == 1
+    await queue.stop()
+
+
+class SlowMeili(FakeMeili):
+    """Task submission takes a while, like a real round trip."""
+
+    async def add_documents(self, index, documents):
+        await asyncio.sleep(0.05)
+        return self._task("add", documents)
+
+
+@pytest.mark.asyncio
+async def test_wait_indexed_returns_after_the_task_succeeds():
+    meili = FakeMeili()
+    queue = SearchIndexQueue(window=0.01, poll_interval=0.01)
+    queue.start(meili)
+
+    queue.add("products", [{"id": 1}])
+    assert await queue.wait_indexed("products", [1], timeout=2)
+    assert (await queue.status())["tasks_succeeded"] == 1
+    assert await queue.wait_indexed("products", [1], timeout=0.01)  # nothing outstanding
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_flushes_run_one_at_a_time():
+    meili = SlowMeili()
+    queue = SearchIndexQueue(window=0.01, max_batch=2, poll_interval=0.01)
+    queue.start(meili)
+
+    queue.add("products", [{"id": 1}])
+    await asyncio.sleep(0.02)  # the window flush is now submitting the add
+    queue.delete("products", [1, 2])  # hits max_batch and flushes straight away
+    await _drain(queue)
+
+    assert [t["kind"] for t in meili.tasks.values()] == ["add", "delete"]
+    await queue.stop()
@@ -0,0 +1,49 @@
+import asyncio
+import pytest
+from app.services.invalidation import ProductInvalidationBus
+
+
+class FakeProductService:
+    def __init__(self, calls: list):
+        self.calls = calls
+
+    async def invalidate_all(self, product_ids=None, existing_product_ids=None):
+        self.calls.append(list(product_ids))
+
+
+@pytest.mark.asyncio
+async def test_ids_within_window_flush_as_one_batch():
+    calls: list = []
+    bus = ProductInvalidationBus(window=0.05)
+    bus.start(lambda: FakeProductService(calls))
+
+    await asyncio.gather(*[bus.submit(pid) for pid in [1, 2, 3, 2, 1]])
+
+    assert calls == [[1, 2, 3]]
+    stats = bus.snapshot()
+    assert stats["flushes"] == 1
+    assert stats["last_batch_size"] == 3
+
+
+@pytest.mark.asyncio
+async def test_max_batch_flushes_without_waiting_for_window():
+    calls: list = []
+    bus = ProductInvalidationBus(window=10, max_batch=3)
+    bus.start(lambda: FakeProductService(calls))
+
+    await asyncio.wait_for(bus.submit(1, 2, 3), timeout=1)
+    assert calls == [[1, 2, 3]]
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_pending_ids():
+    calls: list = []
+    bus = ProductInvalidationBus(window=10)
+    bus.start(lambda: FakeProductService(calls))
+
+    pending = bus.submit(7)
+    await bus.stop()
+
+    assert pending.done()
+    assert calls == [[7]]
+    assert not bus.running
@@ -0,0 +1,99 @@
+import asyncio
+import uuid
+import pytest
+import pytest_asyncio
+import redis.asyncio as redis
+from prisma.enums import PaymentMethod
+from app.core.config import settings
+from app.prisma_client import prisma as db
+from app.services.order import OrderService
+
+PARALLEL_ORDERS = 100
+
+
+class FakeQueue:
+    async def enqueue_job(self, *args, **kwargs):
+        pass
+
+
+class FakeCache:
+    redis = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+    async def invalidate(self, *keys, tags=None):
+        return []
+
+
+class FakeProductService:
+    def __init__(self):
+        self.invalidated: list[list[int]] = []
+
+    async def invalidate_many(self, product_ids):
+        self.invalidated.append(list(product_ids))
+
+
+class FakeNotifications:
+    def __init__(self):
+        self.slack: list[str] = []
+
+    async def send(self, channel_name=None, slack_message=None, **kwargs):
+        self.slack.append(slack_message["text"])
+
+
+@pytest_asyncio.fixture
+async def variant_orders():
+    """A variant plus PARALLEL_ORDERS unpaid orders for one unit of it each."""
+    if not db.is_connected():
+        await db.connect()
+
+    tag = uuid.uuid4().hex[:8]
+    user = await db.user.create(data={"email": f"oversell-{tag}@example.com", "hashed_password": "x"})
+    product = await db.product.create(data={"name": "Oversell test", "slug": f"oversell-{tag}", "sku": f"OVS-{tag}"})
+    variant = await db.productvariant.create(
+        data={"product": {"connect": {"id": product.id}}, "sku": f"OVS-{tag}-1", "price": 1000, "inventory": 0}
+    )
+    orders = []
+    for i in range(PARALLEL_ORDERS):
+        orders.append(await db.order.create(data={
+            "order_number": f"OVS-{tag}-{i}",
+            "user": {"connect": {"id": user.id}},
+            "total": 1000, "subtotal": 1000, "tax": 0, "shipping_fee": 0,
+            "payment_method": PaymentMethod.PAYSTACK,
+            "order_items": {"create": [{"variant_id": variant.id, "quantity": 1, "price": 1000}]},
+        }))
+
+    yield variant, orders
+
+    order_ids = [o.id for o in orders]
+    await db.payment.delete_many(where={"order_id": {"in": order_ids}})
+    await db.order.delete_many(where={"id": {"in": order_ids}})
+    await db.product.delete(where={"id": product.id})
+    await db.user.delete(where={"id": user.id})
+
+
+def _order_service(product_srv, notifications) -> OrderService:
+    return OrderService(
+        db=db, cart_srv=None, product_srv=product_srv, coupon_srv=None, settings_srv=None,
+        notification_dispatcher=notifications, queue=FakeQueue(), cache_srv=FakeCache(), storage_srv=None,
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("stock, expected", [(150, 50), (60, 0)])
+async def test_parallel_paid_orders_never_oversell(variant_orders, stock, expected):
+    variant, orders = variant_orders
+    await db.productvariant.update(where={"id": variant.id}, data={"inventory": stock, "status": "IN_STOCK"})
+    product_srv, notifications = FakeProductService(), FakeNotifications()
+    srv = _order_service(product_srv, notifications)
+
+    await asyncio.gather(*[
+        srv._finalize_paid_order(order=o, amount=1000, reference=f"{o.order_number}-ref", payment_method=PaymentMethod.PAYSTACK)
+        for o in orders
+    ])
+
+    refreshed = await db.productvariant.find_unique(where={"id": variant.id})
+    # every decrement landed (no lost updates) and stock never went negative
+    assert refreshed.inventory == expected
+    assert (refreshed.status == "OUT_OF_STOCK") == (expected == 0)
+    # exactly one order saw the variant sell out
+    assert len(notifications.slack) == (1 if expected == 0 else 0)
+    assert all(ids == [variant.product_id] for ids in product_srv.invalidated)
@@ -0,0 +1,50 @@
+import asyncio
+import uuid
+import pytest
+import pytest_asyncio
+import redis.asyncio as redis
+from app.core.config import settings
+from app.services.reservation import InventoryReservations, forget_stock
+
+
+@pytest_asyncio.fixture
+async def ledger():
+    client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    try:
+        await client.ping()
+    except Exception:
+        pytest.skip("Redis not reachable at REDIS_URL")
+    variant_id = uuid.uuid4().int % 10**9
+    yield InventoryReservations(client), variant_id
+    await client.delete(*[f"inv:{variant_id}:{k}" for k in ("stock", "held", "holds", "qty")])
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_holds_never_exceed_stock(ledger):
+    reservations, vid = ledger
+    results = await asyncio.gather(*[reservations.hold(cart, {vid: 1}, {vid: 5}) for cart in range(200)])
+
+    assert sum(1 for short in results if not short) == 5
+    assert all(short == {vid: 0} for short in results if short)
+    assert await reservations.available(vid) == 0
+
+
+@pytest.mark.asyncio
+async def test_release_expiry_and_commit(ledger):
+    reservations, vid = ledger
+    assert await reservations.hold(1, {vid: 3}, {vid: 4}) == {}
+    assert await reservations.hold(2, {vid: 2}, {vid: 4}) == {vid: 1}
+    # raising an existing hold counts the units the cart already has
+    assert await reservations.hold(1, {vid: 4}, {vid: 4}) == {}
+
+    await reservations.release(1, [vid])
+    assert await reservations.available(vid) == 4
+
+    await reservations.hold(2, {vid: 4}, {vid: 4}, ttl=-1)  # already expired
+    assert await reservations.hold(3, {vid: 4}, {vid: 4}) == {}
+
+    await reservations.commit(3, {vid: 0})
+    assert await reservations.available(vid) == 0
+    await forget_stock(reservations.redis, [vid])
+    assert await reservations.available(vid) is None
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import httpx
+import pytest
+from app.services.meili import MeiliClient, MeiliError
+from app.services.search import SearchService
+
+
+def _client(handler) -> tuple[MeiliClient, list[str]]:
+    paths: list[str] = []
+
+    def record(request: httpx.Request) -> httpx.Response:
+        paths.append(request.url.path)
+        return handler(request)
+
+    client = MeiliClient("http://meili.test", "key")
+    client._http = httpx.AsyncClient(base_url=client.host, transport=httpx.MockTransport(record))
+    return client, paths
+
+
+def _hits(query: dict) -> dict:
+    return {"hits": [{"id": query["q"]}], "estimatedTotalHits": 1}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_searches_share_one_multi_search():
+    def handler(request):
+        queries = json.loads(request.content)["queries"]
+        return httpx.Response(200, json={"results": [_hits(q) for q in queries]})
+
+    client, paths = _client(handler)
+    results = await asyncio.gather(*[client.search("products", str(i), {"limit": 1}) for i in range(5)])
+
+    assert [r["hits"][0]["id"] for r in results] == ["0", "1", "2", "3", "4"]
+    assert paths == ["/multi-search"]
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_rejected_batch_falls_back_to_single_searches():
+    def handler(request):
+        if request.url.path == "/multi-search":
+            return httpx.Response(400, json={"message": "bad filter", "code": "invalid_search_filter"})
+        query = json.loads(request.content)
+        if query.get("filter") == "broken":
+            return httpx.Response(400, json={"message": "bad filter", "code": "invalid_search_filter"})
+        return httpx.Response(200, json=_hits(query))
+
+    client, paths = _client(handler)
+    ok, bad = await asyncio.gather(
+        client.search("products", "a"),
+        client.search("products", "b", {"filter": "broken"}),
+        return_exceptions=True,
+    )
+
+    assert ok["hits"] == [{"id": "a"}]
+    assert isinstance(bad, MeiliError) and bad.code == "invalid_search_filter"
+    assert paths.count("/indexes/products/search") == 2
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_search_service_multi_search_is_one_round_trip():
+    def handler(request):
+        if request.url.path == "/multi-search":
+            queries = json.loads(request.content)["queries"]
+            return httpx.Response(200, json={"results": [_hits(q) for q in queries]})
+        return httpx.Response(200, json={"uid": "products"})
+
+    client, paths = _client(handler)
+    srv = SearchService(client)
+    srv.index_name = "products"
+    results = await srv.multi_search([{"q": "a", "limit": 6}, {"q": "b"}, {"q": "c", "filter": "active = true"}])
+
+    assert [r["hits"][0]["id"] for r in results] == ["a", "b", "c"]
+    assert paths.count("/multi-search") == 1
+    assert "/indexes/products/search" not in paths
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_search_service_falls_back_to_single_query_requests():
+    def handler(request):
+        if request.url.path == "/multi-search":
+            return httpx.Response(400, json={"message": "bad filter", "code": "invalid_search_filter"})
+        if request.url.path.endswith("/search"):
+            return httpx.Response(200, json=_hits(json.loads(request.content)))
+        return httpx.Response(200, json={"uid": "products"})
+
+    client, paths = _client(handler)
+    srv = SearchService(client)
+    srv.index_name = "products"
+    results = await srv.multi_search([{"q": "a"}, {"q": "b"}])
+
+    assert [r["hits"][0]["id"] for r in results] == ["a", "b"]
+    assert paths.count("/multi-search") == 1
+    assert paths.count("/indexes/products/search") == 2
+    await client.aclose()
@@ -0,0 +1,51 @@
+import xml.etree.ElementTree as ET
+from types import SimpleNamespace
+from app.services.merchant_feed import FEED_FOOTER, feed_header, render_product
+
+G = "{http://base.google.com/ns/1.0}"
+
+
+def _product(**overrides):
+    variant = SimpleNamespace(
+        sku="SKU-1", size="M", width=None, length=None, age="1-2 years", color="Red",
+        inventory=0, price=1500.0, old_price=2000.0,
+    )
+    product = SimpleNamespace(
+        id=1, name="Tee & Shorts <set>", description=None, slug="tee-set", image=None,
+        images=[SimpleNamespace(image="https://cdn.example.com/1.webp")], is_new=True,
+        categories=[SimpleNamespace(name="Kids")], variants=[variant],
+    )
+    for key, value in overrides.items():
+        setattr(product, key, value)
+    return product
+
+
+def _parse(*fragments: str) -> ET.Element:
+    return ET.fromstring(feed_header() + "".join(fragments) + FEED_FOOTER)
+
+
+def test_rendered_items_are_well_formed_and_escaped():
+    root = _parse(render_product(_product(), "google", lambda age: "toddler"))
+    item = root.find("channel/item")
+
+    assert item.findtext(f"{G}id") == "SKU-1"
+    assert item.findtext(f"{G}title") == "Tee & Shorts <set> (Size:M, Age:1-2 years)"
+    assert item.findtext(f"{G}availability") == "out_of_stock"
+    assert item.findtext(f"{G}price") == "2000.00 NGN"
+    assert item.findtext(f"{G}sale_price") == "1500.00 NGN"
+    assert item.findtext(f"{G}age_group") == "toddler"
+    assert item.findtext(f"{G}image_link") == "https://cdn.example.com/1.webp"
+    assert item.findtext(f"{G}product_type") == "Kids"
+
+
+def test_one_item_per_variant_and_meta_availability():
+    variants = [
+        SimpleNamespace(sku=f"SKU-{i}", size=None, width=None, length=None, age=None, color=None,
+                        inventory=3, price=100.0, old_price=None)
+        for i in range(3)
+    ]
+    root = _parse(render_product(_product(variants=variants), "meta", lambda age: None))
+
+    items = root.findall("channel/item")
+    assert [i.findtext(f"{G}id") for i in items] == ["SKU-0", "SKU-1", "SKU-2"]
+    assert {i.findtext(f"{G}availability") for i in items} == {"in stock"}
@@ -0,0 +1,103 @@
+import asyncio
+import uuid
+import pytest
+import pytest_asyncio
+import redis.asyncio as redis
+from app.core.config import settings
+from app.core.notifications import outbox as outbox_module
+from app.core.notifications.outbox import NotificationOutbox, idempotency_key
+
+
+class RecordingChannel:
+    def __init__(self, fail_times: int = 0) -> None:
+        self.fail_times = fail_times
+        self.sent: list[dict] = []
+        self.batches: list[int] = []
+
+    async def send(self, recipient: str, message: str, **kwargs) -> bool:
+        if self.fail_times:
+            self.fail_times -= 1
+            return False
+        self.sent.append({"recipient": recipient, "message": message, **kwargs})
+        return True
+
+    async def send_batch(self, messages: list[dict]) -> list[bool]:
+        self.batches.append(len(messages))
+        self.sent += messages
+        return [True] * len(messages)
+
+
+def entry(channel: str, recipient: str, message: str = "<p>cart</p>") -> dict:
+    kwargs = {"recipient": recipient, "subject": "Your cart is waiting"}
+    return {
+        "channel": channel, "template": "send_abandoned_cart", "message": message, "kwargs": kwargs,
+        "key": idempotency_key(channel, "send_abandoned_cart", recipient, message, kwargs),
+    }
+
+
+@pytest_asyncio.fixture
+async def client(monkeypatch):
+    client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    try:
+        await client.ping()
+    except Exception:
+        pytest.skip("Redis not reachable at REDIS_URL")
+    suffix = uuid.uuid4().hex[:8]
+    for name in ("STREAM_KEY", "RETRY_KEY", "DEAD_LETTER_KEY"):
+        monkeypatch.setattr(outbox_module, name, f"{getattr(outbox_module, name)}:{suffix}")
+    monkeypatch.setattr(outbox_module, "QUEUED_KEY", f"notifications:queued:{suffix}:{{key}}")
+    monkeypatch.setattr(outbox_module, "SENT_KEY", f"notifications:sent:{suffix}:{{key}}")
+    yield client
+    await client.delete(outbox_module.STREAM_KEY, outbox_module.RETRY_KEY, outbox_module.DEAD_LETTER_KEY)
+    await client.close()
+
+
+async def drain(outbox: NotificationOutbox) -> None:
+    idle = 0
+    for _ in range(200):
+        stats = await outbox.snapshot()
+        idle = idle + 1 if stats["backlog"] == 0 and stats["retrying"] == 0 else 0
+        if idle == 3:
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"outbox did not drain: {stats}")
+
+
+@pytest.mark.asyncio
+async def test_emails_sharing_a_template_are_sent_in_bulk_once(client):
+    email = RecordingChannel()
+    outbox = NotificationOutbox({"email": email}, consumers=2, batch_size=50, block_ms=20, poll_interval=0.02)
+    await outbox.start(client)
+
+    blast = [entry("email", f"user{i}@example.com", f"<p>cart {i}</p>") for i in range(120)]
+    assert await outbox.enqueue(blast) == 120
+    assert await outbox.enqueue(blast[:10]) == 0  # re-queued within the idempotency window
+    await drain(outbox)
+    await outbox.stop()
+
+    assert sorted(m["recipient"] for m in email.sent) == sorted(f"user{i}@example.com" for i in range(120))
+    assert len(email.batches) < 120 and max(email.batches) <= outbox_module.MAX_BATCH_RECIPIENTS
+
+    # a redelivered entry whose key is marked sent is acked without sending
+    await outbox.start(client)
+    await client.xadd(outbox_module.STREAM_KEY, outbox_module._pack({**blast[0], "attempt": 1}))
+    await drain(outbox)
+    await outbox.stop()
+    assert len(email.sent) == 120
+    assert (await outbox.snapshot())["already_sent"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failures_retry_with_backoff_then_dead_letter(client):
+    flaky, down = RecordingChannel(fail_times=2), RecordingChannel(fail_times=100)
+    outbox = NotificationOutbox(
+        {"slack": flaky, "whatsapp": down}, block_ms=20, poll_interval=0.02, retry_backoff=0.01, max_attempts=3,
+    )
+    await outbox.start(client)
+    await outbox.enqueue([entry("slack", "orders"), entry("whatsapp", "+2348000000000")])
+    await drain(outbox)
+    await outbox.stop()
+
+    stats = await outbox.snapshot()
+    assert len(flaky.sent) == 1 and not down.sent
+    assert stats["retries"] == 4 and stats["dead_lettered"] == 1 and stats["dead_letter"] == 1
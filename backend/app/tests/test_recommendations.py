@@ -0,0 +1,72 @@
+import time
+import uuid
+import pytest
+import pytest_asyncio
+import redis.asyncio as redis
+from app.core.config import settings
+from app.services.cache import L1Cache
+from app.services.recommendations import NeighborMatrix, RecommendationEngine
+
+
+def test_score_weights_similarity_and_recency():
+    matrix = NeighborMatrix(width=3)
+    now = time.time()
+    matrix.put(1, [10, 11, 2], [0.9, 0.5, 0.8], now)
+    matrix.put(2, [11, 12], [0.9, 0.95], now)
+
+    # 2 is the most recent view: its neighbors outrank 1's, 11 gets both
+    # contributions, and products already viewed never come back
+    assert matrix.score([2, 1], limit=10) == [11, 12, 10]
+    assert matrix.score([1, 2], limit=2) == [11, 10]
+
+
+class FakeCache:
+    def __init__(self, client):
+        self.redis = client
+        self.l1 = L1Cache()
+
+
+class FakeSearch:
+    def __init__(self):
+        self.calls = 0
+
+    async def get_documents_by_filter(self, filter_str: str, limit: int) -> list:
+        self.calls += 1
+        ids = filter_str[len("id IN ["):-1].split(",")
+        return [{"id": int(i), "name": f"Product {i}", "embedding": []} for i in ids][:limit]
+
+
+@pytest_asyncio.fixture
+async def engine():
+    client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    try:
+        await client.ping()
+    except Exception:
+        pytest.skip("Redis not reachable at REDIS_URL")
+    base = uuid.uuid4().int % 10**6 * 10
+    keys = [f"user:{base}:history"] + [f"product:{base + i}:{k}" for i in range(10) for k in ("neighbors", "similar")]
+    yield RecommendationEngine(FakeCache(client), FakeSearch(), matrix=NeighborMatrix()), client, base
+    await client.delete(*keys)
+    await client.zrem("recs:neighbors:updated", *[str(base + i) for i in range(10)])
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_recommend_refreshes_restamped_rows_and_caches_cards(engine):
+    engine, client, base = engine
+    await client.rpush(f"user:{base}:history", base + 1, base + 2)
+    await client.zadd(f"product:{base + 1}:neighbors", {str(base + 5): 0.9, str(base + 6): 0.4})
+    await client.rpush(f"product:{base + 2}:similar", base + 6)  # not scored by the worker yet
+
+    recs = await engine.recommend(base, limit=5, attributes=["id", "name"])
+    assert [r["id"] for r in recs] == [base + 6, base + 5]
+    assert recs[0] == {"id": base + 6, "name": f"Product {base + 6}"}
+
+    # the worker rescores product 1; the stamp makes the next call reload it
+    await client.delete(f"product:{base + 1}:neighbors")
+    await client.zadd(f"product:{base + 1}:neighbors", {str(base + 7): 0.9})
+    await client.zadd("recs:neighbors:updated", {str(base + 1): time.time() + 1})
+
+    recs = await engine.recommend(base, limit=5)
+    assert [r["id"] for r in recs] == [base + 7, base + 6]
+    assert engine.search_srv.calls == 2  # base + 6 came from the card cache
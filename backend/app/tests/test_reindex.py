@@ -0,0 +1,152 @@
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import pytest
+import pytest_asyncio
+import redis.asyncio as redis
+from app.core.config import settings
+from app.services.cache import CacheService
+from app.services.meili import MeiliError
+from app.services.reindex import ProductIndexRebuild
+
+
+class FakeMeili:
+    """In-memory indexes; every task completes immediately."""
+
+    def __init__(self, live: str, docs: dict):
+        self.indexes: dict[str, dict] = {live: dict(docs)}
+        self.uploads = 0
+        self.fail_after: int | None = None
+
+    def _task(self):
+        return {"taskUid": 1}
+
+    async def wait_for_task(self, uid, timeout_ms=0):
+        return {"status": "succeeded"}
+
+    async def get_index(self, index):
+        if index not in self.indexes:
+            raise MeiliError("not found", code="index_not_found")
+        return {"uid": index}
+
+    async def get_settings(self, index):
+        return {"filterableAttributes": ["id"], "sortableAttributes": []}
+
+    async def create_index(self, index):
+        self.indexes[index] = {}
+        return self._task()
+
+    async def update_settings(self, index, body):
+        return self._task()
+
+    async def add_documents(self, index, documents):
+        if self.fail_after is not None and self.uploads >= self.fail_after:
+            raise MeiliError("connection reset", code="communication_error")
+        self.uploads += 1
+        self.indexes[index].update({doc["id"]: doc for doc in documents})
+        return self._task()
+
+    async def delete_documents(self, index, ids):
+        for i in ids:
+            self.indexes[index].pop(int(i), None)
+        return self._task()
+
+    async def get_documents(self, index, limit, offset=0, fields=None):
+        ids = sorted(self.indexes[index])[offset:offset + limit]
+        return [{"id": i} for i in ids]
+
+    async def get_stats(self, index):
+        return {"numberOfDocuments": len(self.indexes[index])}
+
+    async def swap_indexes(self, pairs):
+        for a, b in pairs:
+            self.indexes[a], self.indexes[b] = self.indexes[b], self.indexes[a]
+        return self._task()
+
+    async def delete_index(self, index):
+        del self.indexes[index]
+        return self._task()
+
+
+class FakeProducts:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def find_many(self, where, include=None, order=None, take=None):
+        rows = [p for p in self.rows if p.id > where.get("id", {}).get("gt", 0)]
+        if "active" in where:
+            rows = [p for p in rows if p.active]
+        if "OR" in where:
+            rows = [p for p in rows if any(self._matches(p, cond) for cond in where["OR"])]
+        if "in" in where.get("id", {}):
+            rows = [p for p in self.rows if p.id in where["id"]["in"]]
+        return rows[:take]
+
+    @staticmethod
+    def _matches(product, cond):
+        if "updated_at" in cond:
+            return product.updated_at >= cond["updated_at"]["gte"]
+        since = cond["variants"]["some"]["updated_at"]["gte"]
+        return any(v.updated_at >= since for v in getattr(product, "variants", []))
+
+
+@pytest_asyncio.fixture
+async def cache_srv():
+    client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    try:
+        await client.ping()
+    except Exception:
+        pytest.skip("Redis not reachable at REDIS_URL")
+    yield CacheService(client)
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_rebuild_resumes_from_checkpoint_and_swaps(cache_srv):
+    old = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    rows = [SimpleNamespace(id=i, active=i != 7, updated_at=old) for i in range(1, 26)]
+    db = SimpleNamespace(product=FakeProducts(rows))
+
+    async def query_raw(sql):
+        return [{"id": p.id} for p in rows if p.active]
+    db.query_raw = query_raw
+
+    live = f"products_test_{uuid.uuid4().hex[:6]}"
+    meili = FakeMeili(live, {999: {"id": 999}})  # stale document that must not survive
+
+    def rebuild():
+        return ProductIndexRebuild(db, meili, cache_srv, prepare=lambda p: {"id": p.id},
+                                   index_name=live, batch_size=3, parallel=2)
+
+    meili.fail_after = 5
+    with pytest.raises(MeiliError):
+        await rebuild().run()
+    assert meili.indexes[live] == {999: {"id": 999}}  # live untouched mid-rebuild
+    uploads_before_crash = meili.uploads
+
+    meili.fail_after = None
+    assert await rebuild().run() == 24
+
+    assert sorted(meili.indexes) == [live]
+    assert sorted(meili.indexes[live]) == [i for i in range(1, 26) if i != 7]
+    # resumed after the last checkpointed wave (2 batches of 3) instead of from id 0
+    assert meili.uploads - uploads_before_crash <= 6
+    assert not await cache_srv.redis.exists(f"search:reindex:{live}")
+
+
+@pytest.mark.asyncio
+async def test_catch_up_includes_variant_only_changes(cache_srv):
+    old, since = datetime(2020, 1, 1, tzinfo=timezone.utc), datetime(2024, 1, 1, tzinfo=timezone.utc)
+    new = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    rows = [
+        SimpleNamespace(id=1, active=True, updated_at=old, variants=[SimpleNamespace(updated_at=old)]),
+        SimpleNamespace(id=2, active=True, updated_at=old, variants=[SimpleNamespace(updated_at=new)]),  # stock sold
+        SimpleNamespace(id=3, active=True, updated_at=new, variants=[]),
+    ]
+    live = f"products_test_{uuid.uuid4().hex[:6]}"
+    meili = FakeMeili(live, {})
+    rebuild = ProductIndexRebuild(SimpleNamespace(product=FakeProducts(rows)), meili, cache_srv,
+                                  prepare=lambda p: {"id": p.id}, index_name=live)
+
+    await rebuild._catch_up(live, since=since)
+    assert sorted(meili.indexes[live]) == [2, 3]
@@ -0,0 +1,23 @@
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from app.services.sitemap import SITEMAP_SHARD_SIZE, _lastmod, _urlset, product_shard
+
+NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+
+def test_products_map_to_fixed_size_id_shards():
+    assert product_shard(1) == "products-0"
+    assert product_shard(SITEMAP_SHARD_SIZE - 1) == "products-0"
+    assert product_shard(SITEMAP_SHARD_SIZE) == "products-1"
+
+
+def test_urlset_escapes_locs_and_keeps_lastmod():
+    body = _urlset([
+        ("https://shop.example.com/collections?cat_ids=a&b", _lastmod(datetime(2025, 3, 1, 12))),
+        ("https://shop.example.com/", _lastmod(None)),
+    ])
+    urls = ET.fromstring(body).findall(f"{NS}url")
+    assert urls[0].findtext(f"{NS}loc") == "https://shop.example.com/collections?cat_ids=a&b"
+    assert urls[0].findtext(f"{NS}lastmod") == "2025-03-01"
+    assert urls[1].find(f"{NS}lastmod") is None
+    assert _lastmod("2025-03-01T12:00:00.000Z") == "2025-03-01"
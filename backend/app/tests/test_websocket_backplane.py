@@ -0,0 +1,130 @@
+import asyncio
+import json
+import time
+import pytest
+import pytest_asyncio
+import redis.asyncio as redis
+from app.core.config import settings
+from app.services.websocket import InMemoryWebSocketManager, RedisWebSocketManager
+
+# Two managers on one Redis stand in for two app processes.
+
+
+class FakeSocket:
+    def __init__(self):
+        self.frames: list[dict] = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        self.frames.append(json.loads(data))
+
+    async def close(self):
+        pass
+
+
+async def _until(predicate, timeout: float = 1.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out waiting for delivery"
+        await asyncio.sleep(0.01)
+
+
+@pytest_asyncio.fixture
+async def nodes():
+    client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    try:
+        await client.ping()
+    except Exception:
+        pytest.skip("Redis not reachable at REDIS_URL")
+
+    a, b = RedisWebSocketManager(), RedisWebSocketManager()
+    await a.start(client)
+    await b.start(client)
+    yield a, b
+    await a.stop()
+    await b.stop()
+    await client.close()
+
+
+def _meta(**extra):
+    return {"type": "guest", "path": "/", "updated_at": str(int(time.time())), **extra}
+
+
+@pytest.mark.asyncio
+async def test_broadcast_and_direct_messages_cross_nodes(nodes):
+    a, b = nodes
+    ws_a, ws_b = FakeSocket(), FakeSocket()
+    await a.connect("bp-user-a", ws_a, metadata=_meta())
+    await b.connect("bp-user-b", ws_b, metadata=_meta())
+
+    assert await a.send_to_user("bp-user-b", {"text": "hi"}, "chat")
+    await _until(lambda: any(f["type"] == "chat" for f in ws_b.frames))
+
+    await b.broadcast_to_all({"status": "completed"}, "bulk_action")
+    await _until(lambda: any(f["type"] == "bulk_action" for f in ws_a.frames))
+    await _until(lambda: any(f["type"] == "bulk_action" for f in ws_b.frames))
+    # the origin node doesn't deliver its own broadcast twice
+    await asyncio.sleep(0.05)
+    assert sum(f["type"] == "bulk_action" for f in ws_b.frames) == 1
+
+
+@pytest.mark.asyncio
+async def test_presence_is_shared_and_cleared_on_disconnect(nodes):
+    a, b = nodes
+    await a.connect("bp-user-c", FakeSocket(), metadata=_meta(email="c@example.com"))
+    await b.connect("bp-user-d", FakeSocket(), metadata=_meta())
+
+    ids = {s["id"] for s in await a.get_sessions()}
+    assert {"bp-user-c", "bp-user-d"} <= ids
+
+    await b.disconnect("bp-user-d")
+    ids = {s["id"] for s in await a.get_sessions()}
+    assert "bp-user-c" in ids and "bp-user-d" not in ids
+    assert not await a.send_to_user("bp-user-d", {"text": "gone"})
+
+
+class StalledSocket(FakeSocket):
+    """Blocks every send until `release` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+        self.closed = False
+
+    async def send_text(self, data: str):
+        await self.release.wait()
+        await super().send_text(data)
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_full_outbox_folds_invalidates_and_never_drops_chat_frames():
+    manager = InMemoryWebSocketManager(outbox_size=4)
+    ws = StalledSocket()
+    await manager.connect("slow", ws)
+
+    await manager.send_to_user("slow", {"n": 0}, message_type="chat")
+    await asyncio.sleep(0.01)  # n=0 is now stuck in send_text
+    await manager.broadcast_to_all({"keys": ["a"]}, message_type="invalidate")
+    await manager.broadcast_to_all({"keys": ["b"]}, message_type="invalidate")
+    for n in range(1, 4):
+        await manager.send_to_user("slow", {"n": n}, message_type="chat")
+
+    ws.release.set()
+    await _until(lambda: len(ws.frames) == 5)
+    assert [f["n"] for f in ws.frames if f["type"] == "chat"] == [0, 1, 2, 3]
+    assert [sorted(f["keys"]) for f in ws.frames if f["type"] == "invalidate"] == [["a", "b"]]
+
+    # nothing left to fold: the socket is closed instead of losing a chat frame
+    ws.release.clear()
+    for n in range(4, 10):
+        await manager.send_to_user("slow", {"n": n}, message_type="chat")
+    ws.release.set()
+    await _until(lambda: ws.closed)
+    assert manager.stats["overflowed"] == 1
+    assert "slow" not in manager.connections
+    await manager.stop()
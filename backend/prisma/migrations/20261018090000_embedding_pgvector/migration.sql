@@ -0,0 +1,13 @@
+-- Store product embeddings as pgvector instead of JSONB
+CREATE EXTENSION IF NOT EXISTS vector;
+
+-- AlterTable
+ALTER TABLE "products" ALTER COLUMN "embedding" TYPE vector(768) USING (
+    CASE
+        WHEN jsonb_typeof("embedding") = 'array' AND jsonb_array_length("embedding") = 768
+        THEN ("embedding"::text)::vector(768)
+    END
+);
+
+-- CreateIndex
+CREATE INDEX "products_embedding_hnsw_idx" ON "products" USING hnsw ("embedding" vector_cosine_ops) WITH (m = 16, ef_construction = 64);
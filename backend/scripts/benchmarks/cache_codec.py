@@ -0,0 +1,111 @@
+"""
+Codec benchmark for CacheService payloads.
+
+Builds payloads shaped like ProductService.get_discovery_feed and
+GalleryService.get_gallery_items responses and compares the legacy JSON
+codec against orjson(+zstd): encoded size, encode/decode time and, when a
+Redis is reachable, MEMORY USAGE of the stored key.
+
+Run from backend/:
+    python -m scripts.benchmarks.cache_codec --items 40 200 1000 --redis
+"""
+import argparse
+import asyncio
+import random
+import string
+import time
+from datetime import datetime, timedelta
+
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.lib.codec import BinaryCodec, JsonCodec
+
+
+def _word(n: int = 8) -> str:
+    return "".join(random.choices(string.ascii_lowercase, k=n))
+
+
+def _variant(vid: int, pid: int) -> dict:
+    return {
+        "id": vid, "sku": f"SKU-{vid}", "product_id": pid,
+        "price": round(random.uniform(1000, 50000), 2), "old_price": None,
+        "inventory": random.randint(0, 30), "status": "IN_STOCK",
+        "size": random.choice(["S", "M", "L", "XL"]), "color": _word(5),
+        "width": None, "length": None, "age": random.choice(["1-2 years", "3-4 years", None]),
+    }
+
+
+def discovery_feed(n: int) -> dict:
+    """Mirrors the FeedProducts response built from PRODUCT_ATTRIBUTES hits."""
+    products = []
+    for pid in range(1, n + 1):
+        products.append({
+            "id": pid, "name": f"{_word()} {_word()}", "sku": f"PRD-{pid}",
+            "image": f"https://cdn.example.com/products/{pid}/{_word(12)}.webp",
+            "images": [f"https://cdn.example.com/products/{pid}/{_word(12)}.webp" for _ in range(4)],
+            "slug": f"{_word()}-{pid}", "active": True, "is_new": pid % 3 == 0, "status": "IN STOCK",
+            "variants": [_variant(pid * 10 + i, pid) for i in range(random.randint(1, 5))],
+        })
+    return {"products": products, "limit": n, "total_count": n * 50, "next_cursor": "NDA="}
+
+
+def gallery_items(n: int) -> dict:
+    """Mirrors PaginatedGalleryImages: one image row plus its product aggregate."""
+    now = datetime.now()
+    items = []
+    for i in range(1, n + 1):
+        items.append({
+            "id": i, "image": f"https://cdn.example.com/gallery/{_word(12)}.webp", "order": 0, "product_id": i,
+            "created_at": now - timedelta(minutes=i),
+            "product": {
+                "id": i, "sku": f"PRD-{i}", "name": f"{_word()} {_word()}", "description": " ".join(_word() for _ in range(40)),
+                "slug": f"{_word()}-{i}", "active": True, "is_new": False,
+                "images": [{"id": i * 10 + j, "image": f"https://cdn.example.com/gallery/{_word(12)}.webp", "order": j} for j in range(4)],
+                "variants": [_variant(i * 10 + j, i) for j in range(random.randint(1, 5))],
+                "categories": [{"id": j, "name": _word(), "slug": _word()} for j in range(2)],
+                "collections": [{"id": j, "name": _word(), "slug": _word()} for j in range(2)],
+            },
+        })
+    return {"items": items, "next_cursor": n, "limit": n}
+
+
+def _time(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+async def main(sizes: list[int], repeat: int, use_redis: bool) -> None:
+    codecs = {"json": JsonCodec(), "orjson+zstd": BinaryCodec(compress_threshold=settings.CACHE_COMPRESS_THRESHOLD)}
+    client = redis.from_url(settings.REDIS_URL, decode_responses=True) if use_redis else None
+
+    print(f"{'payload':<22}{'codec':<14}{'bytes':>10}{'encode ms':>12}{'decode ms':>12}{'redis bytes':>14}")
+    for name, builder in (("discovery_feed", discovery_feed), ("gallery_items", gallery_items)):
+        for n in sizes:
+            value = builder(n)
+            for codec_name, codec in codecs.items():
+                encoded = codec.encode(value)
+                enc_ms = _time(lambda: codec.encode(value), repeat)
+                dec_ms = _time(lambda: codec.decode(encoded), repeat)
+                mem = "-"
+                if client is not None:
+                    key = f"bench:codec:{name}:{n}:{codec_name}"
+                    await client.set(key, encoded, ex=60)
+                    mem = await client.memory_usage(key)
+                    await client.delete(key)
+                size = len(encoded.encode()) if isinstance(encoded, str) else len(encoded)
+                print(f"{f'{name}[{n}]':<22}{codec_name:<14}{size:>10}{enc_ms:>12.3f}{dec_ms:>12.3f}{mem:>14}")
+
+    if client is not None:
+        await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, nargs="+", default=[40, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--redis", action="store_true", help="also report MEMORY USAGE from REDIS_URL")
+    args = parser.parse_args()
+    asyncio.run(main(args.items, args.repeat, args.redis))
@@ -0,0 +1,125 @@
+"""
+Inventory reservation contention benchmark.
+
+A flash sale: N shoppers hit the same few variants at once, each adding
+1-3 units, and a fraction of them change their mind and drop the line.
+Compares, against REDIS_URL:
+  - check-then-hold: read stock and held units, then INCRBY if it fits
+    (what add_item's `quantity > variant.inventory` check amounts to)
+  - ledger:          InventoryReservations.hold, one Lua script per call
+
+Reports units granted vs stock (oversold > 0 is a bug), throughput and
+hold latency percentiles. Writes and deletes inv:* keys for the variant
+ids it uses, so point it at a scratch database.
+
+Run from backend/:
+    python -m scripts.benchmarks.inventory_reservation --shoppers 5000 --stock 100 --variants 3
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.services.reservation import InventoryReservations
+
+BASE_VARIANT_ID = 900_000_000  # far away from real variant ids
+
+
+async def naive_hold(client, cart: int, variant_id: int, quantity: int, stock: int) -> bool:
+    prefix = f"inv:{variant_id}"
+    await client.set(f"{prefix}:stock", stock, nx=True)
+    current_stock, held = await client.mget(f"{prefix}:stock", f"{prefix}:held")
+    if quantity > int(current_stock) - int(held or 0):
+        return False
+    await client.incrby(f"{prefix}:held", quantity)
+    await client.hset(f"{prefix}:qty", str(cart), quantity)
+    return True
+
+
+async def naive_release(client, cart: int, variant_id: int) -> None:
+    prefix = f"inv:{variant_id}"
+    quantity = await client.hget(f"{prefix}:qty", str(cart))
+    if quantity:
+        await client.hdel(f"{prefix}:qty", str(cart))
+        await client.incrby(f"{prefix}:held", -int(quantity))
+
+
+async def run(name: str, shoppers: int, variant_ids: list[int], stock: int, release_ratio: float, hold, release) -> None:
+    random.seed(11)
+    plan = [(cart, random.choice(variant_ids), random.randint(1, 3), random.random() < release_ratio)
+            for cart in range(1, shoppers + 1)]
+    latencies: list[float] = []
+
+    async def shopper(cart: int, vid: int, qty: int, drops: bool) -> int:
+        start = time.perf_counter()
+        ok = await hold(cart, vid, qty, stock)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if ok and drops:
+            await asyncio.sleep(0)
+            await release(cart, vid)
+            return 0
+        return qty if ok else 0
+
+    start = time.perf_counter()
+    granted = await asyncio.gather(*[shopper(*p) for p in plan])
+    elapsed = time.perf_counter() - start
+
+    per_variant = {vid: 0 for vid in variant_ids}
+    for (_, vid, _, _), units in zip(plan, granted):
+        per_variant[vid] += units
+    oversold = sum(max(units - stock, 0) for units in per_variant.values())
+    kept = sum(per_variant.values())
+    q = statistics.quantiles(latencies, n=100)
+    print(f"{name:>16}{kept:>9}{stock * len(variant_ids):>8}{oversold:>10}"
+          f"{shoppers / elapsed:>12.0f}{q[49]:>9.2f}{q[98]:>9.2f}")
+
+
+async def cleanup(client, variant_ids: list[int]) -> None:
+    await client.delete(*[f"inv:{vid}:{k}" for vid in variant_ids for k in ("stock", "held", "holds", "qty")])
+
+
+async def main(shoppers: int, stock: int, variants: int, release_ratio: float, rounds: int) -> None:
+    client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    reservations = InventoryReservations(client)
+    variant_ids = [BASE_VARIANT_ID + i for i in range(variants)]
+
+    async def ledger_hold(cart, vid, qty, stock):
+        return not await reservations.hold(cart, {vid: qty}, {vid: stock})
+
+    async def ledger_release(cart, vid):
+        await reservations.release(cart, [vid])
+
+    async def check_then_hold(cart, vid, qty, stock):
+        return await naive_hold(client, cart, vid, qty, stock)
+
+    async def check_then_release(cart, vid):
+        await naive_release(client, cart, vid)
+
+    print(f"{shoppers} shoppers, {variants} variants x {stock} units, {release_ratio:.0%} drop their line")
+    print(f"{'mode':>16}{'kept':>9}{'stock':>8}{'oversold':>10}{'holds/s':>12}{'p50 ms':>9}{'p99 ms':>9}")
+    try:
+        for _ in range(rounds):
+            for name, hold, release in (
+                ("check-then-hold", check_then_hold, check_then_release),
+                ("ledger", ledger_hold, ledger_release),
+            ):
+                await cleanup(client, variant_ids)
+                await run(name, shoppers, variant_ids, stock, release_ratio, hold, release)
+    finally:
+        await cleanup(client, variant_ids)
+        await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shoppers", type=int, default=5000)
+    parser.add_argument("--stock", type=int, default=100, help="units per variant")
+    parser.add_argument("--variants", type=int, default=3)
+    parser.add_argument("--release", type=float, default=0.2, help="fraction of shoppers that drop the line again")
+    parser.add_argument("--rounds", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main(args.shoppers, args.stock, args.variants, args.release, args.rounds))
@@ -0,0 +1,211 @@
+"""
+Merchant feed benchmark: the old ElementTree build vs the streaming and
+incremental feeds in app.services.merchant_feed.
+
+Products come from an in-memory table that mimics what Postgres does for
+each pagination style: OFFSET walks past every skipped row, keyset seeks
+straight to `id < last_id`. Reports wall time, time to first chunk, peak
+Python heap (tracemalloc) and rows scanned.
+
+With --redis, also times the incremental mode against REDIS_URL: a full
+fragment build, then a rebuild after touching 1% of products. It writes
+and deletes merchant_feed:* keys, so point it at a scratch database.
+
+Run from backend/:
+    python -m scripts.benchmarks.merchant_feed --variants 20000 100000 500000 --redis
+"""
+import argparse
+import asyncio
+import bisect
+import random
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.services.cache import CacheService
+from app.services.merchant_feed import (
+    AVAILABILITY_MAP,
+    mark_feed_dirty,
+    refresh_feed_fragments,
+    reset_feed,
+    stream_feed,
+    stream_incremental_feed,
+)
+
+VARIANTS_PER_PRODUCT = 4
+SIZES = ["S", "M", "L", "XL", None]
+AGES = ["1-2 years", "3-4 years", "5-6 years", None]
+
+
+def map_age_group(age):
+    return {"1-2 years": "toddler", "3-4 years": "toddler", "5-6 years": "kids"}.get(age)
+
+
+class FakeProductTable:
+    """Just enough of prisma's product.find_many for the feed queries."""
+
+    def __init__(self, products: list) -> None:
+        self.rows = sorted(products, key=lambda p: p.id, reverse=True)
+        self.ids_asc = [p.id for p in reversed(self.rows)]
+        self.scanned = 0
+
+    async def find_many(self, where=None, include=None, order=None, take=None, skip=0):
+        where = where or {}
+        if "OR" in where:
+            ids = set(where["OR"][0]["id"]["in"])
+            since = where["OR"][1]["updated_at"]["gt"]
+            self.scanned += len(self.rows)  # seq scan on updated_at
+            return [p for p in self.rows if p.id in ids or p.updated_at > since]
+
+        start = 0
+        if "id" in where:
+            # index seek: first row with id < last_id in descending order
+            start = len(self.rows) - bisect.bisect_left(self.ids_asc, where["id"]["lt"])
+        rows = []
+        i = start
+        skipped = 0
+        while i < len(self.rows) and len(rows) < take:
+            row = self.rows[i]
+            i += 1
+            self.scanned += 1
+            if not row.active:
+                continue
+            if skipped < skip:
+                skipped += 1
+                continue
+            rows.append(row)
+        await asyncio.sleep(0)
+        return rows
+
+
+def build_products(variant_count: int) -> list:
+    now = datetime.now(timezone.utc)
+    products = []
+    for pid in range(1, variant_count // VARIANTS_PER_PRODUCT + 1):
+        variants = [
+            SimpleNamespace(
+                sku=f"SKU-{pid}-{i}", size=random.choice(SIZES), width=None, length=None,
+                age=random.choice(AGES), color=random.choice(["Red", "Blue", None]),
+                inventory=random.randint(0, 5), price=float(random.randint(1000, 50000)),
+                old_price=random.choice([None, 60000.0]),
+            )
+            for i in range(VARIANTS_PER_PRODUCT)
+        ]
+        products.append(SimpleNamespace(
+            id=pid, name=f"Product {pid}", description="Soft cotton & easy care " * 4, slug=f"product-{pid}",
+            image=f"https://cdn.example.com/products/{pid}.webp", images=[], is_new=pid % 2 == 0, active=True,
+            categories=[SimpleNamespace(name="Kids"), SimpleNamespace(name="Sets")], variants=variants,
+            updated_at=now - timedelta(days=1),
+        ))
+    return products
+
+
+async def legacy_feed(db, target: str) -> str:
+    """The previous generate_merchant_feed_xml, slightly abridged: OFFSET
+    pages into one ElementTree, serialized at the end."""
+    rss = ET.Element("rss", version="2.0")
+    rss.set("xmlns:g", "http://base.google.com/ns/1.0")
+    channel = ET.SubElement(rss, "channel")
+    ET.SubElement(channel, "title").text = "Revoque Product Feed"
+    ET.SubElement(channel, "link").text = settings.FRONTEND_HOST
+    ET.SubElement(channel, "description").text = "Automated product sync feed for Google Merchant Center"
+    skip = 0
+    while True:
+        products = await db.product.find_many(where={"active": True}, take=1000, skip=skip)
+        if not products:
+            break
+        for prod in products:
+            for variant in prod.variants:
+                item = ET.SubElement(channel, "item")
+                ET.SubElement(item, "g:id").text = variant.sku
+                ET.SubElement(item, "g:title").text = prod.name
+                ET.SubElement(item, "g:description").text = prod.description
+                ET.SubElement(item, "g:link").text = f"{settings.FRONTEND_HOST}/products/{prod.slug}"
+                ET.SubElement(item, "g:image_link").text = prod.image
+                ET.SubElement(item, "g:availability").text = (
+                    AVAILABILITY_MAP[target]["in"] if variant.inventory > 0 else AVAILABILITY_MAP[target]["out"]
+                )
+                ET.SubElement(item, "g:condition").text = "new" if prod.is_new else "used"
+                ET.SubElement(item, "g:price").text = f"{variant.price:.2f} NGN"
+                if variant.size:
+                    ET.SubElement(item, "g:size").text = variant.size
+                if variant.color:
+                    ET.SubElement(item, "g:color").text = variant.color
+                ET.SubElement(item, "g:product_type").text = ", ".join(c.name for c in prod.categories)
+                ET.SubElement(item, "g:identifier_exists").text = "no"
+        skip += 1000
+    xml_str = ET.tostring(rss, encoding="utf-8", method="xml").decode("utf-8")
+    return f'<?xml version="1.0" encoding="utf-8"?>\n{xml_str}'
+
+
+async def consume(stream) -> tuple[int, float]:
+    """Drain a chunk stream like StreamingResponse would; returns bytes and ms to first chunk."""
+    size, first_ms, start = 0, None, time.perf_counter()
+    async for chunk in stream:
+        if first_ms is None:
+            first_ms = (time.perf_counter() - start) * 1000
+        size += len(chunk.encode())
+    return size, first_ms
+
+
+async def measure(name: str, variants: int, table: FakeProductTable, run) -> None:
+    table.scanned = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    size, first_ms = await run()
+    total_ms = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    first = f"{first_ms:.1f}" if first_ms is not None else f"{total_ms:.1f}"
+    print(f"{variants:>9}{name:>14}{size / 1e6:>10.1f}{total_ms:>12.0f}{first:>12}{peak / 1e6:>12.1f}{table.scanned:>12}")
+
+
+async def main(sizes: list[int], target: str, use_redis: bool) -> None:
+    random.seed(7)
+    client = redis.from_url(settings.REDIS_URL, decode_responses=True) if use_redis else None
+    cache_srv = CacheService(client) if client is not None else None
+
+    print(f"{'variants':>9}{'mode':>14}{'MB':>10}{'total ms':>12}{'first ms':>12}{'peak MB':>12}{'rows read':>12}")
+    for variants in sizes:
+        table = FakeProductTable(build_products(variants))
+        db = SimpleNamespace(product=table)
+
+        async def run_legacy():
+            xml = await legacy_feed(db, target)
+            return len(xml.encode()), None
+
+        await measure("legacy", variants, table, run_legacy)
+        await measure("stream", variants, table, lambda: consume(stream_feed(db, target, map_age_group)))
+
+        if cache_srv is None:
+            continue
+        await reset_feed(client)
+        await measure("incr-build", variants, table,
+                      lambda: consume(stream_incremental_feed(db, cache_srv, target, map_age_group)))
+
+        touched = random.sample(table.rows, max(1, len(table.rows) // 100))
+        await mark_feed_dirty(client, [p.id for p in touched])
+        start = time.perf_counter()
+        rendered = await refresh_feed_fragments(db, cache_srv, target, map_age_group)
+        print(f"{'':>9}{'incr-1%':>14}  re-rendered {rendered} products in {(time.perf_counter() - start) * 1000:.0f}ms")
+        await measure("incr-serve", variants, table,
+                      lambda: consume(stream_incremental_feed(db, cache_srv, target, map_age_group)))
+
+    if client is not None:
+        await reset_feed(client)
+        await client.delete(*[f"merchant_feed:{t}:{k}" for t in AVAILABILITY_MAP for k in ("fragments", "dirty")])
+        await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--variants", type=int, nargs="+", default=[20000, 100000, 500000])
+    parser.add_argument("--target", choices=list(AVAILABILITY_MAP), default="google")
+    parser.add_argument("--redis", action="store_true", help="also benchmark the incremental mode against REDIS_URL")
+    args = parser.parse_args()
+    asyncio.run(main(args.variants, args.target, args.redis))
@@ -0,0 +1,142 @@
+"""
+Abandoned-cart blast benchmark against a local Brevo stand-in.
+
+Sends one rendered reminder to each of N users and compares:
+  - inline: the old path, send_email_brevo per recipient on a fresh
+    httpx client (what every dispatch() did inside the request/job)
+  - outbox: dispatch-side enqueue onto the Redis stream, drained by the
+    outbox consumers with Brevo batch requests over the pooled client
+
+The stub answers every request after --latency seconds plus a small
+per-recipient cost, so batch requests are not free. Inline is capped at
+--inline-sample recipients and extrapolated.
+
+Run from backend/ with Redis at REDIS_URL:
+    python -m scripts.benchmarks.notification_outbox --users 50000 --latency 0.15
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import redis.asyncio as redis
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.core.config import settings
+from app.core.notifications import outbox as outbox_module
+from app.core.notifications.channels import EmailChannel, close_http_client
+from app.core.notifications.outbox import NotificationOutbox, idempotency_key
+from app.core.utils import send_email_brevo
+
+PER_RECIPIENT_COST = 0.0002
+
+
+class BrevoStub:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.requests = 0
+        self.recipients = 0
+
+    def app(self) -> Starlette:
+        async def send(request: Request):
+            body = await request.json()
+            count = len(body.get("messageVersions") or [None])
+            await asyncio.sleep(self.latency + count * PER_RECIPIENT_COST)
+            self.requests += 1
+            self.recipients += count
+            return JSONResponse({"messageId": str(uuid.uuid4())}, status_code=201)
+
+        return Starlette(routes=[Route("/v3/smtp/email", send, methods=["POST"])])
+
+
+def render(i: int) -> tuple[str, dict]:
+    items = "".join(f"<tr><td>Item {j}</td><td>₦{(i * 7 + j) % 90 * 100}</td></tr>" for j in range(30))
+    html = f"<html><body><h1>Hi user{i}, your cart is waiting</h1><table>{items}</table></body></html>"
+    return html, {"recipient": f"user{i}@example.com", "subject": "You left something behind 🛒"}
+
+
+async def run_inline(users: int, total: int, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        html, kwargs = render(i)
+        async with semaphore:
+            await send_email_brevo(email_to=kwargs["recipient"], subject=kwargs["subject"], html_content=html)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(users)])
+    elapsed = time.perf_counter() - start
+    print(f"inline:  {users} emails in {elapsed:.2f}s -> {users / elapsed:.0f}/s "
+          f"(concurrency {concurrency}, fresh client per send), ~{total / (users / elapsed) / 60:.1f} min for {total}")
+
+
+async def run_outbox(client: redis.Redis, users: int, consumers: int, stub: BrevoStub) -> None:
+    outbox = NotificationOutbox({"email": EmailChannel("", 0, "", "")}, consumers=consumers, block_ms=50, poll_interval=0.1)
+    await outbox.start(client)
+
+    start = time.perf_counter()
+    for offset in range(0, users, 1000):
+        entries = []
+        for i in range(offset, min(offset + 1000, users)):
+            html, kwargs = render(i)
+            entries.append({
+                "channel": "email", "template": "send_abandoned_cart", "message": html, "kwargs": kwargs,
+                "key": idempotency_key("email", "send_abandoned_cart", kwargs["recipient"], html, kwargs),
+            })
+        await outbox.enqueue(entries)
+    enqueued = time.perf_counter() - start
+
+    while stub.recipients < users:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    await outbox.stop()
+    stats = await outbox.snapshot()
+    print(f"outbox:  enqueued {users} in {enqueued:.2f}s ({enqueued / users * 1e6:.0f}us per dispatch), "
+          f"all sent in {elapsed:.2f}s -> {users / elapsed:.0f}/s "
+          f"over {stub.requests} Brevo requests, {consumers} consumers, retries {stats['retries']}")
+
+
+async def main(users: int, latency: float, concurrency: int, consumers: int, inline_sample: int) -> None:
+    stub = BrevoStub(latency)
+    server = uvicorn.Server(uvicorn.Config(stub.app(), host="127.0.0.1", port=0, log_level="warning", lifespan="off"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    settings.BREVO_API_URL = f"http://127.0.0.1:{port}/v3"
+    settings.BREVO_API_KEY = "bench"
+    settings.EMAILS_ENABLED = True
+    settings.ENVIRONMENT = "staging"
+
+    suffix = uuid.uuid4().hex[:8]
+    for name in ("STREAM_KEY", "RETRY_KEY", "DEAD_LETTER_KEY"):
+        setattr(outbox_module, name, f"{getattr(outbox_module, name)}:bench:{suffix}")
+    outbox_module.QUEUED_KEY = f"notifications:queued:bench:{suffix}:{{key}}"
+    outbox_module.SENT_KEY = f"notifications:sent:bench:{suffix}:{{key}}"
+    client = redis.from_url(settings.REDIS_URL, decode_responses=True, max_connections=consumers + 4)
+
+    try:
+        await run_inline(min(users, inline_sample), users, concurrency)
+        stub.requests = stub.recipients = 0
+        await run_outbox(client, users, consumers, stub)
+    finally:
+        await client.delete(outbox_module.STREAM_KEY, outbox_module.RETRY_KEY, outbox_module.DEAD_LETTER_KEY)
+        await client.aclose()
+        await close_http_client()
+        server.should_exit = True
+        await task
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--latency", type=float, default=0.15, help="seconds per Brevo request")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent inline sends")
+    parser.add_argument("--consumers", type=int, default=2)
+    parser.add_argument("--inline-sample", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.latency, args.concurrency, args.consumers, args.inline_sample))
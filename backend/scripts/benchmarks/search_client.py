@@ -0,0 +1,158 @@
+"""
+Search client load benchmark: /api/product/feed and /api/product/index-products
+through the old thread-offloaded sync client vs the async pooled client.
+
+  - thread: what SearchService did before. Every search is a blocking
+            HTTP call (requests, no connection reuse, like the sync
+            meilisearch SDK) sent through anyio.to_thread.
+  - async:  the current SearchService on app.services.meili, pooled
+            keep-alive connections and per-tick /multi-search batching.
+
+Both drive ProductService.get_discovery_feed / query_collection_index, the
+bodies of the two routes without the response cache, with C concurrent
+clients. Reports throughput, latency percentiles and HTTP requests sent.
+
+By default a stub Meilisearch runs in a subprocess with a fixed per-request
+latency; pass --meili-url (and MEILI_MASTER_KEY/MEILI_PRODUCTS_INDEX in the
+env) to load a real instance instead.
+
+Run from backend/:
+    python -m scripts.benchmarks.search_client --requests 4000 --concurrency 50 200 --latency 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import statistics
+import time
+
+import requests
+from anyio import to_thread
+
+from app.core.config import settings
+from app.services.meili import MeiliClient
+from app.services.product import ProductService
+from app.services.search import SearchService
+
+STUB_PORT = 7789
+
+
+def run_stub(port: int, latency: float, hits: int, counter) -> None:
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    docs = [{"id": i, "name": f"Product {i}", "slug": f"product-{i}", "min_variant_price": 1000.0} for i in range(hits)]
+
+    def result(query: dict) -> dict:
+        limit = int(query.get("limit", 20))
+        return {"hits": docs[:limit], "query": query.get("q", ""), "limit": limit, "offset": 0,
+                "estimatedTotalHits": 10_000, "processingTimeMs": 1}
+
+    async def search(request: Request):
+        counter.value += 1
+        await asyncio.sleep(latency)
+        return JSONResponse(result(await request.json()))
+
+    async def multi_search(request: Request):
+        counter.value += 1
+        await asyncio.sleep(latency)
+        body = await request.json()
+        return JSONResponse({"results": [{"indexUid": q["indexUid"], **result(q)} for q in body["queries"]]})
+
+    async def get_index(request: Request):
+        return JSONResponse({"uid": request.path_params["uid"], "primaryKey": "id"})
+
+    app = Starlette(routes=[
+        Route("/indexes/{uid}/search", search, methods=["POST"]),
+        Route("/multi-search", multi_search, methods=["POST"]),
+        Route("/indexes/{uid}", get_index, methods=["GET"]),
+    ])
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+class ThreadSearchService(SearchService):
+    """The previous search path: a blocking call per search on a worker thread."""
+
+    def __init__(self, host: str) -> None:
+        super().__init__()
+        self.host = host
+        self.headers = {"Authorization": f"Bearer {settings.MEILI_MASTER_KEY}"}
+
+    async def index_ready(self, index_name=None) -> bool:
+        return True
+
+    async def search_index(self, query: str, options: dict) -> dict:
+        def _search():
+            resp = requests.post(
+                f"{self.host}/indexes/{self.index_name}/search",
+                json={"q": query, **options}, headers=self.headers, timeout=5,
+            )
+            resp.raise_for_status()
+            return resp.json()
+
+        try:
+            return await to_thread.run_sync(_search)
+        except Exception as e:
+            return {"hits": [], "nbHits": 0, "error": str(e)}
+
+
+async def load(name: str, call, total: int, concurrency: int, counter) -> None:
+    latencies: list[float] = []
+    remaining = iter(range(total))
+    before = counter.value if counter is not None else 0
+
+    async def client() -> None:
+        for _ in remaining:
+            start = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    q = statistics.quantiles(latencies, n=100)
+    sent = f"{counter.value - before}" if counter is not None else "-"
+    print(f"{name:>24}{concurrency:>6}{total / elapsed:>10.0f}{q[49]:>9.1f}{q[98]:>9.1f}{sent:>10}")
+
+
+async def main(total: int, concurrencies: list[int], latency: float, hits: int, meili_url: str | None) -> None:
+    counter = None
+    stub = None
+    if meili_url is None:
+        counter = multiprocessing.Value("i", 0, lock=False)
+        stub = multiprocessing.Process(target=run_stub, args=(STUB_PORT, latency / 1000, hits, counter), daemon=True)
+        stub.start()
+        meili_url = f"http://127.0.0.1:{STUB_PORT}"
+        settings.MEILI_PRODUCTS_INDEX = settings.MEILI_PRODUCTS_INDEX or "products"
+        await asyncio.sleep(1.5)
+
+    client = MeiliClient(meili_url, settings.MEILI_MASTER_KEY, max_connections=settings.MEILI_MAX_CONNECTIONS)
+    services = {
+        "thread": ProductService(db=None, search_srv=ThreadSearchService(meili_url), cache_srv=None, cdn_srv=None),
+        "async": ProductService(db=None, search_srv=SearchService(client), cache_srv=None, cdn_srv=None),
+    }
+
+    print(f"{'route / client':>24}{'conc':>6}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'http reqs':>10}")
+    try:
+        for concurrency in concurrencies:
+            for mode, srv in services.items():
+                await load(f"feed / {mode}", lambda: srv.get_discovery_feed(limit=40), total, concurrency, counter)
+            for mode, srv in services.items():
+                await load(f"index-products / {mode}", srv.query_collection_index, total // 3, concurrency, counter)
+    finally:
+        await client.aclose()
+        if stub is not None:
+            stub.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--latency", type=float, default=10.0, help="stub Meilisearch latency per request (ms)")
+    parser.add_argument("--hits", type=int, default=40, help="documents per stub search response")
+    parser.add_argument("--meili-url", default=None, help="load a real Meilisearch instead of the stub")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.latency, args.hits, args.meili_url))
@@ -0,0 +1,88 @@
+"""
+Tag invalidation benchmark: per-tag pipelines vs the single Lua call in
+CacheService.invalidate.
+
+Seeds `--tags` tag sets with `--members` keys each, then times one
+invalidation of all of them with both strategies.
+
+Needs a reachable Redis (REDIS_URL) — it writes and deletes bench:* keys.
+Run from backend/:
+    python -m scripts.benchmarks.tag_invalidation --tags 4 --members 10000 25000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.services.cache import _INVALIDATE_SCRIPT, L1_INVALIDATE_CHANNEL
+
+
+async def seed(client: redis.Redis, tags: list[str], members: int) -> None:
+    expire_at = int(time.time()) + 3600
+    for tag in tags:
+        for start in range(0, members, 5000):
+            async with client.pipeline(transaction=False) as pipe:
+                for i in range(start, min(start + 5000, members)):
+                    key = f"bench:{tag}:{i}"
+                    pipe.setex(key, 3600, "x")
+                    pipe.zadd(f"tag:{tag}", {key: expire_at})
+                await pipe.execute()
+
+
+async def invalidate_pipelined(client: redis.Redis, tags: list[str]) -> int:
+    """The pre-Lua implementation: two round-trips per tag plus a publish."""
+    now = int(time.time())
+    evicted: set[str] = set()
+    for tag in tags:
+        tag_key = f"tag:{tag}"
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(tag_key, 0, now)
+            pipe.zrange(tag_key, 0, -1)
+            _, active_keys = await pipe.execute()
+        if active_keys:
+            evicted.update(active_keys)
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.delete(*active_keys)
+                pipe.delete(tag_key)
+                await pipe.execute()
+    if evicted:
+        await client.publish(L1_INVALIDATE_CHANNEL, json.dumps(list(evicted)))
+    return len(evicted)
+
+
+async def invalidate_lua(client: redis.Redis, tags: list[str]) -> int:
+    script = client.register_script(_INVALIDATE_SCRIPT)
+    evicted = await script(keys=[f"tag:{tag}" for tag in tags], args=[int(time.time()), 0, L1_INVALIDATE_CHANNEL])
+    return len(evicted)
+
+
+async def main(tag_count: int, member_counts: list[int], rounds: int) -> None:
+    client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    tags = [f"bench-{i}" for i in range(tag_count)]
+    # load the script up front so the first Lua round doesn't pay SCRIPT LOAD
+    await client.script_load(_INVALIDATE_SCRIPT)
+
+    print(f"{'members/tag':>12}{'tags':>6}{'strategy':>12}{'evicted':>10}{'ms (avg)':>12}")
+    for members in member_counts:
+        for name, strategy in (("pipelined", invalidate_pipelined), ("lua", invalidate_lua)):
+            total_ms, evicted = 0.0, 0
+            for _ in range(rounds):
+                await seed(client, tags, members)
+                start = time.perf_counter()
+                evicted = await strategy(client, tags)
+                total_ms += (time.perf_counter() - start) * 1000
+            print(f"{members:>12}{tag_count:>6}{name:>12}{evicted:>10}{total_ms / rounds:>12.1f}")
+
+    await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tags", type=int, default=4)
+    parser.add_argument("--members", type=int, nargs="+", default=[10000, 25000])
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.tags, args.members, args.rounds))
@@ -0,0 +1,105 @@
+"""
+WebSocket broadcast benchmark with fake sockets.
+
+Registers N fake sockets on an InMemoryWebSocketManager, a fraction of
+which are slow, and compares:
+  - sequential: the old broadcast_to_all loop (send_json awaited per socket)
+  - outbox:     the current broadcast_to_all (serialize once, per-socket queues)
+
+Reports how long broadcast_to_all blocks its caller (this is what
+CacheService.invalidate waits on) and how long until every fast socket
+received the message. Also fires a burst of invalidations to show
+coalescing on backed-up sockets.
+
+Run from backend/:
+    python -m scripts.benchmarks.websocket_broadcast --sockets 5000 --slow 0.02
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app.services.websocket import InMemoryWebSocketManager
+
+
+class FakeSocket:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.received = 0
+        self.done = asyncio.Event()
+
+    async def _deliver(self) -> None:
+        await asyncio.sleep(self.latency)
+        self.received += 1
+        self.done.set()
+
+    async def send_text(self, data: str) -> None:
+        await self._deliver()
+
+    async def send_json(self, data: dict) -> None:
+        await self._deliver()
+
+    async def close(self) -> None:
+        pass
+
+
+def build_sockets(count: int, slow_ratio: float, slow_latency: float) -> list[FakeSocket]:
+    sockets = []
+    for _ in range(count):
+        slow = random.random() < slow_ratio
+        sockets.append(FakeSocket(slow_latency if slow else random.uniform(0.0005, 0.003)))
+    return sockets
+
+
+async def sequential_broadcast(sockets: list[FakeSocket], message: dict) -> None:
+    for ws in sockets:
+        await ws.send_json(message)
+
+
+async def run_sequential(sockets: list[FakeSocket]) -> None:
+    fast = [ws for ws in sockets if ws.latency < 0.1]
+    start = time.perf_counter()
+    await sequential_broadcast(sockets, {"keys": ["products"], "type": "invalidate"})
+    blocked = (time.perf_counter() - start) * 1000
+    print(f"sequential: caller blocked {blocked:.1f}ms, fast sockets delivered {sum(ws.received for ws in fast)}/{len(fast)}")
+
+
+async def run_outbox(sockets: list[FakeSocket], burst: int, send_timeout: float) -> None:
+    manager = InMemoryWebSocketManager(send_timeout=send_timeout)
+    for i, ws in enumerate(sockets):
+        await manager.register(str(i), ws)
+    fast = [ws for ws in sockets if ws.latency < 0.1]
+
+    start = time.perf_counter()
+    await manager.broadcast_to_all({"keys": ["products"]}, message_type="invalidate")
+    blocked = (time.perf_counter() - start) * 1000
+    await asyncio.gather(*[ws.done.wait() for ws in fast])
+    delivered = (time.perf_counter() - start) * 1000
+    print(f"outbox:     caller blocked {blocked:.1f}ms, all {len(fast)} fast sockets delivered in {delivered:.1f}ms")
+
+    start = time.perf_counter()
+    for i in range(burst):
+        await manager.broadcast_to_all({"keys": [f"product:{i}"]}, message_type="invalidate")
+    blocked = (time.perf_counter() - start) * 1000
+    await asyncio.sleep(send_timeout + 0.5)
+    print(f"burst of {burst} invalidations: caller blocked {blocked:.1f}ms total, stats {manager.stats}, "
+          f"connections left {manager.get_connection_count()}")
+    await manager.stop()
+
+
+async def main(count: int, slow_ratio: float, slow_latency: float, burst: int, send_timeout: float) -> None:
+    random.seed(7)
+    # sequential is O(sum of latencies) — cap it so the benchmark finishes
+    await run_sequential(build_sockets(min(count, 500), slow_ratio, slow_latency))
+    await run_outbox(build_sockets(count, slow_ratio, slow_latency), burst, send_timeout)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sockets", type=int, default=5000)
+    parser.add_argument("--slow", type=float, default=0.02, help="fraction of slow sockets")
+    parser.add_argument("--slow-latency", type=float, default=2.0, help="seconds per send on slow sockets")
+    parser.add_argument("--burst", type=int, default=200)
+    parser.add_argument("--send-timeout", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.sockets, args.slow, args.slow_latency, args.burst, args.send_timeout))
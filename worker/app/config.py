@@ -12,6 +12,7 @@ class Settings(BaseSettings):
     WORKER_ENABLED: bool = False
     CRON_JOBS_ENABLED: bool = False
     EMBEDDINGS_ENABLED: bool = False
+    EMBEDDINGS_PROVIDER: str = "gemini"  # or "mock" for offline runs
 
     GEMINI_API_KEY: str = ""
     GEMINI_MODEL: str = "gemini-2.5-flash"
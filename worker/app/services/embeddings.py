@@ -0,0 +1,73 @@
+import asyncio
+import hashlib
+import math
+import random
+from google import genai
+from google.genai import types
+from app.config import settings
+from app.logger import logger
+
+MODEL_NAME = "gemini-embedding-2"
+EMBEDDING_DIMENSIONS = 768
+
+
+def embedding_text(name: str | None, description: str | None) -> str:
+    """The text a product is embedded from. Keep in sync with
+    TEXT_HASH_SQL in app/tasks/products.py."""
+    return f"Title: {name or ''}. Description: {description or ''}"
+
+
+def text_hash(text: str) -> str:
+    """md5 hex of the UTF-8 text, same as Postgres md5()."""
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+class GeminiEmbeddings:
+    """Gemini embeddings, many texts per request."""
+
+    max_batch = 100
+
+    def __init__(self, api_key: str = settings.GEMINI_API_KEY) -> None:
+        self.client = genai.Client(api_key=api_key)
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        resp = await self.client.aio.models.embed_content(
+            model=MODEL_NAME,
+            contents=texts,
+            config=types.EmbedContentConfig(output_dimensionality=EMBEDDING_DIMENSIONS),
+        )
+        return [list(e.values) for e in resp.embeddings]
+
+
+class MockEmbeddings:
+    """
+    Offline stand-in: unit vectors seeded from the text, so equal texts get
+    equal vectors. `latency` (plus `per_text` per text) is awaited per
+    request to model the real API when benchmarking.
+    """
+
+    max_batch = 100
+
+    def __init__(self, latency: float = 0.0, per_text: float = 0.0) -> None:
+        self.latency = latency
+        self.per_text = per_text
+        self.requests = 0
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        self.requests += 1
+        if self.latency or self.per_text:
+            await asyncio.sleep(self.latency + self.per_text * len(texts))
+        vectors = []
+        for text in texts:
+            rng = random.Random(text_hash(text))
+            vector = [rng.gauss(0, 1) for _ in range(EMBEDDING_DIMENSIONS)]
+            norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+            vectors.append([v / norm for v in vector])
+        return vectors
+
+
+def get_embedding_provider():
+    if settings.EMBEDDINGS_PROVIDER == "mock" or settings.ENVIRONMENT == "development":
+        logger.info("🛡️ [AI MOCK] Using the local mock embedding provider.")
+        return MockEmbeddings(latency=0.1)
+    return GeminiEmbeddings()
@@ -4,8 +4,9 @@ from arq.connections import RedisSettings
 from app.tasks import all_ecommerce_tasks
 from app.config import settings
 from app.tasks.enrich_products import enrich_products
-from app.tasks.products import clean_up_dangling
+from app.tasks.products import clean_up_dangling, embed_pending_products, refresh_similar_products
 from app.db import db
+from app.services.embeddings import get_embedding_provider
 from app.logger import logger
 
 async def startup(ctx):
@@ -18,6 +19,7 @@ async def startup(ctx):
 
     await db.connect()
     ctx['db_pool'] = db.get_pool()
+    ctx['embedding_provider'] = get_embedding_provider()
 
 async def shutdown(ctx):
     """Runs exactly once when the worker gracefully shuts down"""
@@ -78,6 +80,21 @@ class WorkerSettings:
             run_at_startup=False,
             keep_result=0
         ),
+        cron(
+            embed_pending_products,
+            hour={1, 7, 13, 19},    # catches admin edits the enrichment sweep doesn't touch
+            minute=0,
+            name="embed_pending_products",
+            run_at_startup=False,
+            keep_result=0
+        ),
+        cron(
+            refresh_similar_products,
+            hour=4, minute=0,       # daily, after the cleanup sweep
+            name="refresh_similar_products",
+            run_at_startup=False,
+            keep_result=0
+        ),
     ] if settings.CRON_JOBS_ENABLED else []
 
     redis_settings = RedisSettings.from_dsn(settings.BROKER_URL)
@@ -1,10 +1,12 @@
 from app.tasks.orders import order_created, process_referral, generate_and_send_invoice
 from app.tasks.user_register import user_register
-from app.tasks.products import update_product_embeddings
+from app.tasks.products import embed_pending_products, refresh_similar_products, update_product_embeddings
 
 all_ecommerce_tasks = [
     generate_and_send_invoice,
     update_product_embeddings,
+    refresh_similar_products,
+    embed_pending_products,
     user_register,
     process_referral,
     order_created
@@ -25,6 +25,7 @@ async def enrich_products(ctx) -> str:
             LIMIT $1
           """
             products = await conn.fetch(query, 10)
+            enriched: list[int] = []
             for p in products:
                 logger.info(f"Enriching product: {p['id']}")
                 images = p["img"]
@@ -44,15 +45,13 @@ async def enrich_products(ctx) -> str:
                         enrichment['slug'],
                         p["id"]
                     )
-                    text_for_embedding: str = f"Title: {enrichment['title']}. Description: {enrichment['description']}"
-                    await redis.enqueue_job(
-                        "update_product_embeddings",
-                        product_id=str(p["id"]),
-                        text_to_embed=text_for_embedding
-                    )
-                    logger.info(f"➡️ Enqueued embedding generation job for product: {p['id']}")
+                    enriched.append(p["id"])
                 except Exception as e:
                     raise Exception(e)
+            if enriched:
+                # one batched job embeds them all
+                await redis.enqueue_job("embed_pending_products", product_ids=enriched)
+                logger.info(f"➡️ Enqueued batch embedding job for products: {enriched}")
         logger.info("✅ [Automated Cron] Database sweep fully executed and synchronized.")
     except Exception as e:
         logger.error(f"Inventory synchronization failed: {str(e)}", exc_info=True)
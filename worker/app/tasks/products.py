@@ -1,14 +1,97 @@
 import asyncio
 import asyncpg
-from google import genai
-from google.genai import types
-import json
+import time
 from app.config import settings
 from app.logger import logger
+from app.services.embeddings import embedding_text, get_embedding_provider, text_hash
+
+NEIGHBORS_UPDATED_KEY = "recs:neighbors:updated"
+NEIGHBORS_UPDATED_MAX = 10_000
+SIMILAR_COUNT = 10
+SIMILAR_TTL = 60 * 60 * 24 * 30
+SIMILAR_BATCH_SIZE = 500
+EMBED_BATCH_SIZE = 100      # texts per embedding request
+EMBED_CONCURRENCY = 4       # embedding requests in flight
+EMBED_PAGE_SIZE = 1000      # pending products pulled per pass
+
+# Same text as app.services.embeddings.embedding_text (format() renders NULL as '')
+TEXT_HASH_SQL = "md5(format('Title: %s. Description: %s', name, description))"
+
+# Products with a description whose current text has not been embedded yet
+PENDING_EMBEDDINGS_QUERY = f"""
+    SELECT id, name, description
+    FROM products
+    WHERE id > $1
+    AND description IS NOT NULL AND TRIM(description) != ''
+    AND (embedding IS NULL OR embedding_hash IS DISTINCT FROM {TEXT_HASH_SQL})
+    AND ($3::int[] IS NULL OR id = ANY($3::int[]))
+    ORDER BY id
+    LIMIT $2
+"""
+
+WRITE_EMBEDDINGS_QUERY = """
+    UPDATE products p
+    SET embedding = v.embedding::vector, embedding_hash = v.hash
+    FROM UNNEST($1::int[], $2::text[], $3::text[]) AS v(id, embedding, hash)
+    WHERE p.id = v.id
+"""
+
+# products.embedding is vector(768) with an HNSW index on vector_cosine_ops,
+# so ordering by <=> against a constant vector is an index scan
+SIMILAR_QUERY = """
+    SELECT id, 1 - (embedding <=> $1::text::vector) AS similarity
+    FROM products
+    WHERE embedding IS NOT NULL AND id != $2
+    ORDER BY embedding <=> $1::text::vector
+    LIMIT $3
+"""
+
+# One index scan per product in $1, each ordered by distance to its own vector
+SIMILAR_BATCH_QUERY = """
+    SELECT t.id AS product_id, n.id, 1 - n.distance AS similarity
+    FROM products t
+    CROSS JOIN LATERAL (
+        SELECT p.id, p.embedding <=> t.embedding AS distance
+        FROM products p
+        WHERE p.embedding IS NOT NULL AND p.id != t.id
+        ORDER BY p.embedding <=> t.embedding
+        LIMIT $2
+    ) n
+    WHERE t.id = ANY($1::int[]) AND t.embedding IS NOT NULL
+    ORDER BY t.id, n.distance
+"""
+
+
+def to_vector_literal(values) -> str:
+    """pgvector text input: '[0.1,0.2,...]'"""
+    return "[" + ",".join(repr(float(v)) for v in values) + "]"
+
+
+async def write_similar(redis, neighbors: dict[int, list[tuple[int, float]]]) -> None:
+    """Replace `product:{id}:similar` (ids, best first) and the scored
+    `product:{id}:neighbors` zset for every product in one pipeline, and
+    stamp them so API processes reload the rows."""
+    now = time.time()
+    async with redis.pipeline(transaction=True) as pipe:
+        for p_id, rows in neighbors.items():
+            if not rows:
+                continue
+            key: str = f"product:{p_id}:similar"
+            pipe.delete(key)
+            pipe.rpush(key, *[str(n_id) for n_id, _ in rows])
+            pipe.expire(key, SIMILAR_TTL)
+
+            # Scored neighbors for the API's in-process recommendation matrix;
+            # the stamp tells every API process to reload this row
+            scored_key: str = f"product:{p_id}:neighbors"
+            pipe.delete(scored_key)
+            pipe.zadd(scored_key, {str(n_id): score for n_id, score in rows})
+            pipe.expire(scored_key, SIMILAR_TTL)
+            pipe.zadd(NEIGHBORS_UPDATED_KEY, {str(p_id): now})
+        pipe.zremrangebyrank(NEIGHBORS_UPDATED_KEY, 0, -(NEIGHBORS_UPDATED_MAX + 1))
+        await pipe.execute()
+    logger.info(f"🔥 Synced similar-product lists for {sum(1 for rows in neighbors.values() if rows)} products")
 
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
-MODEL_NAME = "gemini-embedding-2"
-EMBEDDING_DIMENSIONS = 768
 
 async def update_product_embeddings(ctx, product_id: str, text_to_embed: str) -> dict:
     if not settings.EMBEDDINGS_ENABLED:
@@ -21,81 +104,129 @@ async def update_product_embeddings(ctx, product_id: str, text_to_embed: str) ->
 
     p_id = int(product_id) if isinstance(product_id, str) and product_id.isdigit() else product_id
 
-    if settings.ENVIRONMENT == "development":
-        logger.info("🛡️ [AI MOCK] Simulating local 768-dim vector array.")
-        await asyncio.sleep(0.1)
-        vector_values = [0.042] * 768
-    else:
-        try:
-            loop = asyncio.get_running_loop()
-            resp = await loop.run_in_executor(
-                None,
-                lambda: client.models.embed_content(
-                    model=MODEL_NAME,
-                    contents=text_to_embed,
-                    config=types.EmbedContentConfig(
-                        output_dimensionality=EMBEDDING_DIMENSIONS,
-                    ),
-                )
-            )
-
-            vector_values = resp.embeddings[0].values
-        except Exception as e:
-            logger.error(f"❌ Gemini Embeddings Pipeline failed: {str(e)}", exc_info=True)
-            raise e
+    provider = ctx.get("embedding_provider") or get_embedding_provider()
+    try:
+        vector_values = (await provider.embed([text_to_embed]))[0]
+    except Exception as e:
+        logger.error(f"❌ Gemini Embeddings Pipeline failed: {str(e)}", exc_info=True)
+        raise e
 
+    vector = to_vector_literal(vector_values)
     async with pool.acquire() as conn:
         await conn.execute(
-            "UPDATE products SET embedding = $1 WHERE id = $2",
-            json.dumps(vector_values),
-            p_id
+            "UPDATE products SET embedding = $1::text::vector, embedding_hash = $2 WHERE id = $3",
+            vector, text_hash(text_to_embed), p_id,
         )
-        logger.info(f"💾 Vector array successfully committed to JsonB column for product {p_id}")
-
-        # We parse the JsonB string array on the fly and compute Cosine Distance using a math string loop snippet
-        similarity_query = """
-            WITH target_vector AS (
-                SELECT embedding FROM products WHERE id = $1
-            )
-            SELECT
-                p.id,
-                (
-                    SELECT
-                        (SELECT SUM(a.val * b.val) FROM UNNEST(ARRAY(SELECT jsonb_array_elements_text(p.embedding)::float)) WITH ORDINALITY AS a(val, idx) JOIN UNNEST(ARRAY(SELECT jsonb_array_elements_text(t.embedding)::float)) WITH ORDINALITY AS b(val, idx) ON a.idx = b.idx)
-                        /
-                        (
-                            SQRT((SELECT SUM(val*val) FROM UNNEST(ARRAY(SELECT jsonb_array_elements_text(p.embedding)::float)) AS val))
-                            *
-                            SQRT((SELECT SUM(val*val) FROM UNNEST(ARRAY(SELECT jsonb_array_elements_text(t.embedding)::float)) AS val))
-                        )
-                    FROM target_vector t
-                ) as similarity
-            FROM products p
-            WHERE p.embedding IS NOT NULL AND p.id != $1
-            ORDER BY similarity DESC
-            LIMIT 10;
-        """
-
-        logger.info(f"🎯 Calculating top 10 neighbors using native database vector layers...")
-        top_neighbors = await conn.fetch(similarity_query, p_id)
-        top_10_ids = [str(row["id"]) for row in top_neighbors]
-
-    if top_10_ids:
-        key: str = f"product:{p_id}:similar"
-
-        # Use standard arq pipeline operations asynchronously
-        async with redis.pipeline(transaction=True) as pipe:
-            pipe.delete(key) # Clear out stale listings
-            pipe.lpush(key, *reversed(top_10_ids))
-            pipe.ltrim(key, 0, 9)
-            pipe.expire(key, 60 * 60 * 24 * 30) # 30 day TTL expiration window
-            await pipe.execute()
-
-        logger.info(f"🔥 Successfully synced Redis cache key '{key}' with tracking entries: {top_10_ids}")
+        logger.info(f"💾 Vector committed to pgvector column for product {p_id}")
+
+        # HNSW index scan on cosine distance, not a scan of every product
+        top_neighbors = await conn.fetch(SIMILAR_QUERY, vector, p_id, SIMILAR_COUNT)
+
+    await write_similar(redis, {p_id: [(row["id"], float(row["similarity"] or 0.0)) for row in top_neighbors]})
 
     return {"product_id": product_id, "status": "processed"}
 
 
+async def refresh_similar_products(ctx, product_ids: list[int] | None = None) -> dict:
+    """
+    Recompute `product:{id}:similar` for many products in one pass: one
+    LATERAL index-scan query and one Redis pipeline per batch. With no ids,
+    walks every product that has an embedding, so lists of older products
+    pick up neighbors added since they were embedded.
+    """
+    pool: asyncpg.Pool = ctx["db_pool"]
+    redis = ctx["redis"]
+    refreshed = 0
+    last_id = 0
+    while True:
+        if product_ids is not None:
+            batch = [int(i) for i in product_ids[refreshed:refreshed + SIMILAR_BATCH_SIZE]]
+        else:
+            async with pool.acquire() as conn:
+                batch = [r["id"] for r in await conn.fetch(
+                    "SELECT id FROM products WHERE embedding IS NOT NULL AND id > $1 ORDER BY id LIMIT $2",
+                    last_id, SIMILAR_BATCH_SIZE,
+                )]
+        if not batch:
+            break
+
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(SIMILAR_BATCH_QUERY, batch, SIMILAR_COUNT)
+        neighbors: dict[int, list[tuple[int, float]]] = {p_id: [] for p_id in batch}
+        for row in rows:
+            neighbors[row["product_id"]].append((row["id"], float(row["similarity"] or 0.0)))
+        await write_similar(redis, neighbors)
+
+        refreshed += len(batch)
+        last_id = batch[-1]
+        if len(batch) < SIMILAR_BATCH_SIZE:
+            break
+
+    logger.info(f"[refresh_similar_products] refreshed {refreshed} products")
+    return {"refreshed": refreshed}
+
+
+async def embed_pending_products(ctx, product_ids: list[int] | None = None) -> dict:
+    """
+    Embed every product whose title/description changed since it was last
+    embedded (or only `product_ids`). Texts go to the provider
+    EMBED_BATCH_SIZE per request, EMBED_CONCURRENCY requests at a time;
+    each page is written back in one UPDATE and its similar-product lists
+    refreshed in one pass. Products whose text hash still matches are never
+    fetched. A failed request leaves its products pending for the next run.
+    """
+    if not settings.EMBEDDINGS_ENABLED:
+        logger.warning("⚠️ [FEATURE DISABLED] Skipping batch embedding run.")
+        return {"status": "skipped_feature_disabled"}
+
+    pool: asyncpg.Pool = ctx["db_pool"]
+    provider = ctx.get("embedding_provider") or get_embedding_provider()
+    semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+    ids_filter = [int(i) for i in product_ids] if product_ids is not None else None
+    embedded, failed, requests = 0, 0, 0
+    last_id = 0
+
+    async def embed_group(group: list[tuple[int, str]]) -> list[tuple[int, str, str]]:
+        nonlocal requests
+        async with semaphore:
+            requests += 1
+            try:
+                vectors = await provider.embed([text for _, text in group])
+            except Exception as e:
+                logger.error(f"❌ [embed_pending_products] embedding request for {len(group)} products failed: {e}")
+                return []
+        return [(p_id, to_vector_literal(vector), text_hash(text)) for (p_id, text), vector in zip(group, vectors)]
+
+    while True:
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(PENDING_EMBEDDINGS_QUERY, last_id, EMBED_PAGE_SIZE, ids_filter)
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+
+        items = [(r["id"], embedding_text(r["name"], r["description"])) for r in rows]
+        groups = [items[i:i + EMBED_BATCH_SIZE] for i in range(0, len(items), EMBED_BATCH_SIZE)]
+        results = [row for group in await asyncio.gather(*[embed_group(g) for g in groups]) for row in group]
+        failed += len(items) - len(results)
+
+        if results:
+            async with pool.acquire() as conn:
+                await conn.execute(
+                    WRITE_EMBEDDINGS_QUERY,
+                    [p_id for p_id, _, _ in results],
+                    [vector for _, vector, _ in results],
+                    [digest for _, _, digest in results],
+                )
+            embedded += len(results)
+            await refresh_similar_products(ctx, [p_id for p_id, _, _ in results])
+        logger.info(f"🧬 [embed_pending_products] embedded {embedded} so far (last id {last_id})")
+
+        if len(rows) < EMBED_PAGE_SIZE:
+            break
+
+    return {"embedded": embedded, "failed": failed, "requests": requests}
+
+
 BATCH_SIZE = 200
 
 # Products with no images AND never referenced by an order or cart item
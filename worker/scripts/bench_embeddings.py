@@ -0,0 +1,73 @@
+"""
+Embedding throughput with the mock provider (no Gemini, no database).
+
+Compares, for N products:
+  - per-job: the old path, one single-text request per arq job with up to
+    `max_jobs` jobs running at once
+  - batched: embed_pending_products' grouping, EMBED_BATCH_SIZE texts per
+    request and EMBED_CONCURRENCY requests in flight
+and how many texts the hash check leaves to embed on a re-run where only
+--changed of them were edited.
+
+    uv run python -m scripts.bench_embeddings --products 10000 --latency 0.15
+"""
+import argparse
+import asyncio
+import time
+
+from app.services.embeddings import MockEmbeddings, embedding_text, text_hash
+from app.task import WorkerSettings
+from app.tasks.products import EMBED_BATCH_SIZE, EMBED_CONCURRENCY
+
+
+async def per_job(texts: list[str], provider: MockEmbeddings, max_jobs: int) -> float:
+    semaphore = asyncio.Semaphore(max_jobs)
+
+    async def job(text: str) -> None:
+        async with semaphore:
+            await provider.embed([text])
+
+    start = time.perf_counter()
+    await asyncio.gather(*[job(t) for t in texts])
+    return time.perf_counter() - start
+
+
+async def batched(texts: list[str], provider: MockEmbeddings) -> float:
+    semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+
+    async def group(chunk: list[str]) -> None:
+        async with semaphore:
+            await provider.embed(chunk)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[group(texts[i:i + EMBED_BATCH_SIZE]) for i in range(0, len(texts), EMBED_BATCH_SIZE)])
+    return time.perf_counter() - start
+
+
+async def main(products: int, latency: float, per_text: float, changed: int) -> None:
+    texts = [embedding_text(f"Product {i}", f"Soft cotton item number {i} for everyday wear.") for i in range(products)]
+
+    old = MockEmbeddings(latency, per_text)
+    elapsed = await per_job(texts, old, WorkerSettings.max_jobs)
+    print(f"per-job:  {products} products in {elapsed:.1f}s -> {products / elapsed:.0f}/s over {old.requests} requests")
+
+    new = MockEmbeddings(latency, per_text)
+    elapsed = await batched(texts, new)
+    print(f"batched:  {products} products in {elapsed:.1f}s -> {products / elapsed:.0f}/s over {new.requests} requests")
+
+    stored = {i: text_hash(t) for i, t in enumerate(texts)}
+    edited = [t + " (updated)" if i < changed else t for i, t in enumerate(texts)]
+    pending = [t for i, t in enumerate(edited) if text_hash(t) != stored[i]]
+    rerun = MockEmbeddings(latency, per_text)
+    elapsed = await batched(pending, rerun)
+    print(f"re-run:   {len(pending)} of {products} need embedding after {changed} edits, {elapsed:.2f}s over {rerun.requests} requests")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--latency", type=float, default=0.15, help="seconds per embedding request")
+    parser.add_argument("--per-text", type=float, default=0.002, help="extra seconds per text in a request")
+    parser.add_argument("--changed", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.products, args.latency, args.per_text, args.changed))
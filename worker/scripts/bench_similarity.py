@@ -0,0 +1,154 @@
+"""
+Similar-product query benchmark: JSONB cosine scan vs pgvector HNSW.
+
+Builds a scratch table with N random 768-d embeddings stored both ways,
+then times, per target product:
+  - jsonb: the old query (re-parses every row's JSON array, full scan)
+  - hnsw:  ORDER BY embedding <=> $1 LIMIT 10 on the HNSW index
+and the batch refresh (LATERAL, 500 products per query) for hnsw.
+Also reports recall@10 of the HNSW results against the exact answer.
+
+Needs a Postgres with the vector extension at DATABASE_URL:
+    uv run python -m scripts.bench_similarity --products 10000 100000
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import asyncpg
+from app.config import settings
+from app.services.embeddings import EMBEDDING_DIMENSIONS
+from app.tasks.products import SIMILAR_COUNT, to_vector_literal
+
+TABLE = "bench_product_embeddings"
+
+JSONB_QUERY = f"""
+    WITH target_vector AS (
+        SELECT embedding_json AS embedding FROM {TABLE} WHERE id = $1
+    )
+    SELECT
+        p.id,
+        (
+            SELECT
+                (SELECT SUM(a.val * b.val) FROM UNNEST(ARRAY(SELECT jsonb_array_elements_text(p.embedding_json)::float)) WITH ORDINALITY AS a(val, idx) JOIN UNNEST(ARRAY(SELECT jsonb_array_elements_text(t.embedding)::float)) WITH ORDINALITY AS b(val, idx) ON a.idx = b.idx)
+                /
+                (
+                    SQRT((SELECT SUM(val*val) FROM UNNEST(ARRAY(SELECT jsonb_array_elements_text(p.embedding_json)::float)) AS val))
+                    *
+                    SQRT((SELECT SUM(val*val) FROM UNNEST(ARRAY(SELECT jsonb_array_elements_text(t.embedding)::float)) AS val))
+                )
+            FROM target_vector t
+        ) as similarity
+    FROM {TABLE} p
+    WHERE p.embedding_json IS NOT NULL AND p.id != $1
+    ORDER BY similarity DESC
+    LIMIT 10
+"""
+
+HNSW_QUERY = f"""
+    SELECT id, 1 - (embedding <=> $1::text::vector) AS similarity
+    FROM {TABLE}
+    WHERE embedding IS NOT NULL AND id != $2
+    ORDER BY embedding <=> $1::text::vector
+    LIMIT $3
+"""
+
+BATCH_QUERY = f"""
+    SELECT t.id AS product_id, n.id
+    FROM {TABLE} t
+    CROSS JOIN LATERAL (
+        SELECT p.id FROM {TABLE} p
+        WHERE p.embedding IS NOT NULL AND p.id != t.id
+        ORDER BY p.embedding <=> t.embedding
+        LIMIT $2
+    ) n
+    WHERE t.id = ANY($1::int[])
+"""
+
+
+def random_vector() -> list[float]:
+    # a few clusters, like real catalogue embeddings
+    center = random.randrange(50)
+    rng = random.Random(center)
+    return [rng.gauss(0, 1) + random.gauss(0, 0.35) for _ in range(EMBEDDING_DIMENSIONS)]
+
+
+async def seed(conn: asyncpg.Connection, count: int) -> None:
+    await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    await conn.execute(f"CREATE TABLE {TABLE} (id int PRIMARY KEY, embedding_json jsonb, embedding vector({EMBEDDING_DIMENSIONS}))")
+    for start in range(0, count, 1000):
+        rows = []
+        for i in range(start, min(start + 1000, count)):
+            literal = to_vector_literal(random_vector())
+            rows.append((i + 1, literal, literal))
+        await conn.executemany(f"INSERT INTO {TABLE} VALUES ($1, $2::jsonb, $3::text::vector)", rows)
+    start = time.perf_counter()
+    await conn.execute(f"CREATE INDEX ON {TABLE} USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)")
+    await conn.execute(f"ANALYZE {TABLE}")
+    print(f"  seeded {count} rows, HNSW build {time.perf_counter() - start:.1f}s")
+
+
+async def timed(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+async def bench(conn: asyncpg.Connection, count: int, rounds: int, jsonb_rounds: int) -> None:
+    print(f"products={count}")
+    await seed(conn, count)
+    targets = random.sample(range(1, count + 1), rounds)
+    vectors = {r["id"]: r["embedding"] for r in await conn.fetch(
+        f"SELECT id, embedding::text AS embedding FROM {TABLE} WHERE id = ANY($1::int[])", targets
+    )}
+
+    it = iter(targets)
+    jsonb_ms = await timed(lambda: conn.fetch(JSONB_QUERY, next(it)), jsonb_rounds)
+
+    recall = []
+
+    async def hnsw() -> None:
+        target = next(it2)
+        found = {r["id"] for r in await conn.fetch(HNSW_QUERY, vectors[target], target, SIMILAR_COUNT)}
+        await conn.execute("SET enable_indexscan = off")
+        exact = {r["id"] for r in await conn.fetch(HNSW_QUERY, vectors[target], target, SIMILAR_COUNT)}
+        await conn.execute("SET enable_indexscan = on")
+        recall.append(len(found & exact) / SIMILAR_COUNT)
+
+    it2 = iter(targets)
+    await hnsw()  # warm the index into shared buffers
+    it2 = iter(targets)
+    hnsw_ms = await timed(lambda: conn.fetch(HNSW_QUERY, vectors[next(it2)], 0, SIMILAR_COUNT), rounds)
+    it2 = iter(targets)
+    for _ in range(min(rounds, 20)):
+        await hnsw()
+
+    batch_ids = random.sample(range(1, count + 1), 500)
+    batch_ms = await timed(lambda: conn.fetch(BATCH_QUERY, batch_ids, SIMILAR_COUNT), 3)
+
+    print(f"  jsonb scan:    {jsonb_ms:9.1f} ms per product ({jsonb_rounds} runs)")
+    print(f"  hnsw:          {hnsw_ms:9.2f} ms per product ({rounds} runs), recall@10 {sum(recall) / len(recall):.2f}")
+    print(f"  hnsw batch:    {batch_ms / 500:9.2f} ms per product (500 per query)")
+    await conn.execute(f"DROP TABLE {TABLE}")
+
+
+async def main(sizes: list[int], rounds: int, jsonb_rounds: int) -> None:
+    random.seed(11)
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        for count in sizes:
+            await bench(conn, count, rounds, jsonb_rounds)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--jsonb-rounds", type=int, default=3, help="the old query takes seconds at 100k")
+    args = parser.parse_args()
+    asyncio.run(main(args.products, args.rounds, args.jsonb_rounds))